@@ -6,13 +6,15 @@ It includes Scatter, Scatter 3D, Scatter Geo, Image showing, and Choropleth maps
 import dash
 from dash import dcc, html
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from pandas import DataFrame
 import numpy as np
 from data.Generate_Data_For_Examples import *
+from utils.Geo_Raster import GeoRaster, register_hover_callback, register_zoom_callback
+from utils.Figure_Patches import choropleth_patch
 
 ##%
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
@@ -24,6 +26,11 @@ colors = {
 
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
+# scatter_geo has no WebGL mode. Above POINT_BUDGET points it is replaced by a server-side datashaded
+# image under an equirectangular map (re-rendered on zoom/pan), and the point nearest to the cursor is
+# shown below it
+geo_points = GeoRaster(age, height)
+
 app.layout = dbc.Container(fluid=True, children=[
     dbc.Row([
         dbc.Col( html.H1(children='Yeah babe!'), width=2),
@@ -31,12 +38,11 @@ app.layout = dbc.Container(fluid=True, children=[
         dbc.Col( id="output", width=2),
         dbc.Col( dcc.Dropdown(
             id='demo-dropdown',
-            options=[
-                {'label': 'New York City', 'value': 'NYC'},
-                {'label': 'Montreal', 'value': 'MTL'},
-                {'label': 'San Francisco', 'value': 'SF'}
-            ],
-            value='NYC'), width=2)
+            # Variable shown in the choropleth
+            options=[{'label': label, 'value': var} for var, label in choropleth_vars.items()],
+            value='unemp'), width=2),
+        # Colour range currently displayed by the choropleth
+        dcc.Store(id='choropleth-range', data=[0, 12]),
     ]),
     # ================= First row of plots ===================
     # ================= Using plotly express https://plotly.com/python-api-reference/plotly.express.html
@@ -53,11 +59,12 @@ app.layout = dbc.Container(fluid=True, children=[
                               x="age", y="height", z="weight", title="Scatter3D")
         ), width=4),
         # https://plotly.com/python-api-reference/generated/plotly.express.scatter_geo.html#plotly.express.scatter_geo
-        dbc.Col(dcc.Graph(
+        dbc.Col([dcc.Graph(
             id='scattergeo',
-            figure=px.scatter_geo(DataFrame({"lat":age, "lon":height}),
-                                 lat="lat", lon="lon",  title="Scatter_Geo", projection="robinson")
-        ), width=4),
+            figure=geo_points.figure(lambda: px.scatter_geo(DataFrame({"lat":age, "lon":height}),
+                                                            lat="lat", lon="lon",  title="Scatter_Geo", projection="robinson"),
+                                     title="Scatter_Geo")
+        ), register_hover_callback(app, 'scattergeo', geo_points)], width=4),
     ]),
     # ================= Second row of plots ===================
     dbc.Row([
@@ -80,6 +87,8 @@ app.layout = dbc.Container(fluid=True, children=[
     ]),
 ])
 
+register_zoom_callback(app, 'scattergeo', geo_points, title="Scatter_Geo")
+
 # IMPORTANT READ THE OUTPUT
 # print(help(dcc.Dropdown))
 @app.callback(
@@ -89,6 +98,19 @@ def display_relayout_data(value):
     if value != None:
         return value
 
+# Switching the variable only sends the new z values (and the colour range if it changed) as a Patch,
+# the county GeoJSON stays in the browser
+@app.callback(
+    [Output('choromap', 'figure'),
+     Output('choropleth-range', 'data')],
+    [Input('demo-dropdown', 'value')],
+    [State('choropleth-range', 'data')],
+    prevent_initial_call=True)
+def switch_choropleth_variable(var_name, previous_range):
+    zrange = [0, 12] if var_name == 'unemp' else None
+    return choropleth_patch(df[var_name], zrange, previous_range, coloraxis='coloraxis',
+                            colorbar_title=choropleth_vars[var_name])
+
 if __name__ == '__main__':
     app.run(debug=True)
     # app.run(debug=False, port=8051, host='146.201.212.115')
\ No newline at end of file
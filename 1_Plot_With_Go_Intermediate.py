@@ -1,13 +1,16 @@
 """
 This example demonstrates intermediate-level plotting using Plotly Graph Objects.
 It shows how to create more customized plots like Scatter3D, ScatterGeo, Choropleth, and Surface plots.
+The figures are lazy: the layout only has placeholders, and each figure is built (once, then cached for
+every session) and sent when its graph scrolls into view.
 """
 import dash
 from urllib.request import urlopen
 import json
-from dash import dcc, html
+from dash import dcc, html, set_props
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import cmocean
 import numpy as np
 import plotly.graph_objects as go
@@ -16,6 +19,10 @@ from pandas import DataFrame
 import pandas as pd
 import numpy as np
 from data.Generate_Data_For_Examples import *
+from utils.Geo_Raster import GeoRaster, register_hover_callback, register_zoom_callback
+from utils.Figure_Patches import choropleth_patch, color_range
+from utils.Lazy_Graphs import lazy_graph, loaded
+from utils.Caching import memoize_callback, register_cache_route
 
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 
@@ -25,6 +32,29 @@ colors = {
 }
 
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+# Hits/misses of the cached figures (lazy_graph.<id>) at /cache-stats
+register_cache_route(app)
+
+# Scattergeo is drawn with SVG (no WebGL). Above POINT_BUDGET points the geo figures below are
+# datashaded on the server into an image under the map, re-rendered on zoom/pan, and the point nearest
+# to the cursor is shown below them
+geo_points = GeoRaster(age, height)
+geo_lines = GeoRaster(age, height, mode='lines')
+
+def choropleth_range(var_name):
+    return [0, 12] if var_name == 'unemp' else color_range(df[var_name])
+
+@memoize_callback(name='lazy_graph.choroplethmapbox', maxsize=len(choropleth_vars))
+def choropleth_figure(var_name):
+    zmin, zmax = choropleth_range(var_name)
+    return go.Figure(data=go.Choroplethmapbox(z=df[var_name], locations=df['fips'], geojson=counties, colorscale="Viridis", zmin=zmin, zmax=zmax,
+                                              colorbar_title=choropleth_vars[var_name]),
+                     layout=go.Layout(title="ChoroplethMapbox", mapbox_style="carto-positron", mapbox_zoom=3, mapbox_center = {"lat": 37.0902, "lon": -95.7129}))
+
+def load_choropleth(var_name):
+    # Built with the variable selected when the map is first seen, whose range the patches start from
+    set_props('choropleth-range', {'data': choropleth_range(var_name)})
+    return choropleth_figure(var_name)
 
 app.layout = dbc.Container(fluid=True, children=[
     dbc.Row([
@@ -33,83 +63,82 @@ app.layout = dbc.Container(fluid=True, children=[
         dbc.Col([html.H4("Dropdown Selection:"), html.Div(id="output", style={"border": "1px solid white", "padding": "10px", "color": "white"})], width=2),
         dbc.Col( dcc.Dropdown(
             id='demo-dropdown',
-            options=[
-                {'label': 'New York City', 'value': 'NYC'},
-                {'label': 'Montreal', 'value': 'MTL'},
-                {'label': 'San Francisco', 'value': 'SF'}
-            ],
-            value='NYC'), width=2)
+            # Variable shown in the choropleth
+            options=[{'label': label, 'value': var} for var, label in choropleth_vars.items()],
+            value='unemp'), width=2),
+        # Colour range currently displayed by the choropleth
+        dcc.Store(id='choropleth-range', data=[0, 12]),
     ]),
     # ================= First row of plots ===================
     # ================= Using graph objects https://plotly.com/python/reference/
     dbc.Row([
         # https://plotly.com/python-api-reference/generated/plotly.express.scatter.html#plotly.express.scatter
-        dbc.Col(dcc.Graph(
-            id='scatter',
-            figure=go.Figure(data=go.Scatter(x=age, y=height, mode="markers"), layout=go.Layout(title="Scatter"))
+        dbc.Col(lazy_graph(app, 'scatter',
+            lambda: go.Figure(data=go.Scatter(x=age, y=height, mode="markers"), layout=go.Layout(title="Scatter")),
+            title="Scatter"
         ), width=4),
         # https://plotly.com/python/reference/scatter3d/
-        dbc.Col(dcc.Graph(
-            id='scatter3d',
-             figure=go.Figure(data=go.Scatter3d(x=age, y=height, z=weight, mode="markers"), layout=go.Layout(title="Scatter3D"))
+        dbc.Col(lazy_graph(app, 'scatter3d',
+             lambda: go.Figure(data=go.Scatter3d(x=age, y=height, z=weight, mode="markers"), layout=go.Layout(title="Scatter3D")),
+             title="Scatter3D"
         ), width=4),
         # https://plotly.com/python/reference/scattergeo/
-        dbc.Col(dcc.Graph(
-            id='scattergeo',
-            figure=go.Figure(data=go.Scattergeo(lat=age, lon=height, mode="markers"), 
-                             layout=go.Layout(title="ScatterGeo"))
-        ), width=4),
+        dbc.Col([lazy_graph(app, 'scattergeo',
+            lambda: geo_points.figure(lambda: go.Figure(data=go.Scattergeo(lat=age, lon=height, mode="markers"),
+                                                        layout=go.Layout(title="ScatterGeo")), title="ScatterGeo"),
+            title="ScatterGeo"
+        ), register_hover_callback(app, 'scattergeo', geo_points)], width=4),
     ]),
     # ================= First row of plots ===================
     dbc.Row([
         # https://plotly.com/python/reference/image/
-        dbc.Col(dcc.Graph(
-            id='imshow',
-            figure=go.Figure(data=go.Image(z=255*np.random.random((200,200,3))), layout=go.Layout(title="Image (go.Image)"))
+        dbc.Col(lazy_graph(app, 'imshow',
+            lambda: go.Figure(data=go.Image(z=255*np.random.random((200,200,3))), layout=go.Layout(title="Image (go.Image)")),
+            title="Image (go.Image)"
         ), width=4),
 
         # https://plotly.com/python/reference/surface/
-        dbc.Col(dcc.Graph(
-            id='surface',
+        dbc.Col(lazy_graph(app, 'surface',
             # The link between the dataframe and the countries is trough the 'locations' attribute.
             # https://plotly.com/python/reference/layout/scene/
-            figure=go.Figure(data=go.Surface(z=Z), layout=go.Layout(title="Surface (go.Surface)", scene={
+            lambda: go.Figure(data=go.Surface(z=Z), layout=go.Layout(title="Surface (go.Surface)", scene={
                 'bgcolor':"rgb(250,0,0)",
                 "xaxis": {"nticks": 20},
                 "zaxis": {"nticks": 4},
                 'camera_eye': {"x": 0, "y": -1, "z": 0.5},
                 "aspectratio": {"x": 1, "y": 1, "z": 1}
-            }))
+            })),
+            title="Surface (go.Surface)"
 ), width=4),
     ]),
     # ================= Mapbox and Advanced Geo Plots ===================
     dbc.Row([
         # https://plotly.com/python/scattermapbox/
-        dbc.Col(dcc.Graph(
-            id='scattermapbox',
-            figure=go.Figure(data=go.Scattermapbox(lat=age, lon=height, mode='markers', marker=go.scattermapbox.Marker(size=9)),
-                             layout=go.Layout(title="ScatterMapbox", mapbox_style="open-street-map", mapbox_center_lat=np.mean(age), mapbox_center_lon=np.mean(height), mapbox_zoom=3))
+        dbc.Col(lazy_graph(app, 'scattermapbox',
+            lambda: go.Figure(data=go.Scattermapbox(lat=age, lon=height, mode='markers', marker=go.scattermapbox.Marker(size=9)),
+                              layout=go.Layout(title="ScatterMapbox", mapbox_style="open-street-map", mapbox_center_lat=np.mean(age), mapbox_center_lon=np.mean(height), mapbox_zoom=3)),
+            title="ScatterMapbox"
         ), width=4),
          # https://plotly.com/python/mapbox-density-heatmaps/
-        dbc.Col(dcc.Graph(
-            id='densitymapbox',
-            figure=go.Figure(data=go.Densitymapbox(lat=age, lon=height, z=weight, radius=10),
-                             layout=go.Layout(title="DensityMapbox", mapbox_style="open-street-map", mapbox_center_lat=np.mean(age), mapbox_center_lon=np.mean(height), mapbox_zoom=3))
+        dbc.Col(lazy_graph(app, 'densitymapbox',
+            lambda: go.Figure(data=go.Densitymapbox(lat=age, lon=height, z=weight, radius=10),
+                              layout=go.Layout(title="DensityMapbox", mapbox_style="open-street-map", mapbox_center_lat=np.mean(age), mapbox_center_lon=np.mean(height), mapbox_zoom=3)),
+            title="DensityMapbox"
         ), width=4),
         # https://plotly.com/python/lines-on-maps/
-        dbc.Col(dcc.Graph(
-            id='linegeo',
-            figure=go.Figure(data=go.Scattergeo(lat=age, lon=height, mode="lines", line=dict(width=2, color="blue")),
-                             layout=go.Layout(title="LineGeo (ScatterGeo lines)"))
-        ), width=4),
+        dbc.Col([lazy_graph(app, 'linegeo',
+            lambda: geo_lines.figure(lambda: go.Figure(data=go.Scattergeo(lat=age, lon=height, mode="lines", line=dict(width=2, color="blue")),
+                                                       layout=go.Layout(title="LineGeo (ScatterGeo lines)")),
+                                     title="LineGeo (ScatterGeo lines)"),
+            title="LineGeo (ScatterGeo lines)"
+        ), register_hover_callback(app, 'linegeo', geo_lines)], width=4),
     ]),
     dbc.Row([
         # https://plotly.com/python/choropleth-maps/#choroplethmapbox
-        dbc.Col(dcc.Graph(
-            id='choroplethmapbox',
-            # Using the same data as the choropleth example
-            figure=go.Figure(data=go.Choroplethmapbox(z=df['unemp'], locations=df['fips'], geojson=counties, colorscale="Viridis", zmin=0, zmax=12),
-                             layout=go.Layout(title="ChoroplethMapbox", mapbox_style="carto-positron", mapbox_zoom=3, mapbox_center = {"lat": 37.0902, "lon": -95.7129}))
+        # Using the same data as the choropleth example. load_choropleth sets the range of every session,
+        # so only choropleth_figure (not lazy_graph) caches the figures
+        dbc.Col(lazy_graph(app, 'choroplethmapbox', load_choropleth, states=[State('demo-dropdown', 'value')],
+                           title="ChoroplethMapbox", cache=False
         ), width=12),
     ]),
     dbc.Row([
@@ -130,6 +159,9 @@ Mapbox figures require a Mapbox access token for some styles, but 'open-street-m
     ])
 ])
 
+register_zoom_callback(app, 'scattergeo', geo_points, title="ScatterGeo")
+register_zoom_callback(app, 'linegeo', geo_lines, title="LineGeo (ScatterGeo lines)")
+
 # IMPORTANT READ THE OUTPUT
 # print(help(dcc.Dropdown))
 @app.callback(
@@ -138,8 +170,25 @@ Mapbox figures require a Mapbox access token for some styles, but 'open-street-m
 def display_relayout_data(value):
     if value is not None:
         return f"Selected: {value}"
-    return "Select a city"
+    return "Select a variable"
 
 
+# Switching the variable only sends the new z values (and the colour range if it changed) as a Patch,
+# the county GeoJSON stays in the browser. Before the map is loaded there is nothing to patch: it will be
+# built with the selected variable.
+@app.callback(
+    [Output('choroplethmapbox', 'figure'),
+     Output('choropleth-range', 'data')],
+    [Input('demo-dropdown', 'value')],
+    [State('choropleth-range', 'data'),
+     loaded('choroplethmapbox')],
+    prevent_initial_call=True)
+def switch_choropleth_variable(var_name, previous_range, map_loaded):
+    if not map_loaded:
+        raise PreventUpdate
+    zrange = [0, 12] if var_name == 'unemp' else None
+    return choropleth_patch(df[var_name], zrange, previous_range, coloraxis=None,
+                            colorbar_title=choropleth_vars[var_name])
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -6,7 +6,7 @@ It covers creating Heatmaps, Contours, and other complex visualizations by direc
 import dash
 from urllib.request import urlopen
 import json
-from dash import dcc, html
+from dash import dcc, html, Patch
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output
 import cmocean
@@ -19,6 +19,10 @@ import numpy as np
 from data.Generate_Data_For_Examples import *
 import xarray as xr
 import cmocean.cm as cmo
+from utils.Field_Stats import load_or_compute_stats
+import utils.Grid_Accessor  # registers the .grid accessor
+from utils.Hover_Data import typed_array
+from utils.Job_Manager import JobManager, background_callback, job_components, report_progress
 
 def cmocean_to_plotly(cmap, pl_entries):
     h = 1.0/(pl_entries-1)
@@ -36,12 +40,24 @@ thermal_rgb = cmocean_to_plotly(cmo.thermal, 255)
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
-ds = xr.open_mfdataset("/home/olmozavala/Dropbox/TestData/netCDF/GoM/*.nc", decode_times=False)
+data_files = "/home/olmozavala/Dropbox/TestData/netCDF/GoM/*.nc"
+ds = xr.open_mfdataset(data_files, decode_times=False)
 img_data = ds['surf_el'][0,:,:]
-lats = ds['lat'].values
-lons = ds['lon'].values
-dx = np.mean(np.diff(lons))
-dy = np.mean(np.diff(lats))
+n_times = ds['surf_el'].shape[0]
+# Other time steps are read in background jobs (process pool), see grid_time_step
+job_manager = JobManager()
+# Fixed colour range from the statistics of all the time steps (stored in GoM/field_stats.json)
+field_stats = load_or_compute_stats(data_files, ['surf_el'], ds=ds)
+zmin, zmax = field_stats.span('surf_el', 1, 99)
+lats = img_data.grid.lats
+lons = img_data.grid.lons
+# On a regular grid plotly only needs the origin and spacing instead of the full coordinate arrays
+if img_data.grid.is_regular:
+    lat0, lon0 = img_data.grid.origin
+    dy, dx = img_data.grid.spacing
+    grid_xy = dict(x0=lon0, dx=dx, y0=lat0, dy=dy)
+else:
+    grid_xy = dict(x=lons, y=lats)
 
 # %% Plot image with matplotib just for testing
 import matplotlib.pyplot as plt
@@ -93,10 +109,11 @@ app.layout = dbc.Container(fluid=True, children=[
             figure={'data':[ dict(
                     z=img_data.values,
                     type='heatmap', # type='heatmap' | 'heatmapgl'
-                    x=lons, y=lats,
+                    **grid_xy,
                     text="sopas",
                     hoverinfo="${z:0.2f}", # x,y,z,text,name
-                    colorscale=thermal_rgb
+                    colorscale=thermal_rgb,
+                    zmin=zmin, zmax=zmax,
                     )], 
                     'layout': {
                         'title': {'text': "Heatmap"},
@@ -128,8 +145,9 @@ app.layout = dbc.Container(fluid=True, children=[
             figure={'data':[ dict(
                     z=img_data.values,
                     type='contour',
-                    x=lons, y=lats,
-                    colorscale=thermal_rgb
+                    **grid_xy,
+                    colorscale=thermal_rgb,
+                    zmin=zmin, zmax=zmax,
                     )], 
                     'layout': {
                         'title': {'text': "Contour"},
@@ -142,7 +160,10 @@ app.layout = dbc.Container(fluid=True, children=[
     # ================= Third row Just outputs of callbacks ======
     dbc.Row([
         # https://plotly.com/python/reference/heatmap/
-        dbc.Col(html.Div("Sopas", id='heatmap-output'), width=6)
+        dbc.Col(html.Div("Sopas", id='heatmap-output'), width=6),
+        dbc.Col(dcc.Slider(id='time-slider', min=0, max=n_times - 1, step=1, value=0,
+                           marks={i: str(i) for i in range(0, n_times, max(1, n_times // 10))}), width=4),
+        dbc.Col(job_components('grid'), width=2),
         ]),
     # ================= Third row of plots ===================
     dbc.Row([
@@ -175,6 +196,30 @@ app.layout = dbc.Container(fluid=True, children=[
     ]),
 ])
 
+def grid_time_step(time_index):
+    """Background job: surface elevation of a time step (the full grid of the heatmap and contour)."""
+    report_progress(0.1, 'Reading')
+    # The job process opens the files itself (netCDF handles are not shared between processes)
+    with xr.open_mfdataset(data_files, decode_times=False) as source:
+        values = source['surf_el'][time_index,:,:].values.astype(np.float32)
+    report_progress(0.9, 'Sending')
+    return values
+
+def grid_patches(values):
+    """Only the new z (as a typed array) of the heatmap and the contour, the rest stays in the browser."""
+    patches = []
+    for _ in range(2):
+        patch = Patch()
+        patch['data'][0]['z'] = typed_array(values, 'f4')
+        patches.append(patch)
+    return patches
+
+# Moving the slider starts (or reuses) the job of that time step and cancels the one it replaces.
+# A job done before the data files changed is not reused.
+background_callback(app, job_manager, 'grid', [Output('heatmap', 'figure'), Output('imcontour', 'figure')],
+                    [Input('time-slider', 'value')], on_result=grid_patches,
+                    source_files=[data_files])(grid_time_step)
+
 # IMPORTANT READ THE OUTPUT
 # print(help(dcc.Dropdown))
 @app.callback(
@@ -2,12 +2,23 @@
 This example demonstrates a basic callback implementation with multiple outputs.
 It takes two text inputs and updates two different output divs accordingly.
 """
+import sys
+import os
+
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
 
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from utils.Caching import memoize_callback, register_cache_route
+from utils.Callback_Metrics import instrument_app
+
 # https://dash.plot.ly/getting-started-part-2
 app = dash.Dash(__name__)
+# Latency, payload sizes and errors of every callback at /metrics (Prometheus) and in a panel
+instrument_app(app)
+# Hits/misses of the memoized callbacks
+register_cache_route(app)
 
 app.layout = html.Div([
     dcc.Input(id='my-in1', value='initial value', type='text'),
@@ -25,6 +36,8 @@ app.layout = html.Div([
     [Input('my-in1', 'value'),
     Input('my-in2', 'value')]
 )
+# Same inputs, same outputs: they are cached (least recently used entries dropped, for at most 10 minutes)
+@memoize_callback(maxsize=128, ttl=600)
 def update_output_div(in1, in2):
     return F"You\'ve entered {in1} and {in2}", F"Second input: {in2}"   # It has two outputs, one for each div
 
@@ -3,16 +3,25 @@ This example shows how to handle interactive graph events.
 It demonstrates capturing Hover, Click, Selection, and Zoom/Relayout data from a Plotly graph.
 """
 import json
+import sys
+import os
 from textwrap import dedent as d
 
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
 
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from utils.Callback_Throttle import throttled_input, clientside_json, drop_stale, counted, register_rates_route
+from utils.Caching import memoize_callback, register_cache_route
+from utils.Callback_Metrics import instrument_app
+
 # https://dash.plot.ly/interactive-graphing
 
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
+# Latency, payload sizes and errors of every callback at /metrics (Prometheus) and in a panel
+instrument_app(app)
 
 styles = {
     'pre': {
@@ -21,6 +30,18 @@ styles = {
     }
 }
 
+# Hover fires continuously while the mouse moves: it is throttled in the browser (one request every 100 ms
+# plus a trailing one with the last point), and zoom/pan is debounced. Requests per callback are at /callback-rates
+hover_store, hover_input = throttled_input(app, 'basic-interactions', 'hoverData', wait_ms=100)
+relayout_store, relayout_input = throttled_input(app, 'basic-interactions', 'relayoutData', wait_ms=150,
+                                                 mode='debounce')
+register_rates_route(app)
+# Repeated events (the same point hovered or clicked again) reuse their formatted output, see /cache-stats
+register_cache_route(app)
+
+# The callbacks below only format the event as JSON. With CLIENTSIDE_FORMATTING they run in the browser instead
+CLIENTSIDE_FORMATTING = False
+
 # In this example we catch multiple callbacks for the same figure and update different fields depending on the event
 app.layout = html.Div([
     dcc.Graph(
@@ -51,6 +72,8 @@ app.layout = html.Div([
             }
         }
     ),
+    hover_store,
+    relayout_store,
 
     html.Div(className='row', children=[
         html.Div([
@@ -100,32 +123,45 @@ app.layout = html.Div([
 ])
 
 
-@app.callback(
-    Output('hover-data', 'children'),
-    [Input('basic-interactions', 'hoverData')])
-def display_hover_data(hoverData):
-    return json.dumps(hoverData, indent=2)
-
-
-@app.callback(
-    Output('click-data', 'children'),
-    [Input('basic-interactions', 'clickData')])
-def display_click_data(clickData):
-    return json.dumps(clickData, indent=2)
-
-
-@app.callback(
-    Output('selected-data', 'children'),
-    [Input('basic-interactions', 'selectedData')])
-def display_selected_data(selectedData):
-    return json.dumps(selectedData, indent=2)
-
-
-@app.callback(
-    Output('relayout-data', 'children'),
-    [Input('basic-interactions', 'relayoutData')])
-def display_relayout_data(relayoutData):
-    return json.dumps(relayoutData, indent=2)
+if CLIENTSIDE_FORMATTING:
+    for output_id, input_property in [('hover-data', 'hoverData'), ('click-data', 'clickData'),
+                                      ('selected-data', 'selectedData'), ('relayout-data', 'relayoutData')]:
+        clientside_json(app, output_id, 'basic-interactions', input_property)
+else:
+    @app.callback(
+        Output('hover-data', 'children'),
+        [hover_input])
+    @drop_stale('hover-data')
+    @memoize_callback(maxsize=256)
+    def display_hover_data(hoverData):
+        return json.dumps(hoverData, indent=2)
+
+
+    @app.callback(
+        Output('click-data', 'children'),
+        [Input('basic-interactions', 'clickData')])
+    @counted('click-data')
+    @memoize_callback(maxsize=256)
+    def display_click_data(clickData):
+        return json.dumps(clickData, indent=2)
+
+
+    @app.callback(
+        Output('selected-data', 'children'),
+        [Input('basic-interactions', 'selectedData')])
+    @counted('selected-data')
+    @memoize_callback(maxsize=256)
+    def display_selected_data(selectedData):
+        return json.dumps(selectedData, indent=2)
+
+
+    @app.callback(
+        Output('relayout-data', 'children'),
+        [relayout_input])
+    @drop_stale('relayout-data')
+    @memoize_callback(maxsize=256)
+    def display_relayout_data(relayoutData):
+        return json.dumps(relayoutData, indent=2)
 
 
 if __name__ == '__main__':
@@ -1,15 +1,26 @@
 """
 This example demonstrates hierarchical dynamic content generation.
 It shows how to create nested levels of buttons and content programmatically based on user interactions.
+Each click costs the same whatever the number of buttons: the counters live on the server (per session),
+a clientside relay forwards only the clicked button, and the new button is appended with a Patch.
+Levels start collapsed (except the first) and are shown one page at a time, so only the visible buttons
+are ever built as components, in the server and in the browser.
 """
 import json
+import threading
+import uuid
 from textwrap import dedent as d
 
 import dash
 import dash_bootstrap_components as dbc
-from dash import dcc, html, ctx, Input, Output, State, ALL, callback
+from dash import dcc, html, ctx, Input, Output, State, ALL, MATCH, callback, clientside_callback, Patch, set_props
 from dash.exceptions import PreventUpdate
 import numpy as np
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from utils.Caching import LRUCache
+from utils.Tree_View import LevelTree
 
 # https://dash.plotly.com/sharing-data-between-callbacks
 app = dash.Dash(
@@ -34,73 +45,192 @@ def add_nextlevel(level, id, width):
     return dbc.Col(
         dbc.Button(
             f"level: {level} number: {id}",
-            id={"type": f"level_{level}", "index": id},
-            color=[color_options[id % len(color_options)]],
+            id={"type": "level_button", "level": level, "index": id},
+            color=color_options[id % len(color_options)],
         ),
         width=width,
     )
 
-app.layout = dbc.Container(
-    [
-        dbc.Row(
-            dbc.Col(
-                html.H1("Hierarchical Generation", style={"textAlign": "center"}),
-                width={"size": 6, "offset": 3},
-            )
-        ),
-        dbc.Row(
-            html.Div(
+# Buttons of every level as counts, with the expanded levels and shown pages, per browser session
+# (the oldest sessions are dropped). Only the visible page of the expanded levels exists as components.
+session_trees = LRUCache(maxsize=10000)
+trees_lock = threading.Lock()
+PAGE_SIZE = 24
+
+def new_session_tree(session_id):
+    tree = LevelTree(page_size=PAGE_SIZE)
+    with trees_lock:
+        session_trees.put(session_id, tree)
+    return tree
+
+def session_tree(session_id):
+    """The tree of a session, None if it was lost (dropped as one of the oldest, server restarted, or
+    created by another server process)."""
+    with trees_lock:
+        return session_trees.get(session_id)
+
+def toggle_label(tree, level):
+    arrow = "\u25be" if tree.is_expanded(level) else "\u25b8"
+    return f"{arrow} Level {level} ({tree.count(level)} buttons)"
+
+def page_label(tree, level):
+    return f"{tree.page(level) + 1} / {tree.n_pages(level)}"
+
+def level_buttons(tree, level):
+    """The buttons of the shown page of a level, [] when it is collapsed."""
+    return [add_nextlevel(level, index, 2) for index in tree.visible(level)]
+
+def level_section(tree, level):
+    """Header (expand/collapse and pager) and body of a level."""
+    return html.Div(
+        [
+            dbc.Row(
+                [
+                    dbc.Col(dbc.Button(toggle_label(tree, level), id={"type": "level_toggle", "level": level},
+                                       color="link"), width="auto"),
+                    dbc.Col(dbc.ButtonGroup([
+                        dbc.Button("<", id={"type": "level_page", "level": level, "step": -1},
+                                   size="sm", outline=True),
+                        dbc.Button(page_label(tree, level), id={"type": "level_pager", "level": level},
+                                   size="sm", outline=True, disabled=True),
+                        dbc.Button(">", id={"type": "level_page", "level": level, "step": 1},
+                                   size="sm", outline=True),
+                    ]), width="auto"),
+                ],
+                align="center",
+            ),
+            dbc.Row(level_buttons(tree, level), id={"type": "level_body", "level": level}),
+        ],
+        id={"type": "level_section", "level": level},
+    )
+
+def lost_session(session_id, level=None):
+    """Full display_area of a session whose tree was lost: a new tree (with the button of `level` if it
+    is the first level) replaces every section the browser still shows, so none is added twice."""
+    tree = new_session_tree(session_id)
+    if level == 1:
+        tree.add(level)
+    notice = dbc.Alert("The session expired, the levels start again.", color="warning", dismissable=True)
+    return [notice] + [level_section(tree, shown) for shown in tree.levels]
+
+def add_button(session_id, level):
+    """Adds a button to `level`. Returns the Patch of display_area (a new section for a new level)
+    and the (id, props) updates of the existing section: its labels, and its body only if the
+    new button falls on the shown page of an expanded level."""
+    tree = session_tree(session_id)
+    if tree is None:
+        return lost_session(session_id, level), []
+    index = tree.add(level)
+    if index == 1:
+        children = Patch()
+        children.append(level_section(tree, level))
+        return children, []
+    updates = [({"type": "level_toggle", "level": level}, {"children": toggle_label(tree, level)}),
+               ({"type": "level_pager", "level": level}, {"children": page_label(tree, level)})]
+    if tree.is_visible(level, index):
+        body = Patch()
+        body.append(add_nextlevel(level, index, 2))
+        updates.append(({"type": "level_body", "level": level}, {"children": body}))
+    return dash.no_update, updates
+
+# A function as layout: every page load gets its own session id (and so its own counters)
+def serve_layout():
+    session_id = str(uuid.uuid4())
+    new_session_tree(session_id)
+    return dbc.Container(
+        [
+            dcc.Store(id="session_id", data=session_id),
+            # Last clicked generated button, written in the browser by the relay below
+            dcc.Store(id="level_click"),
+            dbc.Row(
                 dbc.Col(
-                    dbc.Button("Add Level", id="main_button", color="secondary"),
+                    html.H1("Hierarchical Generation", style={"textAlign": "center"}),
                     width={"size": 6, "offset": 3},
-                    align="center",
-                ),
-                style={"display": "flex", "justifyContent": "center"},
-            )
-        ),
-        dbc.Row(
-                dbc.Col([], width=12, id="display_area"))
-    ],
-    fluid=True,
-    id="container",
+                )
+            ),
+            dbc.Row(
+                html.Div(
+                    dbc.Col(
+                        dbc.Button("Add Level", id="main_button", color="secondary"),
+                        width={"size": 6, "offset": 3},
+                        align="center",
+                    ),
+                    style={"display": "flex", "justifyContent": "center"},
+                )
+            ),
+            dbc.Row(
+                    dbc.Col([], width=12, id="display_area"))
+        ],
+        fluid=True,
+        id="container",
+    )
+
+app.layout = serve_layout
+
+# The n_clicks of every generated button stay in the browser, only the clicked button reaches the server
+clientside_callback(
+    """
+    function(n_clicks) {
+        var triggered = dash_clientside.callback_context.triggered;
+        // Also fired when buttons are added (n_clicks is null for them)
+        if (!triggered.length || !triggered[0].value) {
+            return dash_clientside.no_update;
+        }
+        var id = dash_clientside.callback_context.triggered_id;
+        return {level: id.level, index: id.index, n_clicks: triggered[0].value};
+    }
+    """,
+    Output("level_click", "data"),
+    Input({"type": "level_button", "level": ALL, "index": ALL}, "n_clicks"),
+    prevent_initial_call=True,
 )
 
 @callback(
     Output("display_area", "children"),
-    State("display_area", "children"),
     Input("main_button", "n_clicks"),
-    Input({"type": "level_1", "index": ALL}, "n_clicks"),
+    Input("level_click", "data"),
+    State("session_id", "data"),
+    prevent_initial_call=True,
 )
-def display_relayout_data(prev_children, n_clicks, lev2_n_clicks_all):
+def display_relayout_data(n_clicks, level_click, session_id):
     triggered_id = ctx.triggered_id
-    print(triggered_id)
-    if triggered_id == None:
-        print("No triggered_id")
-        return []
-    elif triggered_id == 'main_button':
-        print(f"Main button clicked: {triggered_id} n_clicks: {n_clicks}")
-        if n_clicks == None:
-            return []
-        else:
-            # Get the first level of children. Verify how many rows (children) are in the first level
-            # If there are no childrens, create a new Row. If there are childrens, add a new column
-            new_col = add_nextlevel(1, n_clicks, 2)
-            if len(prev_children) == 0: # Return a new column
-                return [dbc.Row([new_col])]
-            else:
-                prev_children[0]["props"]["children"] = prev_children[0]["props"]["children"] + [new_col]
-                return prev_children
+    if triggered_id == 'main_button':
+        # The main button adds a button to the first level
+        level = 1
+    elif triggered_id == 'level_click' and level_click is not None:
+        # A button of level L adds a button to level L+1
+        level = level_click["level"] + 1
+    else:
+        raise PreventUpdate
+    children, updates = add_button(session_id, level)
+    for component_id, props in updates:
+        set_props(component_id, props)
+    return children
+
+# Expanding/collapsing a level or changing its page only renders that level's shown page
+@callback(
+    Output({"type": "level_body", "level": MATCH}, "children"),
+    Output({"type": "level_toggle", "level": MATCH}, "children"),
+    Output({"type": "level_pager", "level": MATCH}, "children"),
+    Input({"type": "level_toggle", "level": MATCH}, "n_clicks"),
+    Input({"type": "level_page", "level": MATCH, "step": ALL}, "n_clicks"),
+    State("session_id", "data"),
+    prevent_initial_call=True,
+)
+def show_level(toggle_clicks, page_clicks, session_id):
+    if not ctx.triggered or not ctx.triggered[0]["value"]:
+        raise PreventUpdate
+    level = ctx.triggered_id["level"]
+    tree = session_tree(session_id)
+    if tree is None:
+        # The sections shown are replaced, these outputs with them
+        set_props("display_area", {"children": lost_session(session_id)})
+        return dash.no_update, dash.no_update, dash.no_update
+    if ctx.triggered_id["type"] == "level_toggle":
+        tree.toggle(level)
     else:
-        curr_level = int(triggered_id["type"].split("_")[1])
-        lev2_clicks = np.array(lev2_n_clicks_all, dtype=np.float16)
-        lev2_clicks[lev2_clicks == None] = np.nan
-        max_lev2_clicks = np.nansum(lev2_clicks)
-        new_col = add_nextlevel(curr_level+1, int(max_lev2_clicks), 2)
-        if len(prev_children) <= curr_level: # In this case we don't have columns on the desired level
-            return prev_children + [dbc.Row([new_col])]
-        else:
-            prev_children[curr_level]["props"]["children"] = prev_children[curr_level]["props"]["children"] + [new_col]
-            return prev_children
+        tree.move_page(level, ctx.triggered_id["step"])
+    return level_buttons(tree, level), toggle_label(tree, level), page_label(tree, level)
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
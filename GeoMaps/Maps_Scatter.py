@@ -1,13 +1,13 @@
 """
 This example demonstrates how to create Geo maps (not Mapbox) using Plotly Express.
 It reads NetCDF data and visualizes it using `line_geo` (or scatter_geo) with various map projection configurations.
+Trajectories (drifters, ship tracks) are densified along great circles and simplified following the zoom.
 """
 import json
 from textwrap import dedent as d
 
 import dash
-import dash_core_components as dcc
-import dash_html_components as html
+from dash import dcc, html
 import plotly.graph_objects as go
 import plotly.express as px
 from dash.dependencies import Input, Output
@@ -15,18 +15,27 @@ import numpy as np
 import xarray as xr
 
 import pandas as pd
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Lazy_NetCDF import open_lazy
+from utils.Trajectories import SimplifiedTracks, zoom_for_geo_scale
+from utils.Geo_Raster import GeoRaster
+from utils.Callback_Metrics import instrument_app
 
 
 ## Reading the data
 file_name = "/home/olmozavala/Dropbox/TestData/netCDF/GoM_Separated_U_V/022GOMl0.04-1992_002_00_u.nc"
-data = xr.open_dataset(file_name)
-
-lats = data.Latitude.values
-lons = data.Longitude.values
+# Only the coordinates are needed here, so no variable is loaded and the file is closed afterwards
+with open_lazy(file_name) as data:
+    lats = data.Latitude.values
+    lons = data.Longitude.values
 
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
+# Latency, payload sizes and errors of every callback at /metrics (Prometheus) and in a panel
+instrument_app(app)
 
 styles = {
     'pre': {
@@ -41,27 +50,59 @@ styles = {
 
 # READ!!!!!! --> If you want to know all the possible attributes just add one, produce an error and look at the log (it will show you all the available properties)
 
+## Trajectories
+# Synthetic drifters (random walks) inside the domain of the file, one row per drifter. In plotly several
+# lines go in a single trace separated by NaN.
+n_drifters, n_steps = 200, 5000
+rng = np.random.default_rng(0)
+drifter_lats = lats.mean() + np.cumsum(rng.normal(0, 0.01, (n_drifters, n_steps)), axis=1)
+drifter_lons = lons.mean() + np.cumsum(rng.normal(0, 0.01, (n_drifters, n_steps)), axis=1)
+nan_column = np.full((n_drifters, 1), np.nan)
+# The long path of the original example plus the drifters. Its segments are densified along great circles
+# and every vertex gets its Douglas-Peucker importance once, zooming only filters the vertices.
+tracks = SimplifiedTracks(np.concatenate([[0, 15, 20, 35, np.nan], np.hstack([drifter_lats, nan_column]).ravel()]),
+                          np.concatenate([[5, 10, 25, 30, np.nan], np.hstack([drifter_lons, nan_column]).ravel()]))
+geo_lon_span = 150  # Longitudes shown by the 'north america' scope at scale 1
+geo_width_px = 1000
+# When even the simplified vertices are above POINT_BUDGET, all the vertices are datashaded into an image
+tracks_raster = GeoRaster(tracks.lats, tracks.lons, mode='lines')
+
 # fig = go.Figure(go.Scattergeo())  # or px.scatter_geo, px_.line_geo or px.choropleth
-fig = px.line_geo(lat=[0,15,20,35], lon=[5,10,25,30])  # or px.scatter_geo, px_.line_geo or px.choropleth
-
-## Example in how to add stuff into the map
-fig.update_geos(
-    visible=False,  # Hides the background map
-    resolution=50,   # Resolution (smaller resolution has more detail)
-    ## ======= Position of map
-    # center=dict(lon=0, lat=0),
-    # projection_rotation=dict(lon=30, lat=30, roll=30),
-    # lataxis_range=[-80,80], lonaxis_range=[-180,180],
-    scope="north america",  # The available scopes are: 'world', 'usa', 'europe', 'asia', 'africa', 'north america', 'south america'.
-    ## ======= Features
-    showcoastlines=True, coastlinecolor="grey",
-    showland=True, landcolor="LightGrey",
-    showocean=True, oceancolor="LightBlue",
-    showlakes=True, lakecolor="Blue",
-    # projection_type="orthographic",  # 'equirectangular', 'mercator', 'orthographic', 'natural earth', 'kavrayskiy7', 'miller', 'robinson', 'eckert4', 'azimuthal equal area', 'azimuthal equidistant', 'conic equal area', 'conic conformal', 'conic equidistant', 'gnomonic', 'stereographic', 'mollweide', 'hammer', 'transverse mercator', 'albers usa', 'winkel tripel', 'aitoff' and 'sinusoidal'.
-    # showrivers=True, rivercolor="Blue",
-    showcountries=True, countrycolor="black"
-)
+# fig = px.line_geo(lat=[0,15,20,35], lon=[5,10,25,30])  # or px.scatter_geo, px_.line_geo or px.choropleth
+
+def make_figure(relayoutData=None):
+    scale = (relayoutData or {}).get('geo.projection.scale', 1)
+    track_lats, track_lons = tracks.at_zoom(zoom_for_geo_scale(scale, geo_lon_span, geo_width_px))
+    return tracks_raster.figure(lambda: make_vector_figure(track_lats, track_lons), relayoutData,
+                                n_points=track_lats.size, width=geo_width_px, height=600)
+
+def make_vector_figure(track_lats, track_lons):
+    fig = go.Figure(go.Scattergeo(lat=track_lats, lon=track_lons, mode='lines', line=dict(width=1),
+                                  name=f"{np.isfinite(track_lats).sum()} of {len(tracks)} vertices"))
+    # Keeps the user's zoom/pan when the vertices are replaced
+    fig.update_layout(uirevision='keep', showlegend=True)
+
+    ## Example in how to add stuff into the map
+    fig.update_geos(
+        visible=False,  # Hides the background map
+        resolution=50,   # Resolution (smaller resolution has more detail)
+        ## ======= Position of map
+        # center=dict(lon=0, lat=0),
+        # projection_rotation=dict(lon=30, lat=30, roll=30),
+        # lataxis_range=[-80,80], lonaxis_range=[-180,180],
+        scope="north america",  # The available scopes are: 'world', 'usa', 'europe', 'asia', 'africa', 'north america', 'south america'.
+        ## ======= Features
+        showcoastlines=True, coastlinecolor="grey",
+        showland=True, landcolor="LightGrey",
+        showocean=True, oceancolor="LightBlue",
+        showlakes=True, lakecolor="Blue",
+        # projection_type="orthographic",  # 'equirectangular', 'mercator', 'orthographic', 'natural earth', 'kavrayskiy7', 'miller', 'robinson', 'eckert4', 'azimuthal equal area', 'azimuthal equidistant', 'conic equal area', 'conic conformal', 'conic equidistant', 'gnomonic', 'stereographic', 'mollweide', 'hammer', 'transverse mercator', 'albers usa', 'winkel tripel', 'aitoff' and 'sinusoidal'.
+        # showrivers=True, rivercolor="Blue",
+        showcountries=True, countrycolor="black"
+    )
+    return fig
+
+fig = make_figure()
 
 
 app.layout = html.Div([
@@ -77,6 +118,16 @@ def display_hover_data(clickedData):
     print("Clicked")
     return F"Clicked {clickedData}"
 
+# Zooming a Geo map changes geo.projection.scale, the vertices are filtered again for the new scale
+@app.callback(
+    Output('id_map', 'figure'),
+    [Input('id_map', 'relayoutData')],
+    prevent_initial_call=True)
+def update_tracks(relayoutData):
+    if not relayoutData or 'geo.projection.scale' not in relayoutData:
+        raise dash.exceptions.PreventUpdate
+    return make_figure(relayoutData)
+
 #
 # @app.callback(
 #     Output('click-data', 'children'),
@@ -2,16 +2,27 @@
 This example demonstrates how to use the dcc.Upload component.
 It shows how to parse and display uploaded file contents (images and text) with their metadata.
 """
+import asyncio
 import datetime
+import sys
+import os
 
 import dash
+from dash import dcc, html
 from dash.dependencies import Input, Output, State
-import dash_core_components as dcc
-import dash_html_components as html
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from utils.Callback_Metrics import instrument_app
+from utils.Async_Serving import asgi_app, async_callback, decode_upload
 
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
+# Latency, payload sizes (uploads are large requests) and errors of every callback at /metrics and in a panel
+instrument_app(app)
+# On an event loop, large uploads are decoded without holding a worker thread each:
+# uvicorn IO_Files:asgi --port 8050
+asgi = asgi_app(app)
 
 app.layout = html.Div([
     dcc.Upload(
@@ -37,10 +48,11 @@ app.layout = html.Div([
 ])
 
 
-def parse_contents(contents, filename, date):
+def parse_contents(contents, filename, date, content_type, size):
     return html.Div([
         html.H5(filename),
         html.H6(datetime.datetime.fromtimestamp(date)),
+        html.H6(f"{content_type or 'unknown type'}, {size} bytes"),
 
         # HTML images accept base64 encoded strings in the same format
         # that is supplied by the upload
@@ -58,11 +70,14 @@ def parse_contents(contents, filename, date):
               [Input('upload-image', 'contents')],
               [State('upload-image', 'filename'),
               State('upload-image', 'last_modified')])
-def update_output(list_of_contents, list_of_names, list_of_dates):
+@async_callback
+async def update_output(list_of_contents, list_of_names, list_of_dates):
     if list_of_contents is not None:
+        # The files of an upload are decoded concurrently, off the event loop
+        decoded = await asyncio.gather(*[decode_upload(c) for c in list_of_contents])
         children = [
-            parse_contents(c, n, d) for c, n, d in
-            zip(list_of_contents, list_of_names, list_of_dates)]
+            parse_contents(c, n, d, content_type, len(data)) for c, n, d, (content_type, data) in
+            zip(list_of_contents, list_of_names, list_of_dates, decoded)]
         return children
 
 
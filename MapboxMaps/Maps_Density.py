@@ -1,30 +1,40 @@
 """
 This example demonstrates how to create a Density Mapbox.
 It reads NetCDF data using xarray and visualizes it as a density heatmap on a mapbox style map.
+The field is binned on the server with a cell size that follows the zoom, and only the cells
+inside the viewport are sent, so the browser never receives more than max_points points.
 """
 import json
 from textwrap import dedent as d
 import numpy as np
+import sys
+import os
 
 import dash
-import dash_core_components as dcc
-import dash_html_components as html
+from dash import dcc, html
 from dash.dependencies import Input, Output
 
 import xarray as xr
 
 import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Binning import bin_grid, viewport_from_relayout, zoom_cell_size
+from utils.Lazy_NetCDF import open_lazy, read_slice
+from utils.Callback_Metrics import instrument_app
 
 # https://dash.plot.ly/interactive-graphing
 # https://plot.ly/python-api-reference/   (ploty API)
 # https://plot.ly/python-api-reference/generated/plotly.graph_objects.Figure.html#plotly.graph_objects.Figure
 
 file_name = "/home/olmozavala/Dropbox/TestData/netCDF/GoM_Separated_U_V/022GOMl0.04-1992_002_00_u.nc"
-data = xr.open_dataset(file_name)
+# Opened lazily: only the coordinates are read here
+data = open_lazy(file_name)
 
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
+# Latency, payload sizes and errors of every callback at /metrics (Prometheus) and in a panel
+instrument_app(app)
 
 styles = {
     'pre': {
@@ -36,47 +46,48 @@ styles = {
 lats = data.Latitude.values
 lons = data.Longitude.values
 
-LONS, LATS = np.meshgrid(lons, lats)
-
-lats_all = LATS.flatten()
-lons_all = LONS.flatten()
-
-u = data.u.values[0,0,:,:]
+# Select the first time and depth before reading, instead of data.u.values[0,0,:,:]
+# which loads every time/depth level of u just to keep one of them
+u = read_slice(data.u, time=0, depth=0)
 minu = np.nanmin(u)
 maxu = np.nanmax(u)
-vals = (u.flatten() - minu)/(maxu - minu)
-notnan = np.logical_not(np.isnan(vals))
+vals = (u - minu)/(maxu - minu)
 
-app.layout = html.Div([
-    dcc.Graph(
-        id="id-map",
-        figure=dict(
+# Maximum number of aggregated cells sent to the browser per update
+max_points = 20000
+init_center = dict(lat=38.72490, lon=-95.61446)
+init_zoom = 3.5
+
+def make_figure(relayoutData=None):
+    # Bin size follows the zoom (~8 pixels per cell) and only the viewport is aggregated
+    viewport = viewport_from_relayout(relayoutData, init_center, init_zoom)
+    lat_bins, lon_bins, z_bins = bin_grid(lons, lats, vals, viewport, zoom_cell_size(viewport[4]), max_points)
+    return dict(
             # https://plot.ly/python-api-reference/generated/plotly.graph_objects.Densitymapbox.html
             data=[
                 dict(
                     # lat=np.arange(37.5, 41.5, .5),
                     # lon=np.arange(-95.5, -99.5, -.5),
                     # z=[1, .9, .8, .7, .3, .1, 0],
-                    lat=lats_all[notnan],
-                    lon=lons_all[notnan],
-                    z=vals[notnan],
+                    lat=lat_bins,
+                    lon=lon_bins,
+                    z=z_bins,
+                    zmin=0, zmax=1,
                     type="densitymapbox",
                     # scattermapbox, choroplethmapbox, densitymapbox, scattergeo
-                    radius=1,
+                    radius=8,  # In pixels, matches the size of the bins
                     colorscale=[[0, 'rgb(0,0,255)'], [1, 'rgb(255,0,0)']],
                 )
             ],
             layout=dict(
                 mapbox=dict(
                     layers=[],
-                    center=dict(
-                        lat=38.72490, lon=-95.61446
-                    ),
+                    center=init_center,
                     style='open-street-map',
                     # open-street-map, white-bg, carto-positron, carto-darkmatter,
                     # stamen-terrain, stamen-toner, stamen-watercolor
                     pitch=0,
-                    zoom=3.5,
+                    zoom=init_zoom,
                 ),
                 annotations=[dict(
                     arrowcolor='red',
@@ -91,10 +102,25 @@ app.layout = html.Div([
                     font=dict(color="#2cfec1"),
                 )],
                 autosize=True,
+                # Keeps the current center/zoom when the figure is replaced with new bins
+                uirevision='keep',
             )
         )
+
+app.layout = html.Div([
+    dcc.Graph(
+        id="id-map",
+        figure=make_figure(),
+        config={'scrollZoom': True}
     ),
 ])
 
+@app.callback(
+    Output('id-map', 'figure'),
+    [Input('id-map', 'relayoutData')],
+    prevent_initial_call=True)
+def update_bins(relayoutData):
+    return make_figure(relayoutData)
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -3,8 +3,10 @@ This example demonstrates how to overlay raster images on a Mapbox map.
 It uses Datashader to shade xarray data and projects it as an image layer on the map.
 """
 # %%
+import base64
+import io
 import dash
-from dash import html, dcc, Input, Output
+from dash import html, dcc, Input, Output, State, Patch
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output
 import datashader.transfer_functions as tf
@@ -12,13 +14,37 @@ import colorcet as cc
 from textwrap import dedent as d
 import xarray as xr
 import numpy as np
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Field_Stats import load_or_compute_stats
+from utils.Regridding import MERCATOR_MIN, MERCATOR_MAX, mercator_axes, get_regridder
+import utils.Grid_Accessor  # registers the .grid accessor
+from utils.Shared_Arrays import shared_array, ready_shared_array, array_key, register_rss_route
+from utils.Caching import memoize_callback, register_cache_route
+from utils.Job_Manager import JobManager, background_callback, job_components, report_progress
+from utils.Callback_Metrics import instrument_app
 
 # https://dash.plot.ly/interactive-graphing
 # https://plot.ly/python-api-reference/
 
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+# Latency, payload sizes and errors of every callback at /metrics (Prometheus) and in a panel
+instrument_app(app)
+# Process pool and disk store of the heavy jobs, shared by the workers through JOB_STORE_DIR
+job_manager = JobManager()
+# For several worker processes: gunicorn -w 4 -b :8053 --chdir MapboxMaps Maps_Raster:server
+server = app.server
+# Memory of every worker at /rss, hits/misses of the memoized callbacks at /cache-stats
+register_rss_route(app)
+register_cache_route(app)
 
-ds = xr.open_dataset("/home/olmozavala/Dropbox/TestData/netCDF/gfs.nc", decode_times=False)
+file_name = "/home/olmozavala/Dropbox/TestData/netCDF/gfs.nc"
+var_name = 'TMP_P0_2L106_GLL0'
+ds = xr.open_dataset(file_name, decode_times=False)
+# Global statistics over all times/levels (computed once and stored next to the file).
+# Using them as a fixed span keeps the colours consistent between time steps.
+field_stats = load_or_compute_stats(file_name, [var_name], ds=ds)
 # print(ds.data_vars.values())
 # %%
 # # agg is an xarray object, see http://xarray.pydata.org/en/stable/ for more details
@@ -45,42 +71,48 @@ to_latlon = Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
 
 # 2. Define grid in Web Mercator (meters)
 # Mapbox Web Mercator bounds
-mercator_min = -20037508.34
-mercator_max = 20037508.34
-# Create a grid (e.g., 1000x1000 resolution)
-x = np.linspace(mercator_min, mercator_max, 2000)
-y = np.linspace(mercator_min, mercator_max, 2000)
-xv, yv = np.meshgrid(x, y)
+mercator_min = MERCATOR_MIN
+mercator_max = MERCATOR_MAX
+# Create a grid (e.g., 2000x2000 resolution). The regridder splits it into row tiles that run
+# on all the cores, so larger values (e.g. 8000) are still practical.
+N = 2000
 
-# 3. Transform Web Mercator grid points back to Lat/Lon
-lon_grid, lat_grid = to_latlon.transform(xv, yv)
+# 3. Transform Web Mercator grid axes back to Lat/Lon
+# Lon only depends on x and lat only on y, so we only transform (and cache) two 1D axes
+x, y, lon_axis, lat_axis = mercator_axes(N)
 
 # 4. Interpolate original data at these Lat/Lon points
-# We need to construct an xarray DataArray for the target coordinates to use .interp() efficiently
-# Or we can pass the 2D arrays directly if dimensions match known logic, but xarray likes specific coords.
-# A simpler way with xarray is to verify the input data is sorted and distinct.
-# ds is already sorted by lon_0 from previous steps if we kept that? 
-# No, we reverted. So we might need to handle the 0-360 vs -180-180 for interpolation continuity.
-# GFS is 0-360. Our target lon_grid is -180 to 180.
-# The .interp method naturally handles out-of-bounds with NaNs unless we handle wrapping.
-# To handle wrapping correctly, we should align the source data to -180..180 or append 360.
-# Let's adjust source to -180..180 for safer interpolation with typical map libraries.
-data_slice = ds['TMP_P0_2L106_GLL0'][0,:,:]
-# Adjust data longitude to -180 to 180 for interpolation lookup
-data_slice.coords['lon_0'] = (data_slice.coords['lon_0'] + 180) % 360 - 180
-data_slice = data_slice.sortby('lon_0')
-
-# Create xarray DataArrays for the new grid coordinates
-# We can't pass 2D arrays directly to lat_0/lon_0 in interp like this easily if they aren't rectilinear.
-# But lat/lon grid IS regular in Mercator, NOT in Lat/Lon.
-# So we pass the 2D arrays as 'new coordinates'.
-target_lat = xr.DataArray(lat_grid, dims=("y", "x"))
-target_lon = xr.DataArray(lon_grid, dims=("y", "x"))
-
-ds_reprojected = data_slice.interp(lat_0=target_lat, lon_0=target_lon)
-
-img = tf.shade(ds_reprojected, cmap=cc.rainbow)
-print(f"Image properties: {img}")
+# GFS is 0-360 and our target lons are -180 to 180. The regridder wraps the longitude
+# periodically, so there is no need to shift and sort the source (and no gap at the seam).
+# The interpolation plan (indices and weights) is cached and reused for every time step.
+# Reprojection and shading run as background jobs (one per level) in a process pool, see render_raster
+grid = ds[var_name][0,:,:].grid
+n_levels = ds[var_name].shape[0]
+
+def level_key(level):
+    return array_key('gfs_mercator', file_name, var_name, level, N)
+
+def regrid_level(level):
+    """Reprojected field of a level. It is computed once (by the first worker or job) into shared memory and
+    every process maps the same read-only copy, instead of holding N x N floats each."""
+    def regrid_slice():
+        # The job processes read the file themselves (netCDF handles are not shared between processes)
+        with xr.open_dataset(file_name, decode_times=False) as source:
+            values = source[var_name][level,:,:].values
+        regridder = get_regridder(grid.lats, grid.lons, lat_axis, lon_axis, periodic_lon=grid.is_global_lon)
+        return regridder(values)
+    return shared_array(level_key(level), regrid_slice, source_files=[file_name])
+
+def render_raster(level):
+    """Background job: reprojection and shading of a level, returns the PNG (data URI) of the image layer."""
+    report_progress(0.05, 'Reprojecting')
+    ds_reprojected = xr.DataArray(regrid_level(level), dims=("y", "x"), coords={"y": y, "x": x})
+    report_progress(0.6, 'Shading')
+    img = tf.shade(ds_reprojected, cmap=cc.rainbow, how='linear', span=field_stats.span(var_name, 1, 99))
+    report_progress(0.8, 'Encoding')
+    buffer = io.BytesIO()
+    img.to_pil().save(buffer, format='PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
 
 # 5. Define coordinates for the image layer
 # These must be the Lat/Lon corners of the image.
@@ -90,16 +122,15 @@ print(f"Image properties: {img}")
 max_lat_merc = 85.051129
 coordinates = [[-180, max_lat_merc], [180, max_lat_merc], [180, -max_lat_merc], [-180, -max_lat_merc]]
 
-print(f"Done!")
-
 # Create a subsampled grid for interactivity (invisible points to capture clicks)
 # Original grid is 2000x2000 which is 4M points (too many for scattermapbox)
 # Subsample by taking every 20th point (100x100 = 10k points) or 40th (50x50 = 2.5k)
 # 4M points is heavy for browser. 
 # Let's try 50x50 grid for interaction.
 step = 40 
-lat_flat = lat_grid[::step, ::step].flatten()
-lon_flat = lon_grid[::step, ::step].flatten()
+lon_sub, lat_sub = np.meshgrid(lon_axis[::step], lat_axis[::step])
+lat_flat = lat_sub.flatten()
+lon_flat = lon_sub.flatten()
 
 # %%
 fig = dict(
@@ -133,13 +164,8 @@ fig = dict(
     layout=dict(
         # https://plotly.com/python/reference/#layout-mapbox
         mapbox=dict(
-            layers=[{
-                "sourcetype": "image",
-                "source": img.to_pil(),
-                "coordinates": coordinates,
-                "type": "raster",
-                "below": "traces"
-            }],
+            # The image layer arrives when its job finishes (raster_layer)
+            layers=[],
             center=dict(
                 lat=0, lon=0
                 # lat=20, lon=0
@@ -167,6 +193,11 @@ the_map = dcc.Graph(figure=fig, id="id-map", config={'scrollZoom': True})
 app.layout = dbc.Container(
                     [
                         dbc.Row(dbc.Col(the_map, width=12)),
+                        dbc.Row([
+                            dbc.Col(dcc.Slider(id='level-slider', min=0, max=n_levels - 1, step=1, value=0,
+                                               marks={i: f"Level {i}" for i in range(n_levels)}), width=8),
+                            dbc.Col(job_components('raster'), width=4),
+                        ]),
                         dbc.Row([
                             dbc.Col([
                                 dcc.Markdown(d("""
@@ -178,37 +209,71 @@ app.layout = dbc.Container(
                         ]),
                   ])
 
+def raster_layer(source):
+    """Patch replacing the image layer of the map with the result of render_raster."""
+    patch = Patch()
+    patch['layout']['mapbox']['layers'] = [{"sourcetype": "image", "source": source, "coordinates": coordinates,
+                                            "type": "raster", "below": "traces"}]
+    return patch
+
+# Changing the level starts (or reuses) its job, the progress bar follows it and the map gets the new layer.
+# A job done before the data file changed is not reused.
+background_callback(app, job_manager, 'raster', Output('id-map', 'figure'), [Input('level-slider', 'value')],
+                    on_result=raster_layer, source_files=[file_name])(render_raster)
+
+def click_key(clickData, level):
+    """Cache key of a click: the location as displayed (4 decimals), the level and the version of the data file."""
+    if clickData is None:
+        return None
+    pt = clickData['points'][0]
+    return f"{pt['lat']:.4f},{pt['lon']:.4f},{level},{os.path.getmtime(file_name)}"
+
+class LevelLoading(Exception):
+    """The reprojected level is not in shared memory yet (its job is running)."""
+
 @app.callback(
     Output('hover-data', 'children'),
-    [Input('id-map', 'clickData')])
-def display_click_data(clickData):
+    [Input('id-map', 'clickData')],
+    [State('level-slider', 'value')])
+def display_click_data(clickData, level):
     if clickData is None:
         return "Click on the map to see value"
-    
+    try:
+        return click_text(clickData, level)
+    except LevelLoading:
+        # Not cached (exceptions never are): the next click once the job is done shows the value
+        pt = clickData['points'][0]
+        return f"Clicked Location: {pt['lat']:.4f}, {pt['lon']:.4f} | Level {level} still loading"
+
+# Clicks on the same location give the same text: cached in memory and on disk for the other workers
+@memoize_callback(maxsize=1024, disk=True, key=click_key)
+def click_text(clickData, level):
     # Extract lat/lon from click data
     pt = clickData['points'][0]
     lat = pt['lat']
     lon = pt['lon']
     
     # Transform to Web Mercator to find logical index in our grid
-    mx, my = to_mercator.transform(lat, lon)
+    mx, my = to_mercator.transform(lon, lat)
     
     # Calculate indices
     # We used 2000 points from mercator_min to mercator_max
     # x = np.linspace(mercator_min, mercator_max, 2000)
     # index = (value - min) / (max - min) * (N - 1)
     
-    # Grid parameters used in generation
-    N = 2000
-    # global mercator_min, mercator_max # defined in main scope
+    # Grid parameters used in generation (N, mercator_min, mercator_max) are defined in main scope
     
     ix = int((mx - mercator_min) / (mercator_max - mercator_min) * (N - 1))
     iy = int((my - mercator_min) / (mercator_max - mercator_min) * (N - 1))
     
     # Boundary checks
     if 0 <= ix < N and 0 <= iy < N:
-        # ds_reprojected has dims (y, x)
-        val = ds_reprojected.isel(y=iy, x=ix).values
+        # The reprojected level has dims (y, x). It is only read if its job already put it in shared
+        # memory: the regrid never runs in the request thread
+        values = ready_shared_array(level_key(level), source_files=[file_name])
+        if values is None:
+            raise LevelLoading
+        val = values[iy, ix]
         return f"Clicked Location: {lat:.4f}, {lon:.4f} | Temperature: {val:.2f} K"
     else:
         return f"Clicked Location: {lat:.4f}, {lon:.4f} | Value: Out of bounds"
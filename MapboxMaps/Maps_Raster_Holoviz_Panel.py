@@ -9,6 +9,12 @@ import geoviews as gv
 import panel as pn
 from holoviews.operation.datashader import rasterize
 import cartopy.crs as ccrs
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import utils.Grid_Accessor  # registers the .grid accessor
+from utils.Caching import LRUCache, quantize_viewport
+from utils.Regridding import mercator_axes, mercator_to_lonlat, lonlat_to_mercator, get_regridder
 
 # Initialize HoloViews and Panel
 hv.extension('bokeh') # Using Bokeh for Panel as it's more feature-rich for HoloViz
@@ -19,15 +25,33 @@ ds = xr.open_dataset("/home/olmozavala/Dropbox/TestData/netCDF/gfs.nc", decode_t
 data_slice = ds['TMP_P0_2L106_GLL0'][0,:,:]
 
 # 2. Adjust Coordinates (0-360 to -180-180)
-data_slice.coords['lon_0'] = (data_slice.coords['lon_0'] + 180) % 360 - 180
-data_slice = data_slice.sortby('lon_0')
+# Rolled (lazy) view instead of rewriting the coordinate and sorting a full copy
+data_slice = data_slice.grid.pm180()
 
 # 3. Create HoloViz Visualization
-# Define the Image element
-img_el = gv.Image(data_slice, kdims=['lon_0', 'lat_0'], vdims=['TMP_P0_2L106_GLL0'], crs=ccrs.PlateCarree())
+# Project once to the Web Mercator grid of the tiles, so each pan/zoom only has to aggregate
+# (no per-render reprojection). The regridder interpolation plan is cached.
+N = 2000
+x, y, lon_axis, lat_axis = mercator_axes(N)
+grid = data_slice.grid
+regridder = get_regridder(grid.lats, grid.lons, lat_axis, lon_axis, periodic_lon=grid.is_global_lon)
+img_el = gv.Image((x, y, regridder(data_slice.values)), kdims=['x', 'y'], vdims=['TMP_P0_2L106_GLL0'],
+                  crs=ccrs.GOOGLE_MERCATOR)
 
-# Rasterize using datashader
-rasterized = rasterize(img_el).opts(
+# Rasterize using datashader, caching the aggregates of recent viewports.
+# Ranges are snapped outwards to a power-of-two grid and sizes to multiples of 64 px, so
+# near-identical viewports (and pans back to a recent view) reuse the same aggregate.
+render_cache = LRUCache(maxsize=32)
+
+def render_viewport(x_range, y_range, width, height, scale=1):
+    x_range = x_range or img_el.range('x')
+    y_range = y_range or img_el.range('y')
+    key = quantize_viewport(x_range, y_range, width or 800, height or 500)
+    qx, qy, qwidth, qheight = key
+    return render_cache.get_or_compute(
+        key, lambda: rasterize(img_el, x_range=qx, y_range=qy, width=qwidth, height=qheight, dynamic=False))
+
+rasterized = hv.DynamicMap(render_viewport, streams=[hv.streams.RangeXY(), hv.streams.PlotSize()]).opts(
     cmap='rainbow', alpha=0.7, 
     colorbar=True, width=800, height=500,
     title="Global Temperature (GFS) - HoloViz (Panel)"
@@ -39,18 +63,20 @@ plot = (tiles * rasterized).opts(active_tools=['wheel_zoom', 'pan'], tools=['tap
 
 # 4. Interactivity with Tap stream
 # Panel handles HoloViews streams natively
-# Assign the Tap stream to the base Image element to ensure it captures events
-# even when rasterized/overlaid.
-tap = hv.streams.Tap(source=img_el, x=-84, y=30) # Default starting point
+# The Tap stream is attached to the rasterized element, so it reports Web Mercator meters.
+tap_x, tap_y = lonlat_to_mercator(-84, 30) # Default starting point
+tap = hv.streams.Tap(source=rasterized, x=float(tap_x), y=float(tap_y))
 
 # Define a function to update a text element on tap
 def get_point_value(x, y):
     if x is None or y is None:
         return "## Click on the map to see details"
     try:
-        # Query GFS data at tapped location
-        val = data_slice.sel(lat_0=y, lon_0=x, method='nearest').values
-        return f"### Clicked Location\n**Lat:** {y:.4f} | **Lon:** {x:.4f}\n\n**Temperature:** {val:.2f} K"
+        # Query GFS data at tapped location. The regular-grid index of the accessor turns the
+        # lookup into arithmetic on the origin/spacing instead of an index search per tap.
+        lon, lat = mercator_to_lonlat(x, y)
+        val = data_slice.grid.value_at(lat, lon)
+        return f"### Clicked Location\n**Lat:** {lat:.4f} | **Lon:** {lon:.4f}\n\n**Temperature:** {val:.2f} K"
     except Exception as e:
         return f"Error: {e}"
 
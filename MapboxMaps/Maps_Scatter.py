@@ -13,11 +13,21 @@ import plotly.express as px
 import numpy as np
 
 import pandas as pd
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Binning import viewport_from_relayout
+from utils.Spatial_Index import GridIndex
+from utils.Hover_Data import hover_traces
+from utils.Callback_Throttle import throttled_input, clientside_json, drop_stale, counted, register_rates_route
+from utils.Callback_Metrics import instrument_app
 
 # https://dash.plot.ly/interactive-graphing
 # https://plot.ly/python-api-reference/
 
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+# Latency, payload sizes and errors of every callback at /metrics (Prometheus) and in a panel
+instrument_app(app)
 
 # The annotation in the upper right corner of th emap
 my_anotation = dict(
@@ -38,17 +48,48 @@ my_anotation = dict(
 # https://plotly.github.io/plotly.py-docs/generated/plotly.express.scatter_mapbox.html
 # https://plotly.com/python-api-reference/generated/plotly.graph_objects.Scattermapbox.html
 us_cities = pd.read_csv("https://raw.githubusercontent.com/plotly/datasets/master/us-cities-top-1k.csv")
-fig = px.scatter_mapbox(data_frame=us_cities, lat="lat", lon="lon", hover_name="City", hover_data=["State", "Population"],
-                        color_discrete_sequence=["fuchsia"], zoom=3, height=300)
+# fig = px.scatter_mapbox(data_frame=us_cities, lat="lat", lon="lon", hover_name="City", hover_data=["State", "Population"],
+#                         color_discrete_sequence=["fuchsia"], zoom=3, height=300)
 # fig = px.scatter_mapbox(lat=np.arange(37.5, 41.5, .5), lon=np.arange(-95.5, -99.5, -.5),
                         # color_discrete_sequence=["fuchsia"], zoom=3, height=300)
-fig.update_layout(mapbox_style="open-street-map", margin={"r":0,"t":0,"l":0,"b":0}, annotations=[my_anotation])
-the_map1 = dcc.Graph(figure=fig, id="id-map")
+# The scatter_mapbox above sends every row to the browser. For large point tables (millions of
+# stations) we build a spatial index once and only send what is inside the viewport:
+# clusters (counts + centroids) at low zoom and the individual points above zoom_threshold.
+cities_index = GridIndex(us_cities["lat"].values, us_cities["lon"].values)
+zoom_threshold = 5
+map1_center = dict(lat=38.72490, lon=-95.61446)
+map1_zoom = 3
+
+def make_cities_figure(relayoutData=None):
+    viewport = viewport_from_relayout(relayoutData, map1_center, map1_zoom, size_px=(1000, 300))
+    mode, selection = cities_index.query_viewport(viewport, zoom_threshold=zoom_threshold)
+    if mode == 'points':
+        rows = us_cities.iloc[selection]
+        trace = dict(type="scattermapbox", lat=rows["lat"], lon=rows["lon"], mode="markers",
+                     marker=dict(color="fuchsia"),
+                     customdata=np.stack([rows["State"], rows["Population"]], axis=1),
+                     text=rows["City"],
+                     hovertemplate="<b>%{text}</b><br>State=%{customdata[0]}<br>Population=%{customdata[1]}<extra></extra>")
+    else:
+        lat_c, lon_c, counts = selection
+        trace = dict(type="scattermapbox", lat=lat_c, lon=lon_c, mode="markers+text",
+                     marker=dict(color="fuchsia", size=10 + 4 * np.sqrt(counts), opacity=0.7),
+                     text=counts, textfont=dict(color="black"),
+                     hovertemplate="%{text} cities<extra></extra>")
+    return dict(data=[trace],
+                layout=dict(mapbox=dict(style="open-street-map", center=map1_center, zoom=map1_zoom),
+                            margin={"r":0,"t":0,"l":0,"b":0}, annotations=[my_anotation], height=300,
+                            # Keeps the current center/zoom when the points are replaced
+                            uirevision='keep'))
+
+the_map1 = dcc.Graph(figure=make_cities_figure(), id="id-map")
 
 # =========== This option is harder, but you can manipulate multiple layers easily
 lats = np.arange(37.5, 41.5, .5)
 lons = np.arange(-95.5, -99.5, -.5)
-my_data = [ # https://plotly.com/python-api-reference/generated/plotly.graph_objects.Scattermapbox.html
+# Instead of per point strings (customdata=[F"Nany:{x}" for x in lats]) the hover values are sent as
+# numeric typed arrays and formatted by the hovertemplate in the browser
+first_layer = hover_traces(
     dict( # First layer
         lat=lats,
         lon=lons,
@@ -56,9 +97,6 @@ my_data = [ # https://plotly.com/python-api-reference/generated/plotly.graph_obj
         # type="densitymapbox",
         # type="choroplethmapbox",
         # fill="none", # none, toself, (only toself is working
-        customdata=[F"Nany:{x}" for x in lats],
-        meta=[F"META:{x}" for x in lons],
-        hovertemplate="This is my template lat:%{lat} lon:%{lon} custom:%{meta}",
         hoverinfo=None,
         title="Title",
         marker=dict(
@@ -78,6 +116,11 @@ my_data = [ # https://plotly.com/python-api-reference/generated/plotly.graph_obj
             # color=[x for x in range(len(lons))]
         )
     ),
+    numeric={'Nany': lats, 'META': lons},
+    formats={'Nany': '.1f', 'META': '.1f'},
+    title="This is my template")
+my_data = [ # https://plotly.com/python-api-reference/generated/plotly.graph_objects.Scattermapbox.html
+    *first_layer,
     dict( # Second layer
         lat=np.arange(37.5, 41.5, .5),
         lon=np.arange(-95.5+1, -99.5+1, -.5),
@@ -108,9 +151,18 @@ the_map2 = dcc.Graph(
         )
     ))
 
+# Sweeping the mouse over a map fires dozens of hover events per second. Hover on map 1 is throttled
+# (at most one request every 100 ms plus a trailing one with the last position) and the zoom/pan events
+# are debounced (a single request once the map stops moving). The request counters are at /callback-rates
+hover_store, hover_input = throttled_input(app, 'id-map', 'hoverData', wait_ms=100)
+relayout_store, relayout_input = throttled_input(app, 'id-map', 'relayoutData', wait_ms=150, mode='debounce')
+register_rates_route(app)
+
 app.layout = html.Div([
     the_map1,
     the_map2,
+    hover_store,
+    relayout_store,
     html.Div(children=[
         html.Div([
             dcc.Markdown(d(""" **Hover Data Map 1** """)),
@@ -159,19 +211,18 @@ app.layout = html.Div([
 
 @app.callback(
     Output('hover-data', 'children'),
-    [Input('id-map', 'hoverData')])
+    [hover_input])
+@drop_stale('hover-data')
 def display_hover_data(hoverData):
     return json.dumps(hoverData, indent=2)
 
-@app.callback(
-    Output('hover-data-2', 'children'),
-    [Input('id-map2', 'hoverData')])
-def display_hover_data(hoverData):
-    return json.dumps(hoverData, indent=2)
+# Pure formatting, it runs in the browser and never reaches the server
+clientside_json(app, 'hover-data-2', 'id-map2', 'hoverData')
 
 @app.callback(
     Output('click-data', 'children'),
     [Input('id-map', 'clickData')])
+@counted('click-data')
 def display_click_data(clickData):
     return json.dumps(clickData, indent=2)
 
@@ -179,16 +230,27 @@ def display_click_data(clickData):
 @app.callback(
     Output('selected-data', 'children'),
     [Input('id-map', 'selectedData')])
+@counted('selected-data')
 def display_selected_data(selectedData):
     return json.dumps(selectedData, indent=2)
 
 
 @app.callback(
     Output('relayout-data', 'children'),
-    [Input('id-map', 'relayoutData')])
+    [relayout_input])
+@drop_stale('relayout-data')
 def display_relayout_data(relayoutData):
     return json.dumps(relayoutData, indent=2)
 
 
+@app.callback(
+    Output('id-map', 'figure'),
+    [relayout_input],
+    prevent_initial_call=True)
+@drop_stale('update-cities')
+def update_cities(relayoutData):
+    return make_cities_figure(relayoutData)
+
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,91 @@
+"""
+This example demonstrates how to draw a vector field (ocean currents) on a Mapbox map.
+The U and V components are stored in separate NetCDF files that are paired and read lazily.
+Arrows are computed on the server, decimated following the zoom, and cached per (time, depth, viewport),
+so the browser only receives a few thousand line segments even for the full resolution field.
+"""
+import sys
+import os
+from textwrap import dedent as d
+
+import dash
+from dash import dcc, html
+from dash.dependencies import Input, Output
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Binning import viewport_from_relayout
+from utils.Vector_Field import UVField
+from utils.Callback_Metrics import instrument_app
+from utils.Async_Serving import asgi_app, async_callback
+
+# https://plotly.com/python-api-reference/generated/plotly.graph_objects.Scattermapbox.html
+
+file_name = "/home/olmozavala/Dropbox/TestData/netCDF/GoM_Separated_U_V/022GOMl0.04-1992_002_00_u.nc"
+# The V file (..._v.nc) is found next to the U file
+currents = UVField(file_name)
+n_depths = currents.u.shape[1] if currents.u.ndim == 4 else 1
+
+external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
+
+app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
+# Latency, payload sizes and errors of every callback at /metrics (Prometheus) and in a panel
+instrument_app(app)
+# On an event loop, the slices of many users are read at the same time:
+# uvicorn --app-dir MapboxMaps Maps_Vector_Field:asgi --port 8054
+asgi = asgi_app(app)
+# Or with several worker processes: gunicorn -w 4 -b :8054 --chdir MapboxMaps Maps_Vector_Field:server
+server = app.server
+
+init_center = dict(lat=25.0, lon=-90.0)
+init_zoom = 4.5
+
+def make_figure(relayoutData=None, depth=0, arrows=None):
+    viewport = viewport_from_relayout(relayoutData, init_center, init_zoom)
+    lat_path, lon_path, n_arrows = arrows or currents.arrows(viewport, time=0, depth=depth)
+    return dict(
+        data=[
+            dict(
+                lat=lat_path,
+                lon=lon_path,
+                type="scattermapbox",
+                mode="lines",
+                line=dict(width=1, color='rgb(20,20,120)'),
+                hoverinfo='skip',
+            )
+        ],
+        layout=dict(
+            mapbox=dict(
+                center=init_center,
+                style='open-street-map',
+                pitch=0,
+                zoom=init_zoom,
+            ),
+            title={'text': f"GoM currents, depth level {depth} ({n_arrows} arrows)", 'x': 0.5},
+            margin=dict(l=10, r=10, t=50, b=20),
+            autosize=True,
+            # Keeps the current center/zoom when the arrows are replaced
+            uirevision='keep',
+        )
+    )
+
+app.layout = html.Div([
+    dcc.Graph(id="id-map", figure=make_figure(), config={'scrollZoom': True}, style={'height': '80vh'}),
+    dcc.Markdown(d("""
+        **Depth level**
+    """)),
+    dcc.Slider(id='depth-slider', min=0, max=n_depths - 1, step=1, value=0),
+])
+
+@app.callback(
+    Output('id-map', 'figure'),
+    [Input('id-map', 'relayoutData'),
+     Input('depth-slider', 'value')],
+    prevent_initial_call=True)
+@async_callback
+async def update_arrows(relayoutData, depth):
+    # The U and V slices are read without blocking the event loop
+    viewport = viewport_from_relayout(relayoutData, init_center, init_zoom)
+    return make_figure(relayoutData, depth, await currents.arrows_async(viewport, time=0, depth=depth))
+
+if __name__ == '__main__':
+    app.run(debug=True, port=8054)
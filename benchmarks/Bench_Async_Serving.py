@@ -0,0 +1,187 @@
+"""
+Concurrent throughput of an I/O-bound callback (a remote CSV read at every request, with --latency-ms of
+network latency) served three ways: 'flask' is app.run (the threaded Werkzeug server, one thread per
+request), 'sync' the same callback on uvicorn through utils/Async_Serving.py (offloaded to a pool of --pool
+threads) and 'async' the `async def` version awaiting utils.Async_Serving.fetch on the event loop. Each
+user sends its next request as soon as the previous one is answered. Besides latency and throughput, the
+peak threads and RSS of the server process are reported.
+
+'sync' tops out at pool / latency requests per second, like a server with a fixed number of sync workers,
+so it is not the baseline: app.run is. Against it, 'async' does not give more throughput (on one core
+both are limited by the CPU, which the load generator and the 'remote' server also use); what it saves
+is the thread (and its stack) of every waiting request.
+
+    python benchmarks/Bench_Async_Serving.py --users 4 32 128 --latency-ms 100 --modes flask async
+
+The real examples are compared with Load_Test.py, app.run (debug off) against uvicorn:
+    python benchmarks/Load_Test.py --script zoom --url http://127.0.0.1:8054 --users 16 64 128 \\
+        --command "uvicorn --app-dir MapboxMaps Maps_Vector_Field:asgi --port 8054"
+    python benchmarks/Load_Test.py --script upload --url http://127.0.0.1:8050 --users 16 64 \\
+        --command "uvicorn IO_Files:asgi --port 8050"
+On one core the uploads of IO_Files gain nothing (decoding is CPU work, not waiting), and the zoom of
+Maps_Vector_Field (NetCDF slices from the page cache) only holds better above ~64 users.
+"""
+import argparse
+import http.server
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+from Load_Test import summarize, wait_for
+
+MODES = ('flask', 'sync', 'async')
+
+
+def serve_source(port, latency_s, n_rows=2000):
+    """The 'remote' CSV: a local HTTP server answering after latency_s."""
+    body = ('city,lat,lon,pop\n' + ''.join(f"c{i},{i % 90},{i % 180},{i * 7}\n" for i in range(n_rows))).encode()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency_s)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/csv')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.serve_forever()
+
+
+def build_app(mode, source_url):
+    import dash
+    from dash import dcc, html, Input, Output
+    from utils.Async_Serving import fetch
+
+    app = dash.Dash(__name__)
+    app.layout = html.Div([dcc.Input(id='query', value='c1'), html.Div(id='rows')])
+
+    def matches(csv, query):
+        return f"{sum(line.startswith(query) for line in csv.splitlines())} cities match {query}"
+
+    if mode == 'async':
+        @app.callback(Output('rows', 'children'), Input('query', 'value'))
+        async def load_rows(query):
+            return matches((await fetch(source_url)).decode(), query)
+    else:
+        @app.callback(Output('rows', 'children'), Input('query', 'value'))
+        def load_rows(query):
+            with urllib.request.urlopen(source_url, timeout=30) as response:
+                return matches(response.read().decode(), query)
+    return app
+
+
+def serve_app(mode, port, source_url):
+    app = build_app(mode, source_url)
+    if mode == 'flask':
+        app.run(port=port, threaded=True)
+    else:
+        from utils.Async_Serving import serve
+        serve(app, port=port, log_level='warning', backlog=4096)
+
+
+def sample_process(pid, stop, peak):
+    """Keeps the peak threads and RSS (MB) of a process in peak until stop is set."""
+    while not stop.is_set():
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                fields = dict(line.split(':', 1) for line in f)
+        except OSError:
+            return
+        peak['threads'] = max(peak.get('threads', 0), int(fields['Threads']))
+        peak['rss_mb'] = max(peak.get('rss_mb', 0), int(fields['VmRSS'].split()[0]) / 1024)
+        stop.wait(0.05)
+
+
+def run_users(url, n_users, duration_s):
+    """n_users sending the callback request back to back. Returns the latency (s) and outcome of each request."""
+    body = {'output': 'rows.children', 'outputs': {'id': 'rows', 'property': 'children'},
+            'inputs': [{'id': 'query', 'property': 'value', 'value': 'c1'}], 'state': [],
+            'changedPropIds': ['query.value']}
+    results, lock = [], threading.Lock()
+    deadline = time.perf_counter() + duration_s
+
+    def user():
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            t = time.perf_counter()
+            try:
+                ok = session.post(f"{url}/_dash-update-component", json=body, timeout=60).status_code == 200
+            except requests.RequestException:
+                ok = False
+            with lock:
+                results.append((time.perf_counter() - t, ok))
+
+    threads = [threading.Thread(target=user) for _ in range(n_users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--duration', type=float, default=5, help='seconds per users level')
+    parser.add_argument('--latency-ms', type=float, default=100, help='latency of the remote CSV')
+    parser.add_argument('--pool', type=int, default=8, help='threads of the bounded pool (ASYNC_WORKERS)')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--port', type=int, default=8070)
+    # Internal: the server processes started by the benchmark
+    parser.add_argument('--serve', choices=MODES + ('source',), help=argparse.SUPPRESS)
+    parser.add_argument('--source-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve == 'source':
+        serve_source(args.port, args.latency_ms / 1000)
+    elif args.serve:
+        serve_app(args.serve, args.port, args.source_url)
+    else:
+        source_port = args.port + 1
+        source_url = f"http://127.0.0.1:{source_port}/cities.csv"
+        env = dict(os.environ, ASYNC_WORKERS=str(args.pool))
+        source = subprocess.Popen([sys.executable, __file__, '--serve', 'source', '--port', str(source_port),
+                                   '--latency-ms', str(args.latency_ms)], env=env)
+        try:
+            print(f"Remote CSV with {args.latency_ms:.0f} ms of latency, pool of {args.pool} threads")
+            for mode in args.modes:
+                server = subprocess.Popen([sys.executable, __file__, '--serve', mode, '--port', str(args.port),
+                                           '--source-url', source_url], env=env,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                url = f"http://127.0.0.1:{args.port}"
+                try:
+                    wait_for(url)
+                    for n_users in args.users:
+                        stop, peak = threading.Event(), {}
+                        sampler = threading.Thread(target=sample_process, args=(server.pid, stop, peak))
+                        sampler.start()
+                        try:
+                            summary = summarize(*run_users(url, n_users, args.duration))
+                        finally:
+                            stop.set()
+                            sampler.join()
+                        print(f"  {mode:5s} {n_users:4d} users: {summary['throughput']:8.1f} req/s, "
+                              f"p50 {summary['p50_ms']:7.1f} ms, p95 {summary['p95_ms']:7.1f} ms, "
+                              f"errors {100 * summary['error_rate']:5.1f}%, peak {peak.get('threads', 0)} threads, "
+                              f"{peak.get('rss_mb', 0):.0f} MB", flush=True)
+                finally:
+                    server.terminate()
+                    server.wait()
+        finally:
+            source.terminate()
+            source.wait()
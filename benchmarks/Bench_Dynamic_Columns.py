@@ -0,0 +1,73 @@
+"""
+Payload per click of the column generator of 5_DynamicGeneration.py.
+'full' is the original callback (current children sent as State, every width rewritten and the whole
+list returned) and 'patch' the Patch append with CSS equal widths. Sizes are the JSON bodies
+of the _dash-update-component request and response.
+
+    python benchmarks/Bench_Dynamic_Columns.py --columns 10 100 1000
+"""
+import argparse
+import json
+import time
+
+import dash_bootstrap_components as dbc
+from dash import Patch
+from plotly.utils import PlotlyJSONEncoder
+
+
+def add_col(id_txt, width=None):
+    return dbc.Col(F"New Col {id_txt}", width=width, id=F"col{id_txt}")
+
+
+def full_rewrite(children, clicks):
+    """The original callback."""
+    if children is None:
+        return [add_col(clicks, 12)]
+    c_width = int(12 / (len(children) + 1))
+    for c_child in children:
+        c_child["props"]["width"] = c_width
+    children.append(add_col(clicks, c_width))
+    return children
+
+
+def patch_append(clicks):
+    children = Patch()
+    children.append(add_col(clicks))
+    return children
+
+
+def to_json(obj):
+    return json.dumps(obj, cls=PlotlyJSONEncoder)
+
+
+def request_body(clicks, children=None):
+    inputs = [{'id': 'button', 'property': 'n_clicks', 'value': clicks}]
+    state = [] if children is None else [{'id': 'output_row', 'property': 'children', 'value': children}]
+    return to_json({'output': 'output_row.children', 'outputs': {'id': 'output_row', 'property': 'children'},
+                    'inputs': inputs, 'changedPropIds': ['button.n_clicks'], 'state': state})
+
+
+def response_body(output):
+    return to_json({'multi': True, 'response': {'output_row': {'children': output}}})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--columns', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    for n in args.columns:
+        # The browser sends the children as JSON, the callback receives them as dicts
+        children = json.loads(to_json([add_col(i, 12) for i in range(n)]))
+        request = request_body(n, children)
+        t = time.perf_counter()
+        response = response_body(full_rewrite(children, n))
+        full_s = time.perf_counter() - t
+
+        patch_request = request_body(n)
+        t = time.perf_counter()
+        patch_response = response_body(patch_append(n))
+        patch_s = time.perf_counter() - t
+        print(f"{n:5d} columns: full request {len(request) / 1024:8.1f} kB, response {len(response) / 1024:8.1f} kB "
+              f"({full_s * 1000:6.2f} ms) | patch request {len(patch_request) / 1024:5.2f} kB, "
+              f"response {len(patch_response) / 1024:5.2f} kB ({patch_s * 1000:5.2f} ms)")
@@ -0,0 +1,73 @@
+"""
+Response bytes of switching the variable of a choropleth: full figure vs partial update.
+'full' resends the whole figure (GeoJSON included) as the original callbacks would, 'patch' is
+the dash.Patch of utils/Figure_Patches.py (new z, and the colour range when it changes).
+Without --geojson a synthetic county-like GeoJSON (grid of polygons) is generated.
+
+    python benchmarks/Bench_Figure_Patches.py --regions 3221 --vertices 60
+    python benchmarks/Bench_Figure_Patches.py --geojson geojson-counties-fips.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from plotly.utils import PlotlyJSONEncoder
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Figure_Patches import choropleth_patch
+
+
+def synthetic_geojson(n_regions, n_vertices):
+    """Square-ish polygons on a grid over the US, with n_vertices per ring."""
+    side = int(np.ceil(np.sqrt(n_regions)))
+    features = []
+    angles = np.linspace(0, 2 * np.pi, n_vertices)
+    for i in range(n_regions):
+        lon0 = -125 + 58 * (i % side) / side
+        lat0 = 25 + 24 * (i // side) / side
+        ring = np.stack([lon0 + 0.5 * np.cos(angles), lat0 + 0.4 * np.sin(angles)], axis=1).round(5)
+        features.append(dict(type='Feature', id=f"{i:05d}",
+                             geometry=dict(type='Polygon', coordinates=[ring.tolist()])))
+    return dict(type='FeatureCollection', features=features)
+
+
+def response_bytes(output):
+    """Size of the body of a _dash-update-component response carrying this figure output."""
+    return len(json.dumps({'multi': True, 'response': {'choropleth': {'figure': output}}}, cls=PlotlyJSONEncoder))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--geojson', default=None)
+    parser.add_argument('--regions', type=int, default=3221)
+    parser.add_argument('--vertices', type=int, default=60)
+    args = parser.parse_args()
+
+    if args.geojson:
+        with open(args.geojson) as f:
+            geojson = json.load(f)
+    else:
+        geojson = synthetic_geojson(args.regions, args.vertices)
+    locations = [feature['id'] for feature in geojson['features']]
+    rng = np.random.default_rng(0)
+    variables = {name: rng.gamma(2, 2, len(locations)) for name in ['var_a', 'var_b', 'var_c']}
+
+    previous_range = None
+    print(f"{len(locations)} regions")
+    for name, values in variables.items():
+        t = time.perf_counter()
+        fig = dict(data=[dict(type='choroplethmapbox', z=values, locations=locations, geojson=geojson,
+                              colorscale="Viridis")],
+                   layout=dict(mapbox=dict(style="carto-positron", zoom=3)))
+        full = response_bytes(fig)
+        full_s = time.perf_counter() - t
+
+        t = time.perf_counter()
+        patch, previous_range = choropleth_patch(values, previous_range=previous_range, colorbar_title=name)
+        partial = response_bytes(patch)
+        patch_s = time.perf_counter() - t
+        print(f"{name}: full {full / 2**20:7.2f} MB ({full_s:.3f} s), patch {partial / 2**10:7.1f} kB "
+              f"({patch_s:.4f} s), {full / partial:.0f}x smaller")
@@ -0,0 +1,82 @@
+"""
+Server time of one Player tick of the animation in holoview_examples/1_Plots_Advanced.py, as the grid grows.
+'original' computes cos(X + p) + cos(Y + p) and applies every option to a new hv.Image at each tick;
+'cached' reads the frame from utils/Frame_Cache.py (separable batches of 8, prefetched ahead of the player)
+with the options set once on the DynamicMap. Each tick also updates the Bokeh plot, as the Panel server does.
+A resolution holds the player interval when the p95 tick stays below it.
+
+    python benchmarks/Bench_Frame_Cache.py --sizes 20 500 1000 2000 --interval-ms 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import holoviews as hv
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Frame_Cache import FrameCache
+
+hv.extension('bokeh')
+
+OPTIONS = dict(width=500, height=400, cmap='viridis', colorbar=True, active_tools=['pan', 'wheel_zoom'],
+               tools=['hover'], shared_axes=False)
+
+
+def original_dmap(x, phases, stream):
+    X, Y = np.meshgrid(x, x)
+
+    def get_anim_plot(value):
+        p = phases[value]
+        return hv.Image((x, x, np.cos(X + p) + np.cos(Y + p))).opts(title=f"Animation (Phase: {p:.2f})", **OPTIONS)
+    return hv.DynamicMap(get_anim_plot, streams=[stream])
+
+
+def cached_dmap(x, phases, stream):
+    def phase_frames(indices):
+        c = np.cos(x[None, :] + phases[indices][:, None])
+        return c[:, None, :] + c[:, :, None]
+    frames = FrameCache(phase_frames, len(phases), batch=8)
+
+    def get_anim_plot(value):
+        return hv.Image((x, x, frames[value])).opts(title=f"Animation (Phase: {phases[value]:.2f})")
+    return hv.DynamicMap(get_anim_plot, streams=[stream]).opts(hv.opts.Image(**OPTIONS)), frames
+
+
+def play(dmap, stream, n_frames, ticks, interval_s):
+    """Tick times (s) of playing `ticks` frames in a loop, waiting for the rest of the interval between ticks."""
+    hv.renderer('bokeh').get_plot(dmap)
+    times = []
+    for tick in range(ticks):
+        t = time.perf_counter()
+        stream.event(value=(tick + 1) % n_frames)
+        times.append(time.perf_counter() - t)
+        # The player waits for its interval, which is when the prefetch runs
+        time.sleep(max(0.0, interval_s - times[-1]))
+    return np.array(times)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 500, 1000, 2000])
+    parser.add_argument('--frames', type=int, default=21)
+    parser.add_argument('--ticks', type=int, default=42, help='ticks played per run (two loops by default)')
+    parser.add_argument('--interval-ms', type=float, default=500)
+    args = parser.parse_args()
+
+    phases = np.linspace(0, 2 * np.pi, args.frames)
+    interval_s = args.interval_ms / 1000
+    for n in args.sizes:
+        x = np.linspace(-np.pi, np.pi, n)
+        Player = hv.streams.Stream.define('Player', value=0)
+        stream = Player()
+        original = 1000 * play(original_dmap(x, phases, stream), stream, args.frames, args.ticks, interval_s)
+        stream = Player()
+        dmap, frames = cached_dmap(x, phases, stream)
+        cached = 1000 * play(dmap, stream, args.frames, args.ticks, interval_s)
+        print(f"{n:5d}x{n:<5d}: original p50 {np.median(original):7.1f} ms, p95 {np.percentile(original, 95):7.1f} ms"
+              f" | cached p50 {np.median(cached):7.1f} ms, p95 {np.percentile(cached, 95):7.1f} ms"
+              f" ({frames.stats()['hits']} hits, {frames.batches} batches)"
+              f" | holds {args.interval_ms:.0f} ms: {np.percentile(original, 95) < args.interval_ms} / "
+              f"{np.percentile(cached, 95) < args.interval_ms}", flush=True)
@@ -0,0 +1,90 @@
+"""
+Cost of one click in 6_Hierarchical_Generation.py as the number of generated buttons grows.
+'full' is the original callback (display_area tree as State, the n_clicks of every level_1 button through
+ALL, a float16 nansum and the whole tree returned) and 'patch' the server-held counters with a Patch append
+(and the set_props updates of the level labels, sent as sideUpdate).
+Request/response sizes are the JSON bodies of _dash-update-component, time is the server side work.
+
+    python benchmarks/Bench_Hierarchical_Clicks.py --buttons 100 1000 10000
+"""
+import argparse
+import json
+import os
+import runpy
+import sys
+import time
+
+import dash
+import dash_bootstrap_components as dbc
+import numpy as np
+from plotly.utils import PlotlyJSONEncoder
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+
+def to_json(obj):
+    return json.dumps(obj, cls=PlotlyJSONEncoder)
+
+
+def full_click(prev_children, lev2_n_clicks_all, add_nextlevel, curr_level=1):
+    """The original level_1 branch of the callback."""
+    lev2_clicks = np.array(lev2_n_clicks_all, dtype=np.float16)
+    lev2_clicks[lev2_clicks == None] = np.nan
+    max_lev2_clicks = np.nansum(lev2_clicks)
+    new_col = add_nextlevel(curr_level + 1, int(max_lev2_clicks), 2)
+    if len(prev_children) <= curr_level:
+        return prev_children + [dbc.Row([new_col])]
+    prev_children[curr_level]["props"]["children"] = prev_children[curr_level]["props"]["children"] + [new_col]
+    return prev_children
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--buttons', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    app_module = runpy.run_path(os.path.join(ROOT, '6_Hierarchical_Generation.py'))
+    add_nextlevel, add_button = app_module['add_nextlevel'], app_module['add_button']
+    new_session_tree = app_module['new_session_tree']
+
+    for n in args.buttons:
+        # n level_1 buttons, one click each, and as many level_2 buttons
+        tree = to_json([dbc.Row([add_nextlevel(1, i, 2) for i in range(n)]),
+                        dbc.Row([add_nextlevel(2, i, 2) for i in range(n)])])
+        n_clicks = [1] * n
+        request = to_json({'inputs': [{'id': 'main_button', 'property': 'n_clicks', 'value': n},
+                                      [{'id': {'type': 'level_1', 'index': i}, 'property': 'n_clicks', 'value': 1}
+                                       for i in range(n)]],
+                           'state': [{'id': 'display_area', 'property': 'children', 'value': json.loads(tree)}]})
+        best = np.inf
+        for _ in range(args.repeats):
+            children = json.loads(tree)  # what dash hands to the callback
+            t = time.perf_counter()
+            response = to_json({'response': {'display_area': {'children': full_click(children, n_clicks, add_nextlevel)}}})
+            best = min(best, time.perf_counter() - t)
+        full_s = best
+
+        session = f"bench-{n}"
+        tree = new_session_tree(session)
+        for _ in range(n):
+            tree.add(2)
+        tree.set_expanded(2, True)
+        patch_request = to_json({'inputs': [{'id': 'main_button', 'property': 'n_clicks', 'value': n},
+                                            {'id': 'level_click', 'property': 'data',
+                                             'value': {'level': 1, 'index': 7, 'n_clicks': 2}}],
+                                 'state': [{'id': 'session_id', 'property': 'data', 'value': session}]})
+        best = np.inf
+        for _ in range(args.repeats):
+            t = time.perf_counter()
+            children, updates = add_button(session, 2)
+            response_body = {} if children is dash.no_update else {'display_area': {'children': children}}
+            side_update = {json.dumps(component_id, sort_keys=True, separators=(',', ':')): props
+                           for component_id, props in updates}
+            patch_response = to_json({'sideUpdate': side_update, 'response': response_body})
+            best = min(best, time.perf_counter() - t)
+        patch_s = best
+        print(f"{n:6d} buttons: full request {len(request) / 1024:8.1f} kB, response {len(response) / 1024:8.1f} kB, "
+              f"{full_s * 1000:7.2f} ms | patch request {len(patch_request) / 1024:4.2f} kB, "
+              f"response {len(patch_response) / 1024:4.2f} kB, {patch_s * 1000:5.2f} ms")
@@ -0,0 +1,60 @@
+"""
+Size of the button tree of 6_Hierarchical_Generation.py as the hierarchy grows.
+'full' renders every generated button (the original display_area), 'tree' the level sections of
+utils/Tree_View.py with every level expanded (worst case: one page of buttons per level).
+Time and memory (tracemalloc peak) are those of building and serializing display_area on the server,
+size is its JSON, i.e. what the browser receives and turns into DOM nodes.
+
+    python benchmarks/Bench_Hierarchical_Tree.py --nodes 1000 10000 50000 --levels 5
+"""
+import argparse
+import json
+import os
+import runpy
+import sys
+import time
+import tracemalloc
+
+import dash_bootstrap_components as dbc
+from plotly.utils import PlotlyJSONEncoder
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+
+def measure(build):
+    """Seconds, peak MB and JSON kB of building and serializing a layout."""
+    tracemalloc.start()
+    t = time.perf_counter()
+    body = json.dumps(build(), cls=PlotlyJSONEncoder)
+    seconds = time.perf_counter() - t
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 2**20, len(body) / 1024
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--levels', type=int, default=5)
+    args = parser.parse_args()
+
+    app_module = runpy.run_path(os.path.join(ROOT, '6_Hierarchical_Generation.py'))
+    add_nextlevel, new_session_tree = app_module['add_nextlevel'], app_module['new_session_tree']
+    level_section = app_module['level_section']
+
+    for n in args.nodes:
+        per_level = n // args.levels
+        levels = range(1, args.levels + 1)
+        full = measure(lambda: [dbc.Row([add_nextlevel(level, i, 2) for i in range(1, per_level + 1)])
+                                for level in levels])
+
+        tree = new_session_tree(f"bench-{n}")
+        for level in levels:
+            for _ in range(per_level):
+                tree.add(level)
+            tree.set_expanded(level, True)
+        paged = measure(lambda: [level_section(tree, level) for level in levels])
+        print(f"{n:6d} nodes: full {full[0] * 1000:8.1f} ms, {full[1]:7.1f} MB, {full[2]:8.1f} kB "
+              f"({n} buttons) | tree {paged[0] * 1000:5.1f} ms, {paged[1]:5.2f} MB, {paged[2]:5.1f} kB "
+              f"({tree.n_visible()} buttons)")
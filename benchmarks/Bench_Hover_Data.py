@@ -0,0 +1,72 @@
+"""
+Build time and JSON payload of the hover data of a large point trace.
+'strings' is the original per-point f-string customdata/meta of MapboxMaps/Maps_Scatter.py, and 'typed'
+the numeric typed arrays plus hovertemplate of utils/Hover_Data.py. The categorical case compares a
+list of labels with the dictionary encoded version (one trace per category).
+
+    python benchmarks/Bench_Hover_Data.py --points 1000000 --categories 50
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from plotly.utils import PlotlyJSONEncoder
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Hover_Data import hover_traces
+
+
+def strings_numeric(lats, lons):
+    return [dict(type="scattermapbox", lat=lats.tolist(), lon=lons.tolist(),
+                 customdata=[F"Nany:{x}" for x in lats], meta=[F"META:{x}" for x in lons],
+                 hovertemplate="lat:%{lat} lon:%{lon} custom:%{customdata} %{meta}")]
+
+
+def typed_numeric(lats, lons):
+    return hover_traces(dict(type="scattermapbox", lat=lats, lon=lons),
+                        numeric={'Nany': lats, 'META': lons}, formats={'Nany': '.3f', 'META': '.3f'})
+
+
+def strings_categorical(lats, lons, labels):
+    return [dict(type="scattermapbox", lat=lats.tolist(), lon=lons.tolist(), text=labels.tolist(),
+                 customdata=[F"Value:{x}" for x in lats], hovertemplate="%{text} %{customdata}")]
+
+
+def typed_categorical(lats, lons, labels, max_categories):
+    return hover_traces(dict(type="scattermapbox", lat=lats, lon=lons), numeric={'Value': lats},
+                        labels=labels, label_name='Station', formats={'Value': '.3f'}, max_categories=max_categories)
+
+
+def measure(name, build, *args):
+    t = time.perf_counter()
+    traces = build(*args)
+    build_s = time.perf_counter() - t
+    t = time.perf_counter()
+    payload = json.dumps(traces, cls=PlotlyJSONEncoder)
+    dump_s = time.perf_counter() - t
+    print(f"{name:>20}: build {build_s:7.3f} s, serialize {dump_s:7.3f} s, "
+          f"{len(payload) / 2**20:8.1f} MB, {len(traces)} trace(s)")
+    return len(payload)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=1_000_000)
+    parser.add_argument('--categories', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    lats = rng.uniform(18, 32, args.points)
+    lons = rng.uniform(-98, -76, args.points)
+    labels = np.array([f"Station {i:03d}" for i in range(args.categories)])[rng.integers(0, args.categories, args.points)]
+
+    print(f"{args.points:,} points")
+    base = measure('strings', strings_numeric, lats, lons)
+    new = measure('typed', typed_numeric, lats, lons)
+    print(f"{'':>20}  payload {base / new:.1f}x smaller")
+    base = measure('strings categorical', strings_categorical, lats, lons, labels)
+    new = measure('typed categorical', typed_categorical, lats, lons, labels, max(64, args.categories))
+    print(f"{'':>20}  payload {base / new:.1f}x smaller")
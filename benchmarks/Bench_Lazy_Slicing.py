@@ -0,0 +1,64 @@
+"""
+Peak memory of reading one (time, depth) slice of a 4D GoM variable.
+'eager' is the original data.u.values[0,0,:,:] and 'lazy' the slice-first path of utils/Lazy_NetCDF.py.
+Each mode runs in its own process so the peak RSS of one does not hide the other.
+Without --file a synthetic multi-level GoM-like file is written to a temporary folder.
+
+    python benchmarks/Bench_Lazy_Slicing.py --file /path/022GOMl0.04-1992_002_00_u.nc --var u
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Lazy_NetCDF import open_lazy, read_slice, peak_rss_mb
+
+
+def make_synthetic(file_name, times=4, depths=40, ny=385, nx=541):
+    import xarray as xr
+    lat = np.linspace(18.09, 31.96, ny)
+    lon = np.linspace(-98, -76.4, nx)
+    u = np.random.default_rng(0).normal(size=(times, depths, ny, nx)).astype(np.float32)
+    xr.Dataset({'u': (('MT', 'Depth', 'Latitude', 'Longitude'), u)},
+               coords={'Latitude': lat, 'Longitude': lon}).to_netcdf(file_name)
+
+
+def run_mode(mode, file_name, var):
+    import xarray as xr
+    start_rss = peak_rss_mb()
+    t = time.perf_counter()
+    if mode == 'eager':
+        data = xr.open_dataset(file_name)
+        values = data[var].values[0, 0, :, :]
+    else:
+        data = open_lazy(file_name)
+        values = read_slice(data[var], time=0, depth=0)
+    elapsed = time.perf_counter() - t
+    print(f"{mode:>6}: slice {values.shape}, {elapsed:.3f} s, peak RSS {peak_rss_mb():.1f} MB "
+          f"(+{peak_rss_mb() - start_rss:.1f} MB over imports)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', default=None)
+    parser.add_argument('--var', default='u')
+    parser.add_argument('--mode', choices=['eager', 'lazy'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.file, args.var)
+        sys.exit(0)
+
+    file_name = args.file
+    if file_name is None:
+        file_name = os.path.join(tempfile.mkdtemp(), 'synthetic_gom_u.nc')
+        print(f"Writing synthetic multi-level file {file_name} ...")
+        make_synthetic(file_name)
+    print(f"File size: {os.path.getsize(file_name) / 2**20:.1f} MB")
+    for mode in ['eager', 'lazy']:
+        subprocess.run([sys.executable, __file__, '--mode', mode, '--file', file_name, '--var', args.var], check=True)
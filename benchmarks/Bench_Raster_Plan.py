@@ -0,0 +1,79 @@
+"""
+Frames per second of the rasterized map animation of holoview_examples/1_Plots_Advanced.py (get_map_data).
+'rasterize' is the original frame (meshgrid, new gv.Image and rasterize(img, dynamic=False)) and 'plan'
+the utils/Raster_Plan.py frame (meshgrid and plan made once, one bincount per frame). Both produce a 400x400
+(or grid sized) raster of the same synthetic field; 'plan (mercator)' also bins into Web Mercator, which
+saves the reprojection GeoViews does before drawing over the tiles. The plan setup is timed separately.
+
+    python benchmarks/Bench_Raster_Plan.py --sizes 100 500 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+import cartopy.crs as ccrs
+import geoviews as gv
+import holoviews as hv
+import numpy as np
+from holoviews.operation.datashader import rasterize
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Raster_Plan import RasterPlan
+from utils.Regridding import lonlat_to_mercator
+
+hv.extension('bokeh')
+
+
+def fps(frame, phases, repeats):
+    t = time.perf_counter()
+    for _ in range(repeats):
+        for value in range(len(phases)):
+            frame(value)
+    return repeats * len(phases) / (time.perf_counter() - t)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 2000], help='grid points per axis')
+    parser.add_argument('--canvas', type=int, default=400)
+    parser.add_argument('--frames', type=int, default=21)
+    parser.add_argument('--repeats', type=int, default=2)
+    args = parser.parse_args()
+
+    phases = np.linspace(0, 2 * np.pi, args.frames)
+    for n in args.sizes:
+        lons_syn = np.linspace(-100, -80, n)
+        lats_syn = np.linspace(15, 35, n)
+
+        def original_frame(value):
+            p = phases[value]
+            LON, LAT = np.meshgrid(lons_syn, lats_syn)
+            data = np.sin(LON/2 + p) * np.cos(LAT/2 + p)
+            img = gv.Image((lons_syn, lats_syn, data), crs=ccrs.PlateCarree())
+            return rasterize(img, dynamic=False, width=args.canvas, height=args.canvas)
+
+        results = {'rasterize': fps(original_frame, phases, args.repeats)}
+        LON, LAT = np.meshgrid(lons_syn, lats_syn)
+        for name, transform, crs in [('plan', None, ccrs.PlateCarree()),
+                                     ('plan (mercator)', lonlat_to_mercator, ccrs.GOOGLE_MERCATOR)]:
+            t = time.perf_counter()
+            plan = RasterPlan(lons_syn, lats_syn, width=args.canvas, height=args.canvas, transform=transform)
+            setup_ms = 1000 * (time.perf_counter() - t)
+
+            def plan_frame(value, plan=plan, crs=crs):
+                p = phases[value]
+                data = np.sin(LON/2 + p) * np.cos(LAT/2 + p)
+                return gv.Image((plan.xs, plan.ys, plan(data)), crs=crs)
+
+            results[name] = fps(plan_frame, phases, args.repeats)
+            results[f"{name} setup ms"] = setup_ms
+
+        reference = original_frame(3).dimension_values(2, flat=False)
+        plan = RasterPlan(lons_syn, lats_syn, width=args.canvas, height=args.canvas)
+        p = phases[3]
+        difference = np.nanmax(np.abs(reference - plan(np.sin(LON/2 + p) * np.cos(LAT/2 + p))))
+        print(f"{n:5d}x{n:<5d} -> {plan.shape[1]}x{plan.shape[0]}: rasterize {results['rasterize']:7.1f} fps | "
+              f"plan {results['plan']:7.1f} fps (setup {results['plan setup ms']:.1f} ms) | "
+              f"plan (mercator) {results['plan (mercator)']:7.1f} fps "
+              f"(setup {results['plan (mercator) setup ms']:.1f} ms) | max difference {difference:.3f}", flush=True)
@@ -0,0 +1,71 @@
+"""
+Scaling benchmark of the tiled regridder used in MapboxMaps/Maps_Raster.py.
+It regrids a synthetic GFS-like 0.25 degree field into N x N Web Mercator images for several
+target sizes and core counts, and compares with the original single-threaded xarray interp.
+
+    python benchmarks/Bench_Regridding.py --sizes 1000 2000 4000 8000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Regridding import Regridder, mercator_axes
+
+
+def synthetic_gfs():
+    lat = np.linspace(90, -90, 721)
+    lon = np.arange(0, 360, 0.25)
+    LON, LAT = np.meshgrid(lon, lat)
+    values = (273 + 30 * np.cos(np.radians(LAT)) + 5 * np.sin(np.radians(3 * LON))).astype(np.float32)
+    return lat, lon, values
+
+
+def time_it(fun, repeats):
+    best = np.inf
+    for _ in range(repeats):
+        t = time.perf_counter()
+        fun()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def xarray_interp(lat, lon, values, n):
+    """The original approach: shift/sort the source and interp on the 2D target grid."""
+    import xarray as xr
+    da = xr.DataArray(values, dims=('lat_0', 'lon_0'), coords={'lat_0': lat, 'lon_0': lon})
+    da.coords['lon_0'] = (da.coords['lon_0'] + 180) % 360 - 180
+    da = da.sortby('lon_0')
+    _, _, lon_axis, lat_axis = mercator_axes(n)
+    lon_grid, lat_grid = np.meshgrid(lon_axis, lat_axis)
+    return da.interp(lat_0=xr.DataArray(lat_grid, dims=("y", "x")),
+                     lon_0=xr.DataArray(lon_grid, dims=("y", "x"))).values
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 4000, 8000])
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count()}))
+    parser.add_argument('--backend', default='threads', choices=['threads', 'numba', 'dask'])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--baseline-max', type=int, default=2000, help="Largest size to run xarray interp on")
+    args = parser.parse_args()
+
+    lat, lon, values = synthetic_gfs()
+    print(f"Source grid {values.shape}, backend={args.backend}, cpus={os.cpu_count()}")
+    print(f"{'N':>6} {'plan (s)':>9} {'xarray (s)':>11} " + " ".join(f"{f'{w} cores (s)':>14}" for w in args.workers))
+    for n in args.sizes:
+        t = time.perf_counter()
+        _, _, lon_axis, lat_axis = mercator_axes(n)
+        regridder = Regridder(lat, lon, lat_axis, lon_axis)
+        plan_time = time.perf_counter() - t
+        if args.backend == 'numba':
+            regridder(values[:, :], workers=1, backend='numba')  # JIT compilation outside the timings
+
+        baseline = time_it(lambda: xarray_interp(lat, lon, values, n), 1) if n <= args.baseline_max else np.nan
+        times = [time_it(lambda: regridder(values, workers=w, backend=args.backend), args.repeats)
+                 for w in args.workers]
+        print(f"{n:>6} {plan_time:>9.3f} {baseline:>11.3f} " + " ".join(f"{t:>14.3f}" for t in times))
@@ -0,0 +1,263 @@
+"""
+Concurrent-user load test of a running example app through _dash-update-component (local servers only).
+Every simulated user (one thread and HTTP session each) replays an interaction script: 'hover' sweeps the
+points of basic-interactions (4_Interactive_Callbacks.py), 'zoom' zooms and pans id-map (Mapbox apps) and
+'upload' sends bursts of files to upload-image (IO_Files.py). The callbacks are found in /_dash-dependencies,
+also behind the throttled stores of utils/Callback_Throttle.py. For every number of users it reports
+throughput, p50/p95/p99 latency and error rate, and stops at the saturation point: throughput no longer
+grows by --min-gain, p95 exceeds --slo-ms or errors exceed --max-errors.
+With --command the server is started for every --workers value, e.g. gunicorn -w {workers}.
+
+    python benchmarks/Load_Test.py --url http://127.0.0.1:8052 --script hover --users 1 2 4 8 16 32
+    python benchmarks/Load_Test.py --url http://127.0.0.1:8050 --script upload --upload-kb 500
+    python benchmarks/Load_Test.py --script zoom --workers 1 2 4 --url http://127.0.0.1:8054 \\
+        --command "gunicorn -w {workers} -b 127.0.0.1:8054 --chdir MapboxMaps Maps_Vector_Field:server"
+"""
+import argparse
+import base64
+import itertools
+import json
+import os
+import shlex
+import subprocess
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+import numpy as np
+import requests
+
+# Component and property each script drives
+TARGETS = {'hover': ('basic-interactions', 'hoverData'),
+           'zoom': ('id-map', 'relayoutData'),
+           'upload': ('upload-image', 'contents')}
+
+
+def parse_outputs(output):
+    """'..a.b...c.d..' (several outputs) or 'a.b' into [{'id', 'property'}]; pattern ids are JSON."""
+    output = output.split('@')[0]
+    parts = output[2:-2].split('...') if output.startswith('..') else [output]
+    specs = []
+    for part in parts:
+        component_id, prop = part.rsplit('.', 1)
+        if component_id.startswith('{'):
+            component_id = json.loads(component_id)
+        specs.append({'id': component_id, 'property': prop})
+    return specs
+
+
+def find_callback(dependencies, component_id, prop):
+    """Callback driven by component_id.prop, directly or through a throttled store (<id>-<prop>-<mode>).
+
+    Returns (dependency, input index, throttled).
+    """
+    store_prefix = f"{component_id}-{prop}-"
+    for dependency in dependencies:
+        if dependency.get('clientside_function'):
+            continue
+        for i, spec in enumerate(dependency['inputs']):
+            if spec['id'] == component_id and spec['property'] == prop:
+                return dependency, i, False
+            if isinstance(spec['id'], str) and spec['id'].startswith(store_prefix) and spec['property'] == 'data':
+                return dependency, i, True
+    available = sorted({f"{s['id']}.{s['property']}" for d in dependencies for s in d['inputs']})
+    raise SystemExit(f"No callback uses {component_id}.{prop}. Inputs of this app: {available}")
+
+
+def layout_values(node, values=None):
+    """{'id.property': value} of every component with an id in /_dash-layout, to fill the inputs and
+    states the script does not drive (e.g. a slider next to the map) with their initial values."""
+    values = {} if values is None else values
+    if isinstance(node, list):
+        for child in node:
+            layout_values(child, values)
+    elif isinstance(node, dict) and 'props' in node:
+        props = node['props']
+        if isinstance(props.get('id'), str):
+            for prop, value in props.items():
+                values[f"{props['id']}.{prop}"] = value
+        for value in props.values():
+            if isinstance(value, (list, dict)):
+                layout_values(value, values)
+    return values
+
+
+class RequestBuilder:
+    """Bodies of _dash-update-component for one callback, with the driven input replaced by each value."""
+
+    def __init__(self, dependency, index, throttled, extra=None):
+        self.dependency, self.index, self.throttled = dependency, index, throttled
+        self.outputs = parse_outputs(dependency['output'])
+        self.extra = extra or {}
+        self.client, self.seq = uuid.uuid4().hex, itertools.count(1)
+
+    def _spec(self, spec, value):
+        return {'id': spec['id'], 'property': spec['property'], 'value': value}
+
+    def body(self, value):
+        if self.throttled:
+            seq = next(self.seq)
+            value = {'client': self.client, 'seq': seq, 'events': seq, 'value': value}
+        inputs = [self._spec(spec, value if i == self.index else self.extra.get(f"{spec['id']}.{spec['property']}"))
+                  for i, spec in enumerate(self.dependency['inputs'])]
+        state = [self._spec(spec, self.extra.get(f"{spec['id']}.{spec['property']}"))
+                 for spec in self.dependency['state']]
+        driven = self.dependency['inputs'][self.index]
+        return {'output': self.dependency['output'],
+                'outputs': self.outputs if len(self.outputs) > 1 or self.dependency['output'].startswith('..')
+                else self.outputs[0],
+                'inputs': inputs, 'state': state, 'changedPropIds': [f"{driven['id']}.{driven['property']}"]}
+
+
+def hover_script(rng):
+    """Mouse sweeping over the 4 points of the 2 traces, back and forth."""
+    points = [(curve, i) for curve in (0, 1) for i in range(4)]
+    for curve, i in itertools.cycle(points + points[::-1]):
+        yield {'points': [{'curveNumber': curve, 'pointNumber': i, 'pointIndex': i, 'x': i + 1,
+                           'y': float(rng.integers(1, 10)), 'customdata': f"c.{i}"}]}, 0.05
+
+
+def zoom_script(rng):
+    """Zooming in and out of random places, with a pan between zooms."""
+    while True:
+        lat, lon = float(rng.uniform(-50, 60)), float(rng.uniform(-170, 170))
+        for zoom in [2, 3, 4, 5, 6, 5, 4, 3]:
+            lon += float(rng.normal(0, 2.0 / zoom))
+            yield {'mapbox.center': {'lat': lat, 'lon': lon}, 'mapbox.zoom': zoom,
+                   'mapbox.bearing': 0, 'mapbox.pitch': 0}, 0.3
+
+
+def upload_script(rng, size_kb=200, burst=3):
+    """Bursts of `burst` files of size_kb, a few seconds apart."""
+    content = base64.b64encode(rng.bytes(size_kb * 1024)).decode('ascii')
+    while True:
+        for i in range(burst):
+            yield [f"data:application/octet-stream;base64,{content}"], (2.0 if i == burst - 1 else 0.1)
+
+
+def upload_extra():
+    return {'upload-image.filename': ['load_test.bin'], 'upload-image.last_modified': [time.time()]}
+
+
+def run_users(url, dependencies, initial, script, n_users, duration_s, think_scale, upload_kb):
+    """n_users concurrent users for duration_s. Returns the latency (s) and outcome of every request."""
+    component_id, prop = TARGETS[script]
+    dependency, index, throttled = find_callback(dependencies, component_id, prop)
+    results, lock = [], threading.Lock()
+    deadline = time.perf_counter() + duration_s
+
+    def user(seed):
+        rng = np.random.default_rng(seed)
+        extra = dict(initial, **upload_extra()) if script == 'upload' else initial
+        builder = RequestBuilder(dependency, index, throttled, extra)
+        steps = {'hover': lambda: hover_script(rng), 'zoom': lambda: zoom_script(rng),
+                 'upload': lambda: upload_script(rng, upload_kb)}[script]()
+        session = requests.Session()
+        for value, think_s in steps:
+            if time.perf_counter() >= deadline:
+                break
+            t = time.perf_counter()
+            try:
+                response = session.post(f"{url}/_dash-update-component", json=builder.body(value), timeout=60)
+                # 204 is PreventUpdate (e.g. a stale throttled event), a valid answer
+                ok = response.status_code in (200, 204)
+            except requests.RequestException:
+                ok = False
+            with lock:
+                results.append((time.perf_counter() - t, ok))
+            time.sleep(think_s * think_scale)
+
+    threads = [threading.Thread(target=user, args=(seed,)) for seed in range(n_users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def summarize(results, elapsed):
+    latencies = np.array([latency for latency, _ in results]) if results else np.array([np.nan])
+    errors = sum(not ok for _, ok in results)
+    p50, p95, p99 = 1000 * np.percentile(latencies, [50, 95, 99])
+    return {'requests': len(results), 'throughput': len(results) / elapsed, 'p50_ms': p50, 'p95_ms': p95,
+            'p99_ms': p99, 'error_rate': errors / max(len(results), 1)}
+
+
+def saturation_search(url, args):
+    """Runs every --users level until the server saturates. Returns the summaries and the saturation level."""
+    dependencies = requests.get(f"{url}/_dash-dependencies", timeout=30).json()
+    initial = layout_values(requests.get(f"{url}/_dash-layout", timeout=30).json())
+    summaries, saturated = [], None
+    for n_users in args.users:
+        summary = summarize(*run_users(url, dependencies, initial, args.script, n_users, args.duration,
+                                       args.think_scale, args.upload_kb))
+        summary['users'] = n_users
+        summaries.append(summary)
+        print(f"  {n_users:4d} users: {summary['throughput']:8.1f} req/s, p50 {summary['p50_ms']:7.1f} ms, "
+              f"p95 {summary['p95_ms']:7.1f} ms, p99 {summary['p99_ms']:7.1f} ms, "
+              f"errors {100 * summary['error_rate']:5.1f}% ({summary['requests']} requests)", flush=True)
+        previous = summaries[-2] if len(summaries) > 1 else None
+        if summary['error_rate'] > args.max_errors or summary['p95_ms'] > args.slo_ms or \
+                (previous and summary['throughput'] < (1 + args.min_gain) * previous['throughput']):
+            saturated = previous or summary
+            break
+    return summaries, saturated
+
+
+def wait_for(url, timeout_s=120):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/_dash-dependencies", timeout=5).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"{url} did not start in {timeout_s} s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8050')
+    parser.add_argument('--script', choices=sorted(TARGETS), default='hover')
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--duration', type=float, default=10, help='seconds per users level')
+    parser.add_argument('--think-scale', type=float, default=1.0, help='multiplies the pauses of the scripts')
+    parser.add_argument('--upload-kb', type=int, default=200)
+    parser.add_argument('--slo-ms', type=float, default=1000, help='p95 latency considered saturated')
+    parser.add_argument('--max-errors', type=float, default=0.01)
+    parser.add_argument('--min-gain', type=float, default=0.1, help='throughput gain expected from more users')
+    parser.add_argument('--command', default=None, help='server command, {workers} is replaced')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1])
+    args = parser.parse_args()
+
+    if urlparse(args.url).hostname not in ('127.0.0.1', 'localhost', '::1'):
+        raise SystemExit('Only local servers can be load tested')
+
+    report = []
+    for workers in (args.workers if args.command else [None]):
+        server = None
+        if args.command:
+            server = subprocess.Popen(shlex.split(args.command.format(workers=workers)),
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                      cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+            wait_for(args.url)
+        print(f"{args.script} on {args.url}" + (f" with {workers} workers" if workers else ''))
+        try:
+            summaries, saturated = saturation_search(args.url, args)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+        report.append((workers, saturated))
+
+    print('Saturation point' + (' per worker configuration' if args.command else ''))
+    for workers, saturated in report:
+        label = f"{workers} workers: " if workers else ''
+        if saturated is None:
+            print(f"  {label}not reached with {args.users[-1]} users")
+        else:
+            print(f"  {label}{saturated['users']} users, {saturated['throughput']:.1f} req/s, "
+                  f"p95 {saturated['p95_ms']:.1f} ms")
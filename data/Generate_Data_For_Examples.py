@@ -31,6 +31,12 @@ with urlopen('https://raw.githubusercontent.com/plotly/datasets/master/geojson-c
 #  This is the dataframe that will be used in the choropleth with association to the counties
 df = pd.read_csv("https://raw.githubusercontent.com/plotly/datasets/master/fips-unemp-16.csv", dtype={"fips": str})
 
+# Extra variables per county, the dropdown of the 1_Plot_* examples switches the choropleth between them
+rng = np.random.default_rng(0)
+df['unemp_change'] = np.round(rng.normal(0, 1.5, len(df)), 2)
+df['unemp_log'] = np.log1p(df['unemp'])
+choropleth_vars = {'unemp': 'Unemployment rate', 'unemp_change': 'Unemployment change', 'unemp_log': 'log(1 + unemployment)'}
+
 # ----------------- Surface example
 x = np.linspace(-np.pi, np.pi, 20)
 X,Y = np.meshgrid(x,x)
@@ -14,6 +14,9 @@ import cartopy.crs as ccrs
 from holoviews.operation.datashader import rasterize
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from data.Generate_Data_For_Examples import *
+from utils.Frame_Cache import FrameCache
+from utils.Raster_Plan import RasterPlan
+from utils.Regridding import lonlat_to_mercator
 # Initialize HoloViews with Bokeh (standard)
 hv.extension('bokeh')
 pn.extension()
@@ -103,43 +106,55 @@ player = pn.widgets.Player(
     width=500
 )
 
+# Grid of the animation (e.g. np.linspace(-np.pi, np.pi, 1000) for a finer one)
+anim_x = x
+
+def phase_frames(indices):
+    """Frames of several phases at once. cos(X + p) + cos(Y + p) is the sum of a row and a column
+    vector, so only the 1D cosines are computed and broadcast into the (frames, y, x) block."""
+    c = np.cos(anim_x[None, :] + phases[indices][:, None])
+    return c[:, None, :] + c[:, :, None]
+
+# Frames are made 8 at a time, kept (up to 64) and prefetched ahead of the player
+anim_frames = FrameCache(phase_frames, len(phases), batch=8)
+
 # Use DynamicMap to update the data WITHOUT re-creating the plot object.
 # This prevents the page from scrolling/jumping on every update.
 def get_anim_plot(value):
     p = phases[value]
-    return hv.Image((x, x, np.cos(X + p) + np.cos(Y + p))).opts(
-        title=f"Animation (Phase: {p:.2f})", 
-        width=500, height=400, cmap='viridis', colorbar=True,
-        active_tools=['pan', 'wheel_zoom'], tools=['hover'], 
-        shared_axes=False
-    )
-
-# Link the player to the DynamicMap via streams
-dmap = hv.DynamicMap(get_anim_plot, streams=[player.param.value])
+    return hv.Image((anim_x, anim_x, anim_frames[value])).opts(title=f"Animation (Phase: {p:.2f})")
+
+# Link the player to the DynamicMap via streams. The fixed options are set once on the DynamicMap
+# instead of on every frame.
+dmap = hv.DynamicMap(get_anim_plot, streams=[player.param.value]).opts(
+    hv.opts.Image(width=500, height=400, cmap='viridis', colorbar=True,
+                  active_tools=['pan', 'wheel_zoom'], tools=['hover'],
+                  shared_axes=False)
+)
 
 # Combine plot and player into a Column with a fixed height to avoid layout shifts
 # Added width to resolve Bokeh WARNING: W-1005 (FIXED_SIZING_MODE)
 animation = pn.Column(dmap, player, sizing_mode='fixed', height=500, width=510)
 
 # 5. Rasterized Map Animation
-# To avoid the "Nesting a DynamicMap inside a DynamicMap" error, 
-# we return a rasterized image with dynamic=False from the callback.
+# The grid and the canvas never change between frames, so the meshgrid and the rasterization plan
+# (the pixel of every cell, in Web Mercator to skip the reprojection of every frame) are made once.
+# Each frame is then one bincount, instead of a rasterize(img, dynamic=False) call.
+lons_syn = np.linspace(-100, -80, 100)
+lats_syn = np.linspace(15, 35, 100)
+LON, LAT = np.meshgrid(lons_syn, lats_syn)
+map_plan = RasterPlan(lons_syn, lats_syn, width=400, height=400, transform=lonlat_to_mercator)
+
 def get_map_data(value):
     p = phases[value]
-    lons_syn = np.linspace(-100, -80, 100)
-    lats_syn = np.linspace(15, 35, 100)
-    LON, LAT = np.meshgrid(lons_syn, lats_syn)
     data = np.sin(LON/2 + p) * np.cos(LAT/2 + p)
-    
-    img = gv.Image((lons_syn, lats_syn, data), crs=ccrs.PlateCarree())
-    # Rasterizing here with dynamic=False returns a static Image/QuadMesh element
-    return rasterize(img, dynamic=False).opts(
-        cmap='viridis', colorbar=True, width=500, height=400,
-        tools=['hover'], shared_axes=False
-    )
-
-# Create the DynamicMap of rasterized results
-rasterized_anim = hv.DynamicMap(get_map_data, streams=[player.param.value])
+    return gv.Image((map_plan.xs, map_plan.ys, map_plan(data)), crs=ccrs.GOOGLE_MERCATOR)
+
+# Create the DynamicMap of rasterized results (fixed options set once)
+rasterized_anim = hv.DynamicMap(get_map_data, streams=[player.param.value]).opts(
+    gv.opts.Image(cmap='viridis', colorbar=True, width=500, height=400,
+                  tools=['hover'], shared_axes=False)
+)
 
 # Overlay with tiles
 rasterized_anim_map = (tiles * rasterized_anim).opts(
@@ -2,23 +2,35 @@
 This example demonstrates hierarchical dynamic content generation in Panel.
 It replicates '6_Hierarchical_Generation.py', where clicking buttons at one level
 generates new buttons at the next level down.
+Every level is a collapsible card (collapsed except the first) showing one page of buttons:
+the levels are kept as counts and only the buttons of the visible pages exist as widgets.
 """
 import panel as pn
 import numpy as np
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Tree_View import LevelTree
 
 pn.extension()
 
 # Colors for the buttons (using only Bokeh/Panel valid button_type options)
 color_options = ["primary", "success", "warning", "danger", "light", "default"]
 
-# Main container to hold rows of buttons (one row per level)
+# Number of buttons of every level, expanded levels and shown pages
+PAGE_SIZE = 24
+tree = LevelTree(page_size=PAGE_SIZE)
+
+# Main container to hold one card per level
 display_area = pn.Column(sizing_mode='stretch_width')
+# Widgets of every level section: card, body and pager label
+sections = {}
 
 def create_button(level, count):
     """Creates a new button for a specific level."""
     # Map color options
     color = color_options[count % len(color_options)]
-    
+
     # In Panel, 'light' and 'dark' are valid but might look different depending on theme
     # We'll use the button_type that matches the color names
     btn = pn.widgets.Button(
@@ -26,27 +38,64 @@ def create_button(level, count):
         button_type=color if color not in ['light', 'dark'] else 'default',
         width=150
     )
-    
+
     # Callback for when this button is clicked
     def on_click(event):
         add_level_content(level + 1)
-        
+
     btn.on_click(on_click)
     return btn
 
+def level_title(level):
+    return f"Level {level} ({tree.count(level)} buttons)"
+
+def page_label(level):
+    return f"{tree.page(level) + 1} / {tree.n_pages(level)}"
+
+def render_level(level):
+    """Rebuilds the buttons of the shown page of a level (none when it is collapsed)."""
+    section = sections[level]
+    section['body'].objects = [create_button(level, index) for index in tree.visible(level)]
+    section['card'].title = level_title(level)
+    section['pager'].object = page_label(level)
+
+def create_section(level):
+    """Collapsible card of a level with a pager; its buttons are only built when it is expanded."""
+    body = pn.FlexBox(flex_wrap='wrap', sizing_mode='stretch_width')
+    pager = pn.pane.Str(page_label(level), margin=(5, 10))
+    prev_button = pn.widgets.Button(name='<', width=40)
+    next_button = pn.widgets.Button(name='>', width=40)
+    card = pn.Card(pn.Row(prev_button, pager, next_button), body, title=level_title(level),
+                   collapsed=not tree.is_expanded(level), sizing_mode='stretch_width', margin=(10, 0))
+    sections[level] = {'card': card, 'body': body, 'pager': pager}
+
+    def on_collapse(event):
+        tree.set_expanded(level, not event.new)
+        render_level(level)
+
+    def on_page(step):
+        tree.move_page(level, step)
+        render_level(level)
+
+    card.param.watch(on_collapse, 'collapsed')
+    prev_button.on_click(lambda e: on_page(-1))
+    next_button.on_click(lambda e: on_page(1))
+    render_level(level)
+    return card
+
 def add_level_content(level):
-    """Ensures a row exists for the given level and adds a new button to it."""
-    # Ensure display_area has enough rows (children)
-    # level 1 -> index 0, level 2 -> index 1, etc.
-    while len(display_area) < level:
-        new_row = pn.Row(sizing_mode='stretch_width', margin=(10, 0))
-        display_area.append(new_row)
-    
-    target_row = display_area[level - 1]
-    
-    # Current button count in this row
-    btn_count = len(target_row) + 1
-    target_row.append(create_button(level, btn_count))
+    """Adds a button to a level, creating its card with the first button."""
+    # level 1 -> card 0, level 2 -> card 1, etc. (a level only appears after the previous one)
+    index = tree.add(level)
+    if index == 1:
+        display_area.append(create_section(level))
+        return
+    section = sections[level]
+    section['card'].title = level_title(level)
+    section['pager'].object = page_label(level)
+    # Only a button falling on the shown page of an expanded level becomes a widget
+    if tree.is_visible(level, index):
+        section['body'].append(create_button(level, index))
 
 # Main Add Level button
 main_button = pn.widgets.Button(name="Add Level 1", button_type="primary", width=200, align='center')
@@ -0,0 +1,220 @@
+"""
+This module serves a Dash app on an event loop (ASGI, e.g. uvicorn) so I/O-bound callbacks do not block
+worker threads. Callbacks can be `async def` and await the non-blocking reads below (files, HTTP, NetCDF
+slices, uploads); they run on the loop, many at a time. Synchronous callbacks keep working: they are
+offloaded to a bounded thread pool, which also bounds the blocking reads. Everything that is not a
+callback (layout, assets, the extra routes of utils/) goes to the Flask server unchanged.
+Compared with the threaded app.run, this saves a thread per waiting request rather than adding throughput
+(benchmarks/Bench_Async_Serving.py): on one core both reach about the same requests per second.
+
+    uvicorn --app-dir MapboxMaps Maps_Vector_Field:asgi --port 8054 --workers 2
+
+Async mode needs asgiref (pip install "dash[async]") and an ASGI server such as uvicorn; aiohttp is optional
+(HTTP reads without threads). Without asgiref, async_callback turns the async callbacks back into synchronous
+ones, so the apps still run with app.run.
+"""
+import asyncio
+import base64
+import contextvars
+import functools
+import importlib.util
+import inspect
+import io
+import os
+import threading
+import urllib.request
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Dash only accepts async callbacks when asgiref is installed
+ASYNC_CALLBACKS = importlib.util.find_spec('asgiref') is not None
+
+_executor = None
+_executor_lock = threading.Lock()
+_http_sessions = weakref.WeakKeyDictionary()
+
+
+def executor():
+    """Bounded thread pool of the blocking work (ASYNC_WORKERS threads, by default min(32, cpus + 4))."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.environ.get('ASYNC_WORKERS', min(32, (os.cpu_count() or 1) + 4)))
+            _executor = ThreadPoolExecutor(workers, thread_name_prefix='async-serving')
+        return _executor
+
+
+async def run_sync(func, *args, **kwargs):
+    """Awaits func(*args, **kwargs) run in the bounded pool, with the context (request, callback) of the caller."""
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(executor(), call)
+
+
+def async_callback(func):
+    """Keeps an `async def` callback as is when Dash supports them, otherwise makes it synchronous."""
+    if ASYNC_CALLBACKS:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return asyncio.run(func(*args, **kwargs))
+    return wrapper
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _fetch(url, timeout):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read()
+
+
+async def read_bytes(path):
+    """Contents of a local file, read without blocking the event loop."""
+    return await run_sync(_read_file, path)
+
+
+def _http_session():
+    # One aiohttp session (connection pool) per event loop, reused by every request of the loop
+    loop = asyncio.get_running_loop()
+    session = _http_sessions.get(loop)
+    if session is None or session.closed:
+        session = _http_sessions[loop] = aiohttp.ClientSession()
+    return session
+
+
+async def fetch(url, timeout=30):
+    """Body of a remote file (CSV, GeoJSON, ...), downloaded without blocking the event loop.
+
+    With aiohttp the download is a coroutine and takes no thread, otherwise it is offloaded to the pool.
+    """
+    if aiohttp is None:
+        return await run_sync(_fetch, url, timeout)
+    async with _http_session().get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+        response.raise_for_status()
+        return await response.read()
+
+
+async def read_values(data_array):
+    """NumPy values of a lazy xarray selection (e.g. Lazy_NetCDF.select_slice), read without blocking the loop.
+
+    xarray serializes netCDF4/HDF5 reads with a lock, so concurrent reads of one process take turns, but the
+    loop keeps serving the other requests meanwhile.
+    """
+    return await run_sync(lambda: data_array.values)
+
+
+async def decode_upload(contents):
+    """(content type, bytes) of a dcc.Upload 'data:<type>;base64,<data>' string, decoded off the loop."""
+    header, data = contents.split(',', 1)
+    content_type = header[len('data:'):].split(';')[0]
+    return content_type, await run_sync(base64.b64decode, data)
+
+
+class AsgiDash:
+    """ASGI application of a Dash app (Flask backend) that runs its callbacks on the event loop.
+
+    Requests to _dash-update-component are dispatched here, inside a Flask request context, so the before/after
+    request hooks, callback_context and the error handlers (PreventUpdate) behave as in Flask. Async callbacks
+    are awaited on the loop and synchronous ones run in the bounded pool. Other requests go to the WSGI server.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.server = app.server
+        self.callback_path = app.config.routes_pathname_prefix + '_dash-update-component'
+        self._wsgi = None
+
+    @property
+    def wsgi(self):
+        # Imported on first use, so the apps can create their ASGI app even without asgiref
+        if self._wsgi is None:
+            from asgiref.wsgi import WsgiToAsgi
+            self._wsgi = WsgiToAsgi(self.server)
+        return self._wsgi
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] == self.callback_path:
+            await self._callback(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _callback(self, scope, receive, send):
+        from asgiref.wsgi import WsgiToAsgiInstance
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        # The same WSGI environ as the requests that go to Flask
+        adapter = WsgiToAsgiInstance(self.server)
+        adapter.scope = scope
+        environ = adapter.build_environ(scope, io.BytesIO(bytes(body)))
+        # Flask keeps the request context in contextvars: it follows this task across the awaits
+        with self.server.request_context(environ):
+            try:
+                response = self.server.preprocess_request()
+                if response is None:
+                    response = await self._dispatch()
+            except Exception as e:
+                try:
+                    response = self.server.handle_user_exception(e)
+                except Exception as unhandled:
+                    response = self.server.handle_exception(unhandled)
+            response = self.server.process_response(self.server.make_response(response))
+            await send({'type': 'http.response.start', 'status': response.status_code,
+                        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1'))
+                                    for k, v in response.headers.items()]})
+            await send({'type': 'http.response.body', 'body': response.get_data()})
+
+    async def _dispatch(self):
+        # Same steps as the dispatch view of Dash's Flask backend
+        # pylint: disable=protected-access
+        from flask import request
+        app = self.app
+        body = request.get_json()
+        cb_ctx = app._initialize_context(body)
+        func = app._prepare_callback(cb_ctx, body)
+        args = app._inputs_to_vals(cb_ctx.inputs_list + cb_ctx.states_list)
+        partial_func = app._execute_callback(func, args, cb_ctx.outputs_list, cb_ctx)
+        if inspect.iscoroutinefunction(func):
+            response_data = await partial_func()
+        else:
+            response_data = await run_sync(partial_func)
+        return cb_ctx.dash_response.set_response(data=response_data)
+
+
+def asgi_app(app):
+    """ASGI application of app, e.g. `asgi = asgi_app(app)` in the example, served by `uvicorn module:asgi`."""
+    return AsgiDash(app)
+
+
+def serve(app, host='127.0.0.1', port=8050, **kwargs):
+    """Serves app with uvicorn on an event loop (one process; use the uvicorn CLI for several workers)."""
+    try:
+        import uvicorn
+    except ImportError as e:
+        raise ImportError('Async serving needs an ASGI server: pip install uvicorn "dash[async]"') from e
+    if not ASYNC_CALLBACKS:
+        raise ImportError('Async callbacks need asgiref: pip install "dash[async]"')
+    uvicorn.run(asgi_app(app), host=host, port=port, **kwargs)
@@ -0,0 +1,78 @@
+"""
+This module aggregates gridded data on the server before sending it to density maps.
+The bin size follows the map zoom from ``relayoutData`` and only the cells inside the viewport
+are returned, so the number of points per update stays bounded at any zoom level.
+"""
+import math
+
+import numpy as np
+
+TILE_SIZE = 256  # Web Mercator tile size in pixels
+
+
+def zoom_cell_size(zoom, pixels_per_cell=8):
+    """Cell size in degrees (longitude) that covers pixels_per_cell pixels at this zoom."""
+    return 360.0 / (TILE_SIZE * 2 ** zoom) * pixels_per_cell
+
+
+def viewport_from_relayout(relayout_data, center, zoom, size_px=(1000, 500)):
+    """(lon_min, lon_max, lat_min, lat_max, zoom) of a mapbox figure.
+
+    Uses the corners plotly reports in 'mapbox._derived' and falls back to an estimate
+    from the center and zoom (e.g. for the first call, when relayoutData is None).
+    """
+    relayout_data = relayout_data or {}
+    zoom = relayout_data.get('mapbox.zoom', zoom)
+    derived = relayout_data.get('mapbox._derived', {}).get('coordinates')
+    if derived:
+        lons, lats = zip(*derived)
+        return min(lons), max(lons), min(lats), max(lats), zoom
+
+    center = relayout_data.get('mapbox.center', center)
+    half_lon = 360.0 / (TILE_SIZE * 2 ** zoom) * size_px[0] / 2
+    # Latitude span shrinks with cos(lat) in Web Mercator
+    half_lat = half_lon * size_px[1] / size_px[0] * math.cos(math.radians(center['lat']))
+    return (center['lon'] - half_lon, center['lon'] + half_lon,
+            max(center['lat'] - half_lat, -85), min(center['lat'] + half_lat, 85), zoom)
+
+
+def _window(axis, lo, hi):
+    idx = np.nonzero((axis >= lo) & (axis <= hi))[0]
+    return (idx.min(), idx.max() + 1) if idx.size else (0, 0)
+
+
+def bin_grid(lons, lats, values, viewport, cell_deg, max_points=20000):
+    """Block-averages a regular (lat, lon) grid inside the viewport.
+
+    The block size is the number of source cells per cell_deg, increased further if needed so
+    that at most max_points cells are returned (also for windows thinner than a block). Returns (lat, lon, value) of the non-NaN cells.
+    """
+    lon_min, lon_max, lat_min, lat_max = viewport[:4]
+    i0, i1 = _window(lats, lat_min, lat_max)
+    j0, j1 = _window(lons, lon_min, lon_max)
+    ni, nj = i1 - i0, j1 - j0
+    if ni == 0 or nj == 0:
+        return np.empty(0), np.empty(0), np.empty(0)
+
+    dlon = abs(lons[1] - lons[0]) if lons.size > 1 else cell_deg
+    k = max(1, int(round(cell_deg / dlon)))
+    k = max(k, int(math.ceil(math.sqrt(ni * nj / max_points))))
+    # A window smaller than one block is averaged with the largest block that fits, per axis. A side
+    # clamped that way leaves more blocks on the other one, which grows back under max_points.
+    ki, kj = min(k, ni), min(k, nj)
+    kj = min(max(kj, math.ceil(nj / max(max_points // (ni // ki), 1))), nj)
+    ki = min(max(ki, math.ceil(ni / max(max_points // (nj // kj), 1))), ni)
+    ni, nj = ni // ki * ki, nj // kj * kj
+
+    block = values[i0:i0 + ni, j0:j0 + nj].reshape(ni // ki, ki, nj // kj, kj)
+    valid = np.isfinite(block)
+    counts = valid.sum(axis=(1, 3))
+    sums = np.where(valid, block, 0).sum(axis=(1, 3))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+
+    lat_c = lats[i0:i0 + ni].reshape(-1, ki).mean(axis=1)
+    lon_c = lons[j0:j0 + nj].reshape(-1, kj).mean(axis=1)
+    LON, LAT = np.meshgrid(lon_c, lat_c)
+    keep = counts > 0
+    return LAT[keep], LON[keep], means[keep]
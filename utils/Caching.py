@@ -0,0 +1,289 @@
+"""
+This module contains the small caches shared by the examples.
+LRUCache is a bounded, thread-safe mapping with hit/miss/eviction counters and an optional time to live,
+DiskCache the same on files that several worker processes share, memoize_callback caches the outputs
+of a callback by its (normalized) inputs, and quantize_viewport snaps plot ranges and sizes so that
+near-identical viewports share a cache key.
+"""
+import functools
+import hashlib
+import json
+import math
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded least-recently-used cache. With ttl (seconds) entries older than ttl count as misses."""
+
+    def __init__(self, maxsize=64, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._times = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def _expired(self, key):
+        return self.ttl is not None and time.monotonic() - self._times[key] > self.ttl
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data and self._expired(key):
+                del self._data[key], self._times[key]
+                self.expirations += 1
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._times[key] = time.monotonic()
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                del self._times[self._data.popitem(last=False)[0]]
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            self._times.pop(key, None)
+            return self._data.pop(key, default)
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value or computes, stores and returns it."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._times.clear()
+
+    def stats(self):
+        return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions, 'expirations': self.expirations}
+
+
+def cache_dir():
+    """Folder of the shared callback caches: CALLBACK_CACHE_DIR or the temporary folder."""
+    return os.environ.get('CALLBACK_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'dash_callback_cache'))
+
+
+class DiskCache:
+    """LRUCache-like cache of pickled values in a folder, shared by the processes that use the same folder.
+
+    Files are written under a temporary name and renamed, reads touch the file (its mtime is the last use)
+    and the least recently used files are removed above maxsize. Counters are per process.
+    """
+
+    def __init__(self, directory=None, maxsize=1024, ttl=None):
+        self.directory = directory or cache_dir()
+        os.makedirs(self.directory, exist_ok=True)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(str(key).encode()).hexdigest() + '.pkl')
+
+    def _files(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith('.pkl')]
+
+    def __len__(self):
+        return len(self._files())
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            if self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                self.expirations += 1
+                raise FileNotFoundError(path)
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        files = self._files()
+        if len(files) > self.maxsize:
+            files.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in files[:len(files) - self.maxsize]:
+                try:
+                    os.remove(entry.path)
+                    self.evictions += 1
+                except OSError:  # removed by another worker
+                    pass
+
+    def pop(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.remove(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return default
+        return value
+
+    def clear(self):
+        for entry in self._files():
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def stats(self):
+        return {'size': len(self), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'expirations': self.expirations, 'directory': self.directory}
+
+
+def normalize(value):
+    """JSON-compatible, order independent version of callback inputs (dict keys sorted, tuples and arrays
+    as lists, numpy scalars as Python numbers), so equal inputs give equal cache keys."""
+    if isinstance(value, dict):
+        return {str(k): normalize(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return normalize(value.tolist())
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def callback_key(*args, **kwargs):
+    return json.dumps([normalize(args), normalize(kwargs)], sort_keys=True, default=str, separators=(',', ':'))
+
+
+_memoized = {}
+
+
+def memoize_callback(name=None, maxsize=256, ttl=None, disk=False, disk_maxsize=1024, directory=None, key=None):
+    """Decorator caching the outputs of a pure callback by its inputs (place it below @app.callback).
+
+    Values are kept in an LRUCache of maxsize entries, and with disk=True also in a DiskCache of
+    disk_maxsize entries shared by the workers (in `directory`/name). ttl (seconds) applies to both.
+    key(*args, **kwargs) can replace the default key, e.g. to keep only the fields of an event the
+    output depends on. Exceptions (such as
+    PreventUpdate) are not cached. The wrapper has invalidate(*args, **kwargs), cache_clear() and stats().
+    """
+    def decorator(func):
+        cache_name = name or func.__name__
+        memory = LRUCache(maxsize, ttl=ttl)
+        shared = None
+        if disk:
+            shared = DiskCache(os.path.join(directory or cache_dir(), cache_name), maxsize=disk_maxsize, ttl=ttl)
+        make_key = key or callback_key
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = make_key(*args, **kwargs)
+            value = memory.get(cache_key, _MISSING)
+            if value is _MISSING and shared is not None:
+                value = shared.get(cache_key, _MISSING)
+                if value is not _MISSING:
+                    memory.put(cache_key, value)
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                memory.put(cache_key, value)
+                if shared is not None:
+                    shared.put(cache_key, value)
+            return value
+
+        def invalidate(*args, **kwargs):
+            """Drops the cached outputs of these inputs."""
+            cache_key = make_key(*args, **kwargs)
+            memory.pop(cache_key)
+            if shared is not None:
+                shared.pop(cache_key)
+
+        def cache_clear():
+            memory.clear()
+            if shared is not None:
+                shared.clear()
+
+        def stats():
+            stats = {'memory': memory.stats()}
+            if shared is not None:
+                stats['disk'] = shared.stats()
+            # Misses of the memory cache found on disk are hits too
+            lookups = memory.hits + memory.misses
+            hits = memory.hits + (shared.hits if shared is not None else 0)
+            stats['hit_rate'] = round(hits / lookups, 3) if lookups else None
+            return stats
+
+        wrapper.invalidate, wrapper.cache_clear, wrapper.stats = invalidate, cache_clear, stats
+        _memoized[cache_name] = wrapper
+        return wrapper
+    return decorator
+
+
+def memo_stats():
+    """Hit/miss/eviction counters of every memoized callback, by name."""
+    return {name: wrapper.stats() for name, wrapper in sorted(_memoized.items())}
+
+
+def invalidate_memoized(name=None):
+    """Clears the cache of one memoized callback (or of all), e.g. when its source data changed."""
+    for cache_name, wrapper in list(_memoized.items()):
+        if name is None or cache_name == name:
+            wrapper.cache_clear()
+
+
+def register_cache_route(app, path='/cache-stats'):
+    """Adds a JSON route with the counters of the memoized callbacks."""
+    from flask import jsonify  # imported here, the Panel examples use this module without Flask
+    app.server.add_url_rule(path, 'cache_stats', lambda: jsonify(memo_stats()))
+
+
+def quantize_range(lo, hi, steps=16):
+    """Snaps (lo, hi) outwards to a power-of-two grid ~1/steps of the span wide."""
+    span = hi - lo
+    if not span > 0:
+        return lo, hi
+    step = 2.0 ** math.floor(math.log2(span / steps))
+    return math.floor(lo / step) * step, math.ceil(hi / step) * step
+
+
+def quantize_viewport(x_range, y_range, width, height, steps=16, size_step=64):
+    """Cache key for a viewport: snapped ranges and sizes rounded up to size_step pixels."""
+    width = int(math.ceil(width / size_step) * size_step)
+    height = int(math.ceil(height / size_step) * size_step)
+    return quantize_range(*x_range, steps), quantize_range(*y_range, steps), width, height
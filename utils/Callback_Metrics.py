@@ -0,0 +1,255 @@
+"""
+This module measures where the time of every Dash callback goes, without changing the callbacks.
+instrument_app wraps all the registered callbacks (on the first request, once dash.callback ones are
+merged) and times the JSON serialization of their responses apart from the callback itself, recording
+latency, request/response bytes, calls, PreventUpdate and errors per callback (identified by its outputs,
+with the function name as a second label). They are served at
+/metrics in the Prometheus text format and as a small debug panel added at the bottom of the layout.
+"""
+import contextvars
+import functools
+import inspect
+import threading
+import time
+
+import dash._callback
+from dash import html
+from dash.exceptions import PreventUpdate
+from flask import Response, request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Seconds spent in to_json by the callback running in the current context
+_serialize_s = contextvars.ContextVar('serialize_s', default=None)
+
+
+class Histogram:
+    """Cumulative Prometheus histogram (bucket counts, sum and count)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q quantile (an estimate, as Prometheus does)."""
+        if not self.count:
+            return None
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= q * self.count:
+                return bound
+        return float('inf')
+
+
+class CallbackMetrics:
+    """Measurements of one callback."""
+
+    def __init__(self, function=''):
+        self.function = function
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.request_bytes = Histogram(SIZE_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.compute_s = 0.0
+        self.serialize_s = 0.0
+        self.calls = 0
+        self.prevented = 0
+        self.errors = 0
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def callback_metrics(callback_id, function=''):
+    """Metrics of the callback with these outputs (its id in app.callback_map)."""
+    with _metrics_lock:
+        return _metrics.setdefault(callback_id, CallbackMetrics(function))
+
+
+def _timed_to_json(to_json):
+    @functools.wraps(to_json)
+    def wrapper(*args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return to_json(*args, **kwargs)
+        finally:
+            spent = _serialize_s.get()
+            if spent is not None:
+                spent[0] += time.perf_counter() - t
+    wrapper._timed = True
+    return wrapper
+
+
+def _record(metrics, start, serialize, response, error=None):
+    total = time.perf_counter() - start
+    with _metrics_lock:
+        metrics.calls += 1
+        metrics.latency.observe(total)
+        metrics.request_bytes.observe(request.content_length or 0)
+        metrics.serialize_s += serialize[0]
+        metrics.compute_s += total - serialize[0]
+        if isinstance(error, PreventUpdate):
+            metrics.prevented += 1
+        elif error is not None:
+            metrics.errors += 1
+        if isinstance(response, (str, bytes)):
+            metrics.response_bytes.observe(len(response))
+
+
+def _instrument(callback, callback_id):
+    """Wraps the function Dash calls for a callback (user function plus response serialization)."""
+    metrics = callback_metrics(callback_id, getattr(callback, '__name__', ''))
+    if inspect.iscoroutinefunction(callback):
+        @functools.wraps(callback)
+        async def wrapper(*args, **kwargs):
+            start, serialize = time.perf_counter(), [0.0]
+            token = _serialize_s.set(serialize)
+            try:
+                response = await callback(*args, **kwargs)
+            except Exception as e:
+                _record(metrics, start, serialize, None, e)
+                raise
+            finally:
+                _serialize_s.reset(token)
+            _record(metrics, start, serialize, response)
+            return response
+    else:
+        @functools.wraps(callback)
+        def wrapper(*args, **kwargs):
+            start, serialize = time.perf_counter(), [0.0]
+            token = _serialize_s.set(serialize)
+            try:
+                response = callback(*args, **kwargs)
+            except Exception as e:
+                _record(metrics, start, serialize, None, e)
+                raise
+            finally:
+                _serialize_s.reset(token)
+            _record(metrics, start, serialize, response)
+            return response
+    wrapper._instrumented = True
+    return wrapper
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _labels(callback_id, metrics):
+    return f'callback="{_label(callback_id)}",function="{_label(metrics.function)}"'
+
+
+def prometheus_text():
+    """Every callback metric in the Prometheus text exposition format."""
+    with _metrics_lock:
+        items = sorted(_metrics.items())
+        lines = []
+        for metric, help_text, attr in [
+                ('dash_callback_duration_seconds', 'Callback latency (compute and serialization).', 'latency'),
+                ('dash_callback_request_bytes', 'Size of the callback request body.', 'request_bytes'),
+                ('dash_callback_response_bytes', 'Size of the callback response body.', 'response_bytes')]:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+            for callback_id, metrics in items:
+                labels = _labels(callback_id, metrics)
+                histogram = getattr(metrics, attr)
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound:g}"}} {count}')
+                lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum{{{labels}}} {histogram.sum:.6f}')
+                lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+        for metric, help_text, attr in [
+                ('dash_callback_compute_seconds_total', 'Time spent in the callback itself.', 'compute_s'),
+                ('dash_callback_serialize_seconds_total', 'Time spent serializing the response.', 'serialize_s'),
+                ('dash_callback_calls_total', 'Callback requests.', 'calls'),
+                ('dash_callback_prevented_total', 'Requests ending in PreventUpdate.', 'prevented'),
+                ('dash_callback_errors_total', 'Requests ending in an exception.', 'errors')]:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            for callback_id, metrics in items:
+                value = getattr(metrics, attr)
+                value = f"{value:.6f}" if isinstance(value, float) else value
+                lines.append(f'{metric}{{{_labels(callback_id, metrics)}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_summary():
+    """One row per callback for the debug panel."""
+    with _metrics_lock:
+        rows = []
+        for callback_id, m in sorted(_metrics.items()):
+            calls = max(m.calls, 1)
+            rows.append({'callback': callback_id, 'function': m.function, 'calls': m.calls, 'errors': m.errors, 'prevented': m.prevented,
+                         'mean_ms': round(1000 * m.latency.sum / calls, 2),
+                         'p95_ms': None if m.latency.quantile(0.95) is None else 1000 * m.latency.quantile(0.95),
+                         'compute_ms': round(1000 * m.compute_s / calls, 2),
+                         'serialize_ms': round(1000 * m.serialize_s / calls, 2),
+                         'request_kb': round(m.request_bytes.sum / calls / 1024, 2),
+                         'response_kb': round(m.response_bytes.sum / max(m.response_bytes.count, 1) / 1024, 2)})
+    return rows
+
+
+def _panel_html():
+    rows = metrics_summary()
+    columns = list(rows[0]) if rows else ['callback']
+    header = ''.join(f"<th>{c}</th>" for c in columns)
+    body = ''.join('<tr>' + ''.join(f"<td>{row[c]}</td>" for c in columns) + '</tr>' for row in rows)
+    return ('<html><head><meta http-equiv="refresh" content="2"><style>'
+            'body{font:12px monospace;margin:4px} td,th{padding:2px 8px;text-align:right} '
+            'td:first-child{text-align:left}</style></head><body>'
+            f"<table><tr>{header}</tr>{body}</table></body></html>")
+
+
+def metrics_panel(path='/callback-metrics'):
+    """Collapsible debug panel with the table of the metrics (refreshed every 2 s, without callbacks)."""
+    return html.Details([
+        html.Summary('Callback metrics'),
+        html.Iframe(src=path, style={'width': '100%', 'height': '220px', 'border': 'none'}),
+    ], id='callback-metrics-panel', style={'fontSize': '12px', 'marginTop': '10px'})
+
+
+def _with_panel(layout, panel):
+    if callable(layout):
+        @functools.wraps(layout)
+        def serve_layout(*args, **kwargs):
+            return html.Div([layout(*args, **kwargs), panel])
+        return serve_layout
+    return html.Div([layout, panel])
+
+
+def instrument_app(app, path='/metrics', panel_path='/callback-metrics', panel=True):
+    """Records the metrics of every callback of app, serves them at path (Prometheus) and panel_path (HTML).
+
+    With panel=True the debug panel is added at the bottom of the layout.
+    """
+    if not getattr(dash._callback.to_json, '_timed', False):
+        dash._callback.to_json = _timed_to_json(dash._callback.to_json)
+    wrapped = {'count': -1, 'layout': False}
+    lock = threading.Lock()
+
+    def wrap_callbacks():
+        # Runs after Dash's own first-request setup, which merges the dash.callback callbacks
+        with lock:
+            if panel and not wrapped['layout'] and app.layout is not None:
+                app.layout = _with_panel(app.layout, metrics_panel(panel_path))
+                wrapped['layout'] = True
+            if len(app.callback_map) == wrapped['count']:
+                return
+            for callback_id, spec in app.callback_map.items():
+                # Clientside callbacks never reach the server and have no function
+                callback = spec.get('callback')
+                if callback is not None and not getattr(callback, '_instrumented', False):
+                    spec['callback'] = _instrument(callback, callback_id)
+            wrapped['count'] = len(app.callback_map)
+
+    app.server.before_request(wrap_callbacks)
+    app.server.add_url_rule(path, 'prometheus_metrics',
+                            lambda: Response(prometheus_text(), mimetype='text/plain; version=0.0.4'))
+    app.server.add_url_rule(panel_path, 'callback_metrics_panel', _panel_html)
@@ -0,0 +1,182 @@
+"""
+This module coalesces high-frequency graph events (hoverData, relayoutData, ...) before they reach the server.
+throttled_input puts a clientside throttle/debounce (with a trailing call) between a component property and a
+dcc.Store, drop_stale skips requests that were overtaken by a newer event of the same browser, and every
+wrapped callback counts its requests so /callback-rates can show the reduction. Pure formatting callbacks
+can instead run entirely in the browser with clientside_json.
+"""
+import functools
+import json
+import threading
+import time
+from collections import deque
+
+from dash import dcc, Input, Output
+from dash.exceptions import PreventUpdate
+from flask import jsonify
+
+from utils.Caching import LRUCache
+
+# Shared by every throttled store: one random client id per page load, and per store the
+# sequence number, the number of raw events seen and the pending trailing timer.
+_THROTTLE_JS = """
+function(value) {
+    var cfg = %(cfg)s;
+    var w = window.__dashThrottle = window.__dashThrottle ||
+        {client: Math.random().toString(36).slice(2), stores: {}};
+    var s = w.stores[cfg.id] = w.stores[cfg.id] || {seq: 0, events: 0, last: 0, timer: null};
+    s.events += 1;
+    s.value = value;
+    function payload() {
+        s.seq += 1;
+        s.last = Date.now();
+        return {client: w.client, seq: s.seq, events: s.events, value: s.value};
+    }
+    function trailing() {
+        s.timer = null;
+        dash_clientside.set_props(cfg.id, {data: payload()});
+    }
+    // The first event (initial call) always goes through
+    if (s.seq === 0) {
+        return payload();
+    }
+    if (cfg.mode === 'debounce') {
+        clearTimeout(s.timer);
+        s.timer = setTimeout(trailing, cfg.wait);
+        return dash_clientside.no_update;
+    }
+    var elapsed = Date.now() - s.last;
+    if (s.timer === null && elapsed >= cfg.wait) {
+        return payload();
+    }
+    // Inside the window: the latest value is sent once the window closes
+    if (s.timer === null) {
+        s.timer = setTimeout(trailing, Math.max(0, cfg.wait - elapsed));
+    }
+    return dash_clientside.no_update;
+}
+"""
+
+
+def throttled_input(app, component_id, component_property, wait_ms=100, mode='throttle'):
+    """Clientside throttle (or debounce) of a component property.
+
+    Returns (store, input): the dcc.Store must be added to the layout and the Input used by the
+    server callbacks instead of the raw property. The store data is {client, seq, events, value}.
+    """
+    if mode not in ('throttle', 'debounce'):
+        raise ValueError(f"mode must be 'throttle' or 'debounce', got {mode}")
+    store_id = f"{component_id}-{component_property}-{mode}"
+    cfg = json.dumps(dict(id=store_id, wait=wait_ms, mode=mode))
+    app.clientside_callback(_THROTTLE_JS % dict(cfg=cfg),
+                            Output(store_id, 'data'),
+                            Input(component_id, component_property))
+    return dcc.Store(id=store_id), Input(store_id, 'data')
+
+
+def clientside_json(app, output_id, input_id, input_property, indent=2):
+    """Formats a property as JSON in the browser (replaces a json.dumps server callback)."""
+    app.clientside_callback(
+        f"function(value) {{ return JSON.stringify(value === undefined ? null : value, null, {int(indent)}); }}",
+        Output(output_id, 'children'),
+        Input(input_id, input_property))
+
+
+class RateCounter:
+    """Request counter of one callback: totals, dropped requests and the rate over the last seconds."""
+
+    def __init__(self, window_s=10):
+        self.window_s = window_s
+        self.calls = 0
+        self.dropped = 0
+        self._times = deque()
+        # Raw browser events per client, reported by the throttled stores (oldest clients dropped)
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def record(self, dropped=False, client=None, events=None):
+        now = time.monotonic()
+        with self._lock:
+            self.calls += 1
+            self.dropped += dropped
+            self._times.append(now)
+            while self._times and self._times[0] < now - self.window_s:
+                self._times.popleft()
+            if client is not None and events is not None:
+                self._events[client] = max(events, self._events.pop(client, 0))
+                if len(self._events) > 1024:
+                    self._events.pop(next(iter(self._events)))
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            recent = sum(1 for t in self._times if t >= now - self.window_s)
+            stats = {'calls': self.calls, 'dropped': self.dropped, 'rate_per_s': recent / self.window_s}
+            source_events = sum(self._events.values())
+        if source_events:
+            stats['source_events'] = source_events
+            stats['reduction'] = round(source_events / max(self.calls, 1), 2)
+        return stats
+
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def rate_counter(name):
+    with _counters_lock:
+        return _counters.setdefault(name, RateCounter())
+
+
+def callback_rates():
+    """Stats of every counted callback, by name."""
+    return {name: counter.stats() for name, counter in sorted(_counters.items())}
+
+
+def counted(name):
+    """Decorator that only counts the requests of a (non throttled) callback."""
+    def decorator(func):
+        counter = rate_counter(name)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            counter.record()
+            return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def drop_stale(name):
+    """Decorator for callbacks whose first input is a throttled store.
+
+    Unwraps the store payload into its value, and skips (PreventUpdate) requests whose sequence
+    number is not newer than the last one received from the same browser.
+    """
+    def decorator(func):
+        counter = rate_counter(name)
+        latest_seq = LRUCache(1024)
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(payload, *args, **kwargs):
+            if not (isinstance(payload, dict) and 'seq' in payload):
+                counter.record()
+                return func(payload, *args, **kwargs)
+            client, seq = payload.get('client'), payload['seq']
+            # Compare and store under one lock so two concurrent requests cannot both pass
+            with lock:
+                stale = seq <= latest_seq.get(client, 0)
+                if not stale:
+                    latest_seq.put(client, seq)
+            counter.record(dropped=stale, client=client, events=payload.get('events'))
+            if stale:
+                raise PreventUpdate
+            return func(payload.get('value'), *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def register_rates_route(app, path='/callback-rates'):
+    """Adds a JSON route with the request counters of the app."""
+    app.server.add_url_rule(path, 'callback_rates', lambda: jsonify(callback_rates()))
+
@@ -0,0 +1,258 @@
+"""
+This module computes global statistics of gridded variables in a single chunked pass.
+Each (time, depth) slice is read once and folded into min/max, mean/std and a mergeable
+histogram sketch, which gives approximate percentiles and the CDF used for histogram equalization.
+The results are stored as a JSON file next to the data so renderers can use a fixed colour range
+for every frame without rescanning the files.
+"""
+import glob
+import json
+import os
+
+import numpy as np
+
+STATS_VERSION = 1
+
+
+class HistogramSketch:
+    """Mergeable fixed-size histogram whose range grows by doubling the bin width."""
+
+    def __init__(self, n_bins=4096):
+        self.n_bins = n_bins
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.lo = None
+        self.width = None
+
+    @property
+    def hi(self):
+        return self.lo + self.n_bins * self.width
+
+    def _init_range(self, vmin, vmax):
+        span = vmax - vmin
+        if span <= 0:
+            span = max(abs(vmin), 1.0) * 1e-6
+        self.lo = vmin
+        # A little headroom so the maximum does not sit on the last edge
+        self.width = span * 1.001 / self.n_bins
+
+    def _grow(self, vmin, vmax):
+        # Each doubling merges pairs of bins, keeping the old edges aligned with the new ones
+        while vmin < self.lo or vmax >= self.hi:
+            merged = self.counts.reshape(-1, 2).sum(axis=1)
+            half = self.n_bins // 2
+            self.counts = np.zeros(self.n_bins, dtype=np.int64)
+            if vmin < self.lo:
+                # Extend to the left: old range ends up in the upper half
+                self.counts[half:] = merged
+                self.lo = self.lo - self.n_bins * self.width
+            else:
+                self.counts[:half] = merged
+            self.width *= 2
+
+    def update(self, values):
+        """Adds finite values (any shape) to the sketch."""
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        vmin, vmax = values.min(), values.max()
+        if self.lo is None:
+            self._init_range(float(vmin), float(vmax))
+        else:
+            self._grow(float(vmin), float(vmax))
+        idx = ((values - self.lo) / self.width).astype(np.int64)
+        np.clip(idx, 0, self.n_bins - 1, out=idx)
+        self.counts += np.bincount(idx, minlength=self.n_bins)
+
+    def merge(self, other):
+        """Merges another sketch into this one (error is bounded by the coarser bin width)."""
+        if other.lo is None:
+            return
+        if self.lo is None:
+            self.lo, self.width, self.counts = other.lo, other.width, other.counts.copy()
+            return
+        self._grow(other.lo, other.hi - other.width)
+        centers = other.lo + (np.arange(other.n_bins) + 0.5) * other.width
+        idx = np.clip(((centers - self.lo) / self.width).astype(np.int64), 0, self.n_bins - 1)
+        self.counts += np.bincount(idx, weights=other.counts, minlength=self.n_bins).astype(np.int64)
+
+    def edges(self):
+        return self.lo + np.arange(self.n_bins + 1) * self.width
+
+    def cdf(self):
+        total = self.counts.sum()
+        return np.concatenate([[0.0], np.cumsum(self.counts) / max(total, 1)])
+
+    def quantiles(self, q):
+        """Approximate quantiles (q in [0, 1]) by interpolating the cumulative histogram."""
+        return np.interp(q, self.cdf(), self.edges())
+
+    def to_dict(self):
+        return {'n_bins': self.n_bins, 'lo': self.lo, 'width': self.width, 'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(d['n_bins'])
+        sketch.lo = d['lo']
+        sketch.width = d['width']
+        sketch.counts = np.asarray(d['counts'], dtype=np.int64)
+        return sketch
+
+
+class StreamingStats:
+    """Single-pass min/max/mean/std plus a histogram sketch, fed one chunk at a time."""
+
+    def __init__(self, n_bins=4096):
+        self.count = 0
+        self.nan_count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sketch = HistogramSketch(n_bins)
+
+    def update(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float64)
+        finite = chunk[np.isfinite(chunk)]
+        self.nan_count += chunk.size - finite.size
+        if finite.size == 0:
+            return
+        # Chan et al. parallel update of mean and variance
+        n = finite.size
+        c_mean = finite.mean()
+        c_m2 = ((finite - c_mean) ** 2).sum()
+        delta = c_mean - self.mean
+        total = self.count + n
+        self.mean += delta * n / total
+        self.m2 += c_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(finite.min()))
+        self.max = max(self.max, float(finite.max()))
+        self.sketch.update(finite)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        delta = other.mean - self.mean
+        total = self.count + other.count
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / total
+        self.count = total
+        self.nan_count += other.nan_count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / self.count)) if self.count > 0 else np.nan
+
+    def to_dict(self):
+        return {'count': self.count, 'nan_count': self.nan_count, 'min': self.min, 'max': self.max,
+                'mean': self.mean, 'std': self.std, 'm2': self.m2, 'sketch': self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls(d['sketch']['n_bins'])
+        stats.count = d['count']
+        stats.nan_count = d['nan_count']
+        stats.min = d['min']
+        stats.max = d['max']
+        stats.mean = d['mean']
+        stats.m2 = d['m2']
+        stats.sketch = HistogramSketch.from_dict(d['sketch'])
+        return stats
+
+
+class FieldStats:
+    """Statistics for several variables, with the helpers renderers need."""
+
+    def __init__(self, variables, sources=None):
+        self.variables = variables  # name -> StreamingStats
+        self.sources = sources or {}
+
+    def __getitem__(self, var_name):
+        return self.variables[var_name]
+
+    def span(self, var_name, low=0.0, high=100.0):
+        """Fixed (vmin, vmax) for a variable, optionally clipped to percentiles."""
+        stats = self.variables[var_name]
+        if low <= 0 and high >= 100:
+            return stats.min, stats.max
+        vmin, vmax = stats.sketch.quantiles([low / 100, high / 100])
+        return float(vmin), float(vmax)
+
+    def equalize(self, var_name, values):
+        """Maps values to [0, 1] with the global CDF (histogram equalization)."""
+        sketch = self.variables[var_name].sketch
+        return np.interp(values, sketch.edges(), sketch.cdf())
+
+    def save(self, path):
+        out = {'version': STATS_VERSION, 'sources': self.sources,
+               'variables': {k: v.to_dict() for k, v in self.variables.items()}}
+        with open(path, 'w') as f:
+            json.dump(out, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            d = json.load(f)
+        if d.get('version') != STATS_VERSION:
+            raise ValueError(f"Unsupported stats version in {path}")
+        return cls({k: StreamingStats.from_dict(v) for k, v in d['variables'].items()}, d['sources'])
+
+
+def iter_chunks(data_array, spatial_dims=2):
+    """Yields the (time, depth, ...) slices of a DataArray one at a time, loading only that slice."""
+    lead_shape = data_array.shape[:data_array.ndim - spatial_dims]
+    for idx in np.ndindex(*lead_shape):
+        yield data_array[idx].values
+
+
+def compute_field_stats(ds, var_names, n_bins=4096, spatial_dims=2):
+    """Scans every time and depth level of each variable once, chunk by chunk."""
+    variables = {}
+    for var_name in var_names:
+        stats = StreamingStats(n_bins)
+        for chunk in iter_chunks(ds[var_name], spatial_dims):
+            stats.update(chunk)
+        variables[var_name] = stats
+    return FieldStats(variables)
+
+
+def stats_path_for(data_path):
+    """Sidecar file next to the data: 'file.nc' -> 'file.nc.stats.json', 'dir/*.nc' -> 'dir/field_stats.json'."""
+    if glob.has_magic(data_path):
+        return os.path.join(os.path.dirname(data_path), 'field_stats.json')
+    return data_path + '.stats.json'
+
+
+def _source_signature(data_path):
+    files = sorted(glob.glob(data_path)) if glob.has_magic(data_path) else [data_path]
+    return {f: os.path.getmtime(f) for f in files}
+
+
+def load_or_compute_stats(data_path, var_names, ds=None, stats_path=None, **kwargs):
+    """Returns the stored statistics if they are up to date, otherwise computes and stores them."""
+    import xarray as xr
+
+    stats_path = stats_path or stats_path_for(data_path)
+    sources = _source_signature(data_path)
+    if os.path.exists(stats_path):
+        try:
+            field_stats = FieldStats.load(stats_path)
+            if field_stats.sources == sources and all(v in field_stats.variables for v in var_names):
+                return field_stats
+        except (ValueError, KeyError, json.JSONDecodeError) as e:
+            print(f"Recomputing statistics, could not use {stats_path}: {e}")
+
+    print(f"Computing statistics for {var_names} in {data_path} ...")
+    if ds is None:
+        opener = xr.open_mfdataset if glob.has_magic(data_path) else xr.open_dataset
+        ds = opener(data_path, decode_times=False)
+    field_stats = compute_field_stats(ds, var_names, **kwargs)
+    field_stats.sources = sources
+    try:
+        field_stats.save(stats_path)
+    except OSError as e:
+        print(f"Warning: could not store statistics at {stats_path}: {e}")
+    return field_stats
@@ -0,0 +1,40 @@
+"""
+This module builds partial figure updates (dash.Patch) so that switching the variable of a choropleth
+only sends the new z values, and the colour range when it changed, instead of the whole figure.
+The GeoJSON, the locations and the layout stay in the browser.
+"""
+import numpy as np
+from dash import Patch
+
+from utils.Hover_Data import typed_array
+
+
+def color_range(values, low=2, high=98, decimals=2):
+    """Robust (zmin, zmax) of a variable from its percentiles."""
+    values = np.asarray(values, dtype=np.float64)
+    zmin, zmax = np.nanpercentile(values, [low, high])
+    return [round(float(zmin), decimals), round(float(zmax), decimals)]
+
+
+def choropleth_patch(values, zrange=None, previous_range=None, trace_index=0, coloraxis=None,
+                     colorbar_title=None, typed=True):
+    """Patch with the new z of a choropleth trace, plus its colour range if it differs from previous_range.
+
+    The range goes in the trace (zmin/zmax) or, for figures sharing a coloraxis (plotly express),
+    in layout[coloraxis] (cmin/cmax). Returns (patch, range) so the range can be kept in a dcc.Store.
+    """
+    patch = Patch()
+    values = np.asarray(values, dtype=np.float64)
+    patch['data'][trace_index]['z'] = typed_array(values, 'f4') if typed else values.tolist()
+    zrange = color_range(values) if zrange is None else [float(zrange[0]), float(zrange[1])]
+    if zrange != previous_range:
+        if coloraxis:
+            patch['layout'][coloraxis]['cmin'], patch['layout'][coloraxis]['cmax'] = zrange
+        else:
+            patch['data'][trace_index]['zmin'], patch['data'][trace_index]['zmax'] = zrange
+    if colorbar_title is not None:
+        if coloraxis:
+            patch['layout'][coloraxis]['colorbar']['title']['text'] = colorbar_title
+        else:
+            patch['data'][trace_index]['colorbar']['title']['text'] = colorbar_title
+    return patch, zrange
@@ -0,0 +1,115 @@
+"""
+This module feeds Player-driven animations from a bounded cache of frames. Frames are produced in batches by
+one vectorized call (or one read of consecutive time steps from a file), and the frames after the one being
+shown are prefetched in a background thread, so a player tick usually finds its frame ready.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.Caching import LRUCache
+
+
+class FrameCache:
+    """Frames 0..n_frames-1 of an animation, made by make_frames(indices) -> array (len(indices), ...).
+
+    A missing frame is computed with the next ones (batch frames in one call), and every access prefetches
+    the following `ahead` frames. At most maxsize frames are kept (never less than 2 * batch + ahead). With
+    loop=True the frames after the last one are the first ones, as with Player(loop_policy='loop').
+    """
+
+    def __init__(self, make_frames, n_frames, batch=8, ahead=None, maxsize=64, loop=True):
+        self.make_frames = make_frames
+        self.n_frames = n_frames
+        self.batch = batch
+        self.ahead = batch if ahead is None else ahead
+        self.loop = loop
+        self.cache = LRUCache(max(maxsize, 2 * self.batch + self.ahead))
+        self.batches = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='frame-prefetch')
+
+    def __len__(self):
+        return self.n_frames
+
+    def _following(self, start, count):
+        indices = []
+        for i in range(start, start + count):
+            if self.loop:
+                i %= self.n_frames
+            elif i >= self.n_frames:
+                break
+            if i not in indices:
+                indices.append(i)
+        return indices
+
+    def _claim(self, indices):
+        """The indices that are neither cached nor being computed, now marked as being computed."""
+        with self._lock:
+            missing = [i for i in indices if i not in self.cache and i not in self._pending]
+            done = threading.Event()
+            for i in missing:
+                self._pending[i] = done
+        return missing, done
+
+    def _compute(self, indices, done):
+        try:
+            for start in range(0, len(indices), self.batch):
+                chunk = indices[start:start + self.batch]
+                frames = self.make_frames(np.asarray(chunk))
+                self.batches += 1
+                for i, frame in zip(chunk, frames):
+                    self.cache.put(i, frame)
+        finally:
+            with self._lock:
+                for i in indices:
+                    self._pending.pop(i, None)
+            done.set()
+
+    def prefetch(self, index):
+        """Starts computing, in the background, the batch from the first of the `ahead` frames after index
+        that is not ready yet (whole batches, rather than one frame per tick)."""
+        with self._lock:
+            upcoming = [i for i in self._following(index + 1, self.ahead)
+                        if i not in self.cache and i not in self._pending]
+        if upcoming:
+            missing, done = self._claim(self._following(upcoming[0], self.batch))
+            if missing:
+                self._executor.submit(self._compute, missing, done)
+
+    def __getitem__(self, index):
+        frame = self.cache.get(index)
+        if frame is None:
+            with self._lock:
+                pending = self._pending.get(index)
+            if pending is not None:
+                # Already being prefetched: wait for it instead of computing it twice
+                pending.wait()
+                frame = self.cache.get(index)
+            if frame is None:
+                missing, done = self._claim(self._following(index, self.batch))
+                self._compute(missing, done)
+                frame = self.cache.get(index)
+            if frame is None:
+                # Claimed by another thread meanwhile, or already evicted (cache smaller than the demand)
+                frame = self.make_frames(np.asarray([index]))[0]
+        self.prefetch(index)
+        return frame
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        return dict(self.cache.stats(), batches=self.batches)
+
+
+def slice_frames(data_array, dim='time'):
+    """make_frames reading the steps of a (lazy) xarray variable along dim, consecutive ones in one read."""
+    def make_frames(indices):
+        indices = np.asarray(indices)
+        if len(indices) and np.all(np.diff(indices) == 1):
+            return data_array.isel({dim: slice(int(indices[0]), int(indices[-1]) + 1)}).values
+        return data_array.isel({dim: indices}).values
+    return make_frames
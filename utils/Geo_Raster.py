@@ -0,0 +1,250 @@
+"""
+This module switches Geo map (scattergeo) figures from vector traces to server-rasterized images
+above a point budget (POINT_BUDGET environment variable). scattergeo has no WebGL path, so above the
+budget the points (or NaN-separated lines) of the visible window are datashaded into a PNG laid under
+an equirectangular geo subplot, re-rendered on every zoom/pan. Invisible markers on a coarse probe grid
+keep the hover labels of the figure, and register_hover_callback reports the point nearest to the cursor,
+which the browser sends (throttled) as lat/lon inverted from the geo projection.
+"""
+import json
+
+import os
+
+import datashader as ds
+import datashader.transfer_functions as tf
+import colorcet as cc
+import numpy as np
+import pandas as pd
+from dash import dcc, html, Input, Output
+from dash.exceptions import PreventUpdate
+
+from utils.Spatial_Index import GridIndex
+
+DEFAULT_POINT_BUDGET = 50_000
+
+# Sends the lat/lon under the cursor of a geo graph to a store, at most once every cfg.wait ms (plus the
+# last position). The graph may not exist yet (lazy graphs), so it is looked for until it appears.
+_CURSOR_JS = """
+function(graphId) {
+    var cfg = %(cfg)s;
+    var state = {last: 0, timer: null, value: null};
+    function send() {
+        state.timer = null;
+        state.last = Date.now();
+        dash_clientside.set_props(cfg.store, {data: state.value});
+    }
+    function attach() {
+        var el = document.getElementById(cfg.graph);
+        var gd = el && (el.classList.contains('js-plotly-plot') ? el : el.querySelector('.js-plotly-plot'));
+        if (!gd) {
+            setTimeout(attach, cfg.poll);
+            return;
+        }
+        if (gd.__nearestCursor) {
+            return;
+        }
+        gd.__nearestCursor = true;
+        gd.addEventListener('mousemove', function(e) {
+            var geo = gd._fullLayout && gd._fullLayout.geo && gd._fullLayout.geo._subplot;
+            var svg = gd.querySelector('.main-svg');
+            if (!geo || !svg) {
+                return;
+            }
+            var box = svg.getBoundingClientRect();
+            // Same pixel frame as plotly's own geo hover (offset in the main svg)
+            var lonlat = geo.projection.invert([e.clientX - box.left, e.clientY - box.top]);
+            if (!lonlat || isNaN(lonlat[0]) || isNaN(lonlat[1])) {
+                return;
+            }
+            state.value = {lon: lonlat[0], lat: lonlat[1]};
+            var elapsed = Date.now() - state.last;
+            if (state.timer === null) {
+                state.timer = setTimeout(send, Math.max(0, cfg.wait - elapsed));
+            }
+        });
+    }
+    attach();
+    return dash_clientside.no_update;
+}
+"""
+
+
+def point_budget():
+    """Maximum number of points sent as vector traces (POINT_BUDGET, default 50000)."""
+    return int(os.environ.get('POINT_BUDGET', DEFAULT_POINT_BUDGET))
+
+
+def fitted_box(lon_span, lat_span, plot_w, plot_h):
+    """Paper coordinates (x0, y0, sizex, sizey) of an equirectangular lon/lat box fitted in the plot area.
+
+    plotly fits the lonaxis/lataxis ranges into the geo domain keeping the aspect ratio, centered.
+    """
+    aspect = lon_span / lat_span
+    if plot_w / plot_h > aspect:
+        sizex, sizey = aspect * plot_h / plot_w, 1.0
+    else:
+        sizex, sizey = 1.0, plot_w / (aspect * plot_h)
+    return (1 - sizex) / 2, (1 - sizey) / 2, sizex, sizey
+
+
+def geo_view(relayout_data, base_window):
+    """Visible (lon_min, lon_max, lat_min, lat_max) of a geo map after the zoom/pan in relayoutData."""
+    lon_min, lon_max, lat_min, lat_max = base_window
+    relayout_data = relayout_data or {}
+    scale = relayout_data.get('geo.projection.scale', 1) or 1
+    center_lon = relayout_data.get('geo.center.lon', (lon_min + lon_max) / 2)
+    center_lat = relayout_data.get('geo.center.lat', (lat_min + lat_max) / 2)
+    half_lon = (lon_max - lon_min) / 2 / scale
+    half_lat = (lat_max - lat_min) / 2 / scale
+    return center_lon - half_lon, center_lon + half_lon, center_lat - half_lat, center_lat + half_lat
+
+
+class GeoRaster:
+    """Points (mode='markers') or NaN-separated lines (mode='lines') drawn as vectors or as an image."""
+
+    def __init__(self, lats, lons, values=None, mode='markers', budget=None, cmap=cc.fire, pad_deg=1.0):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.values = None if values is None else np.asarray(values, dtype=np.float64)
+        self.mode = mode
+        self.budget = point_budget() if budget is None else budget
+        self.cmap = cmap
+        finite = np.isfinite(self.lats) & np.isfinite(self.lons)
+        self._finite = np.flatnonzero(finite)
+        self.window = (max(self.lons[finite].min() - pad_deg, -180), min(self.lons[finite].max() + pad_deg, 180),
+                       max(self.lats[finite].min() - pad_deg, -90), min(self.lats[finite].max() + pad_deg, 90))
+        self._index = None
+
+    def __len__(self):
+        return self._finite.size
+
+    @property
+    def index(self):
+        # Built on first use (only the raster path needs it), cells of ~a few points on average
+        if self._index is None:
+            lon_min, lon_max, lat_min, lat_max = self.window
+            cell_deg = np.clip(2 * np.sqrt((lon_max - lon_min) * (lat_max - lat_min) / max(len(self), 1)), 0.1, 1.0)
+            self._index = GridIndex(self.lats[self._finite], self.lons[self._finite], cell_deg=float(cell_deg))
+        return self._index
+
+    def nearest(self, lat, lon):
+        """Index of the point nearest to (lat, lon) and its distance in degrees (-1 and inf without points)."""
+        if len(self) == 0:
+            return -1, np.inf
+        idx, dist = self.index.nearest(lat, lon)
+        return int(self._finite[idx[0]]), float(dist[0])
+
+    def _in_view(self, view):
+        lon_min, lon_max, lat_min, lat_max = view
+        return self._finite[self.index.query(lon_min, lon_max, lat_min, lat_max)]
+
+    def needs_raster(self, n_points=None):
+        return (len(self) if n_points is None else n_points) > self.budget
+
+    def figure(self, vector, relayout_data=None, n_points=None, **raster_kwargs):
+        """vector() below the budget (the usual go/px figure), the rasterized figure above it."""
+        if not self.needs_raster(n_points):
+            return vector()
+        return self.raster_figure(relayout_data, **raster_kwargs)
+
+    def render(self, view, width_px, height_px):
+        """Datashaded PIL image of the points/lines inside view (lon_min, lon_max, lat_min, lat_max)."""
+        lon_min, lon_max, lat_min, lat_max = view
+        canvas = ds.Canvas(plot_width=width_px, plot_height=height_px,
+                           x_range=(lon_min, lon_max), y_range=(lat_min, lat_max))
+        if self.mode == 'lines':
+            # Lines cross the window edges, datashader clips them itself
+            df = pd.DataFrame({'lon': self.lons, 'lat': self.lats})
+            agg = canvas.line(df, 'lon', 'lat', agg=ds.count())
+        else:
+            idx = self._in_view(view)
+            df = pd.DataFrame({'lon': self.lons[idx], 'lat': self.lats[idx]})
+            if self.values is not None:
+                df['value'] = self.values[idx]
+            agg = canvas.points(df, 'lon', 'lat', agg=ds.mean('value') if self.values is not None else ds.count())
+        return tf.shade(agg, cmap=self.cmap, how='eq_hist').to_pil()
+
+    def probes(self, view, n=40):
+        """Invisible hover markers: in every cell of an n x n grid over the view, the point nearest to its center."""
+        lon_min, lon_max, lat_min, lat_max = view
+        idx = self._in_view(view)
+        fx = (self.lons[idx] - lon_min) / (lon_max - lon_min) * n
+        fy = (self.lats[idx] - lat_min) / (lat_max - lat_min) * n
+        cell = np.minimum(fy.astype(np.int64), n - 1) * n + np.minimum(fx.astype(np.int64), n - 1)
+        dist = (fx % 1 - 0.5) ** 2 + (fy % 1 - 0.5) ** 2
+        # Sorted by cell then distance: the first point of every cell is the nearest to its center
+        order = np.lexsort((dist, cell))
+        first = order[np.flatnonzero(np.diff(cell[order], prepend=-1))]
+        idx = idx[first]
+        trace = dict(type='scattergeo', lat=self.lats[idx], lon=self.lons[idx], mode='markers',
+                     marker=dict(size=12, color='rgba(0,0,0,0)'), showlegend=False,
+                     customdata=idx, hovertemplate='lat: %{lat:.3f}<br>lon: %{lon:.3f}<extra></extra>')
+        if self.values is not None:
+            trace['text'] = self.values[idx]
+            trace['hovertemplate'] = 'lat: %{lat:.3f}<br>lon: %{lon:.3f}<br>value: %{text:.3f}<extra></extra>'
+        return trace
+
+    def raster_figure(self, relayout_data=None, width=600, height=400, title=None, geo=None, probe=40):
+        """Equirectangular geo figure with the datashaded image of the visible window under its axes.
+
+        The figure has a fixed size so the image box can be computed in paper coordinates.
+        geo updates the geo layout (the projection must stay equirectangular for the image to match).
+        """
+        margin = dict(l=10, r=10, t=40 if title else 10, b=10)
+        plot_w, plot_h = width - margin['l'] - margin['r'], height - margin['t'] - margin['b']
+        lon_min, lon_max, lat_min, lat_max = self.window
+        x0, y0, sizex, sizey = fitted_box(lon_max - lon_min, lat_max - lat_min, plot_w, plot_h)
+        view = geo_view(relayout_data, self.window)
+        image = self.render(view, max(int(sizex * plot_w), 1), max(int(sizey * plot_h), 1))
+
+        geo_layout = dict(
+            projection=dict(type='equirectangular'),
+            lonaxis=dict(range=[lon_min, lon_max]), lataxis=dict(range=[lat_min, lat_max]),
+            # Transparent background so the image below the subplot is visible, coastlines stay on top
+            bgcolor='rgba(0,0,0,0)', showland=False, showocean=False, showlakes=False,
+            showcoastlines=True, coastlinecolor='grey', showcountries=True, countrycolor='black')
+        geo_layout.update(geo or {})
+        return dict(
+            data=[self.probes(view, probe)],
+            layout=dict(
+                title=title, width=width, height=height, margin=margin, geo=geo_layout,
+                images=[dict(source=image, xref='paper', yref='paper', x=x0, y=y0 + sizey,
+                             sizex=sizex, sizey=sizey, sizing='stretch', xanchor='left', yanchor='top',
+                             layer='below')],
+                # Keeps the user's zoom/pan when the image is replaced
+                uirevision='keep'))
+
+
+def register_zoom_callback(app, graph_id, geo_raster, **raster_kwargs):
+    """Re-renders the image of a rasterized geo graph when it is zoomed or panned."""
+    @app.callback(Output(graph_id, 'figure'), Input(graph_id, 'relayoutData'), prevent_initial_call=True)
+    def rerender_geo_raster(relayout_data):
+        if not geo_raster.needs_raster() or not any(k.startswith('geo.') for k in (relayout_data or {})):
+            raise PreventUpdate
+        return geo_raster.raster_figure(relayout_data, **raster_kwargs)
+    return rerender_geo_raster
+
+
+def register_hover_callback(app, graph_id, geo_raster, wait_ms=100):
+    """Shows the point nearest to the cursor of a rasterized geo graph (the probes are only a coarse grid).
+
+    Returns the component to place in the layout (the cursor store and the text of the nearest point).
+    """
+    store_id, output_id = f"{graph_id}-cursor", f"{graph_id}-nearest"
+    cfg = json.dumps(dict(graph=graph_id, store=store_id, wait=wait_ms, poll=300))
+    app.clientside_callback(_CURSOR_JS % dict(cfg=cfg), Output(store_id, 'data'), Input(output_id, 'id'))
+
+    @app.callback(Output(output_id, 'children'), Input(store_id, 'data'), prevent_initial_call=True)
+    def show_nearest_point(cursor):
+        # Below the budget the figure has a marker for every point, with its own hover
+        if not cursor or not geo_raster.needs_raster():
+            raise PreventUpdate
+        i, dist = geo_raster.nearest(cursor['lat'], cursor['lon'])
+        if i < 0:
+            raise PreventUpdate
+        text = f"Nearest point: lat {geo_raster.lats[i]:.3f}, lon {geo_raster.lons[i]:.3f}"
+        if geo_raster.values is not None:
+            text += f", value {geo_raster.values[i]:.3f}"
+        return f"{text} ({dist:.3f}\u00b0 from the cursor)"
+
+    return html.Div([dcc.Store(id=store_id), html.Small(id=output_id)])
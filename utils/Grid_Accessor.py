@@ -0,0 +1,185 @@
+"""
+This module registers a ``.grid`` accessor on xarray DataArrays with the coordinate handling the map
+examples need: regular-grid detection (spacing and origin), O(1) nearest-index lookups,
+a rolled -180..180 view of 0..360 data without the ``sortby`` copy, and windowed subsets
+that only read the requested cells.
+
+    import utils.Grid_Accessor  # registers the accessor
+    data_slice.grid.spacing, data_slice.grid.pm180(), data_slice.grid.window(lat=(18, 31), lon=(-98, -80))
+"""
+import numpy as np
+import xarray as xr
+
+LAT_NAMES = ('lat', 'lat_0', 'latitude', 'Latitude', 'LATITUDE')
+LON_NAMES = ('lon', 'lon_0', 'longitude', 'Longitude', 'LONGITUDE')
+
+
+def _find_coord(da, names):
+    for name in names:
+        if name in da.coords:
+            return name
+    raise KeyError(f"None of the coordinates {names} found in {list(da.coords)}")
+
+
+def _regular_axis(values, rtol=1e-3):
+    """(is_regular, origin, spacing) of a 1D axis."""
+    if values.size < 2:
+        return False, float(values[0]) if values.size else np.nan, np.nan
+    steps = np.diff(values)
+    spacing = float(steps.mean())
+    regular = bool(np.allclose(steps, spacing, rtol=rtol, atol=0))
+    return regular, float(values[0]), spacing
+
+
+@xr.register_dataarray_accessor("grid")
+class GridAccessor:
+    def __init__(self, da):
+        self._da = da
+        self.lat_name = _find_coord(da, LAT_NAMES)
+        self.lon_name = _find_coord(da, LON_NAMES)
+        self._lats = np.asarray(da[self.lat_name].values, dtype=np.float64)
+        self._lons = np.asarray(da[self.lon_name].values, dtype=np.float64)
+        self._lat_axis = _regular_axis(self._lats)
+        self._lon_axis = _regular_axis(self._lons)
+
+    # ---------------- Grid geometry
+    @property
+    def lats(self):
+        return self._lats
+
+    @property
+    def lons(self):
+        return self._lons
+
+    @property
+    def is_regular(self):
+        return self._lat_axis[0] and self._lon_axis[0]
+
+    @property
+    def origin(self):
+        """(lat, lon) of the first grid cell."""
+        return self._lat_axis[1], self._lon_axis[1]
+
+    @property
+    def spacing(self):
+        """(dlat, dlon), negative if the axis is descending."""
+        return self._lat_axis[2], self._lon_axis[2]
+
+    @property
+    def is_global_lon(self):
+        dlon = abs(self._lon_axis[2])
+        return self._lon_axis[0] and np.isclose(abs(self._lons[-1] - self._lons[0]) + dlon, 360.0, atol=dlon / 2)
+
+    @property
+    def is_0_360(self):
+        return self._lons.max() > 180
+
+    # ---------------- Lookups
+    def nearest_index(self, lat, lon):
+        """Index (i, j) of the closest cell. Arithmetic on regular grids, binary search otherwise."""
+        if self.is_0_360:
+            lon = np.mod(lon, 360)
+        i = self._nearest_on_axis(self._lats, self._lat_axis, lat, periodic=False)
+        j = self._nearest_on_axis(self._lons, self._lon_axis, lon, periodic=self.is_global_lon)
+        return i, j
+
+    @staticmethod
+    def _nearest_on_axis(values, axis, target, periodic):
+        regular, origin, spacing = axis
+        n = values.size
+        if regular:
+            k = np.rint((np.asarray(target) - origin) / spacing).astype(np.int64)
+            return np.mod(k, n) if periodic else np.clip(k, 0, n - 1)
+        order = np.argsort(values)
+        pos = np.clip(np.searchsorted(values[order], target), 1, n - 1)
+        left, right = order[pos - 1], order[pos]
+        return np.where(np.abs(target - values[left]) <= np.abs(values[right] - target), left, right)
+
+    def value_at(self, lat, lon, **isel):
+        """Value of the closest cell, reading a single element (other dims selected with isel)."""
+        i, j = self.nearest_index(lat, lon)
+        return self._da.isel({self.lat_name: int(i), self.lon_name: int(j), **isel}).values
+
+    # ---------------- Views
+    def pm180(self):
+        """The data with longitudes in -180..180.
+
+        Instead of rewriting the coordinate and sorting (a full copy), the lon dimension is
+        re-indexed with a rolled index. On file-backed or dask arrays this stays lazy, so only
+        the cells that are later used are read.
+        """
+        if not self.is_0_360:
+            return self._da
+        # Start the roll at the first longitude >= 180, which becomes -180
+        shift = int(np.argmax(self._lons >= 180))
+        order = np.roll(np.arange(self._lons.size), -shift)
+        rolled = self._da.isel({self.lon_name: order})
+        return rolled.assign_coords({self.lon_name: (self._lons[order] + 180) % 360 - 180})
+
+    def window(self, lat=None, lon=None, **isel):
+        """Subset inside lat=(min, max) and lon=(min, max) (lon in -180..180 or 0..360).
+
+        Uses basic slices of the original array (views / lazy reads). Only a window that
+        crosses the seam of a 0..360 (or global) lon axis is assembled from two slices. The
+        longitudes of the result increase from lon_min, e.g. 170..190 for lon=(170, 190);
+        a lon_max below lon_min crosses the antimeridian, and a range of 360 degrees or more
+        gives the whole axis in -180..180.
+        """
+        sel = dict(isel)
+        if lat is not None:
+            sel[self.lat_name] = _index_slice(self._lats, min(lat), max(lat))
+        if lon is None:
+            return self._da.isel(sel)
+
+        lon_min, lon_max = lon
+        if not (self.is_0_360 or self.is_global_lon):
+            sel[self.lon_name] = _index_slice(self._lons, lon_min, lon_max)
+            return self._da.isel(sel)
+
+        if lon_max < lon_min:
+            lon_max += 360
+        if lon_max - lon_min >= 360:
+            return self.pm180().isel(sel)
+        # Where the window starts and ends on the axis, before anything is wrapped: it is one
+        # slice unless it runs past the end of the axis, then it continues from its beginning
+        base = self._lons.min()
+        start = base + np.mod(lon_min - base, 360)
+        end = start + (lon_max - lon_min)
+        if end < base + 360:
+            slices = [_index_slice(self._lons, start, end)]
+        else:
+            slices = [_index_slice(self._lons, start, base + 360), _index_slice(self._lons, base, end - 360)]
+        parts = [self._da.isel({**sel, self.lon_name: s}) for s in slices if s.stop > s.start]
+        if len(parts) == 1:
+            out = parts[0]
+        elif parts:
+            out = xr.concat(parts, dim=self.lon_name)
+        else:
+            out = self._da.isel({**sel, self.lon_name: slice(0, 0)})
+        new_lons = lon_min + np.mod(out[self.lon_name].values - lon_min, 360)
+        return out.assign_coords({self.lon_name: new_lons})
+
+
+def _index_slice(values, lo, hi):
+    """Slice of the positions of the values in [lo, hi] (empty if none)."""
+    idx = np.nonzero((values >= lo) & (values <= hi))[0]
+    return slice(idx.min(), idx.max() + 1) if idx.size else slice(0, 0)
+
+
+if __name__ == '__main__':
+    # Regression checks of window on a global 0..360 grid: python -m utils.Grid_Accessor
+    lons = np.arange(0, 360, 0.25)
+    lats = np.arange(-90, 90.25, 0.25)
+    da = xr.DataArray(np.add.outer(lats, lons), coords={'lat': lats, 'lon': lons}, dims=('lat', 'lon'))
+    for lon, expected in [((-180, 180), (-180, 179.75)), ((0, 360), (-180, 179.75)),
+                          ((170, 190), (170, 190)), ((-98, -80), (-98, -80)), ((350, 370), (350, 370)),
+                          ((170, -170), (170, 190)), ((10, 20), (10, 20))]:
+        out = da.grid.window(lat=(18, 31), lon=lon)
+        out_lons = out['lon'].values
+        assert (out_lons[0], out_lons[-1]) == expected, (lon, out_lons[0], out_lons[-1])
+        assert np.all(np.diff(out_lons) > 0), lon
+        assert np.all(out.values == np.add.outer(out['lat'].values, np.mod(out_lons, 360))), lon
+        assert out['lat'].values.min() == 18 and out['lat'].values.max() == 31, lon
+    pm180 = da.grid.pm180()
+    assert np.all(pm180.grid.window(lon=(170, 190))['lon'].values == da.grid.window(lon=(170, 190))['lon'].values)
+    print('window: all checks passed')
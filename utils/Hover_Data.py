@@ -0,0 +1,120 @@
+"""
+This module builds the hover information of large point traces without per-point Python strings.
+Numeric columns go in customdata as a base64 typed array (the plotly.js {'dtype', 'bdata', 'shape'} spec)
+and are formatted in the browser by a hovertemplate. Categorical labels are dictionary encoded
+(integer codes plus one lookup table): one trace per category carrying its label in the trace meta.
+The index of every point travels in customdata, so callbacks can map events back to the original rows.
+"""
+import base64
+
+import numpy as np
+
+
+def typed_array(values, dtype='f4'):
+    """plotly.js typed array spec of a 1D or 2D array (sent as base64 instead of a JSON list)."""
+    values = np.ascontiguousarray(values, dtype=dtype)
+    spec = {'dtype': values.dtype.str[1:], 'bdata': base64.b64encode(values.data).decode('ascii')}
+    if values.ndim > 1:
+        spec['shape'] = ', '.join(str(n) for n in values.shape)
+    return spec
+
+
+def encode_labels(labels):
+    """Dictionary encoding: (codes, categories) with categories[codes] == labels."""
+    categories, codes = np.unique(np.asarray(labels), return_inverse=True)
+    return codes.astype(np.int32), categories
+
+
+def hover_template(names, formats=None, title=None, label_name=None, label='%{meta[0]}'):
+    """hovertemplate showing the customdata columns `names` (formats are d3 formats, e.g. '.2f')."""
+    formats = formats or {}
+    lines = [f"<b>{title}</b>"] if title else []
+    if label_name:
+        lines.append(f"{label_name}: {label}")
+    for i, name in enumerate(names):
+        fmt = formats.get(name, '')
+        lines.append(f"{name}: %{{customdata[{i}]{':' + fmt if fmt else ''}}}")
+    return '<br>'.join(lines) + '<extra></extra>'
+
+
+def _split_arrays(obj, n_points, idx):
+    """Copy of a trace (or of a nested dict, e.g. marker) with its per-point arrays (length n_points) indexed by idx."""
+    out = {}
+    for key, value in obj.items():
+        if isinstance(value, dict):
+            out[key] = _split_arrays(value, n_points, idx)
+        elif isinstance(value, (list, tuple, np.ndarray)) and len(value) == n_points:
+            out[key] = np.asarray(value)[idx]
+        else:
+            out[key] = value
+    return out
+
+
+def point_indices(event_data):
+    """Indices in the original arrays of the points of a hoverData/clickData/selectedData of hover_traces."""
+    points = (event_data or {}).get('points', [])
+    return np.array([int(p['customdata'][-1]) for p in points if 'customdata' in p], dtype=np.int64)
+
+
+def hover_traces(trace, numeric, labels=None, label_name='label', formats=None, title=None,
+                 coord_keys=('lat', 'lon'), max_categories=64, dtype='f4'):
+    """Point traces with numeric customdata and (optionally) categorical labels.
+
+    trace: the base trace dict, with the point coordinates under coord_keys (its customdata is built here).
+    numeric: {name: array} columns shown with their format.
+    labels: one label per point. The points are split into one trace per category (the label is sent
+    once, in meta), with every per-point array of the trace (e.g. marker.color) split alike and a
+    numeric marker.color kept on one color scale. More than max_categories labels raise ValueError.
+    The last customdata column is the index of the point in the original arrays, since curveNumber
+    and pointNumber refer to the category traces: see point_indices.
+    Returns a list of traces.
+    """
+    if 'customdata' in trace:
+        raise ValueError("hover_traces builds customdata, pass its columns in numeric")
+    coords = {k: np.asarray(trace[k], dtype='f8') for k in coord_keys}
+    n_points = coords[coord_keys[0]].size
+    names = list(numeric)
+    # Point indices above 2**24 are not exact in float32
+    columns_dtype = dtype if n_points <= 2 ** 24 else 'f8'
+    columns = np.column_stack([np.asarray(numeric[n], dtype=columns_dtype) for n in names]
+                              + [np.arange(n_points, dtype=columns_dtype)])
+
+    def make(idx, **extra):
+        base = {k: v for k, v in trace.items() if k not in coord_keys}
+        new = dict(base, **extra) if idx is None else _split_arrays(dict(base, **extra), n_points, idx)
+        for k in coord_keys:
+            new[k] = typed_array(coords[k] if idx is None else coords[k][idx], 'f8')
+        new['customdata'] = typed_array(columns if idx is None else columns[idx], columns_dtype)
+        return new
+
+    if labels is None:
+        return [make(None, hovertemplate=hover_template(names, formats, title))]
+
+    codes, categories = encode_labels(labels)
+    if len(categories) > max_categories:
+        raise ValueError(f"{len(categories)} distinct labels, more than max_categories={max_categories} "
+                         f"(one trace per category)")
+
+    marker = trace.get('marker')
+    if isinstance(marker, dict) and _is_numeric_array(marker.get('color'), n_points):
+        # Every category trace colors its points on the scale of all the points
+        color = np.asarray(marker['color'], dtype='f8')
+        trace = dict(trace, marker=dict(marker, cmin=marker.get('cmin', float(np.nanmin(color))),
+                                        cmax=marker.get('cmax', float(np.nanmax(color)))))
+
+    # Points grouped by code: one argsort and a split instead of a mask per category
+    order = np.argsort(codes, kind='stable')
+    groups = np.split(order, np.cumsum(np.bincount(codes, minlength=len(categories)))[:-1])
+    template = hover_template(names, formats, title, label_name)
+    traces = [make(idx, name=str(category), meta=[category], legendgroup=str(category), hovertemplate=template)
+              for category, idx in zip(categories.tolist(), groups)]
+    # A single color bar
+    for new in traces[1:]:
+        if isinstance(new.get('marker'), dict):
+            new['marker'] = dict(new['marker'], showscale=False)
+    return traces
+
+
+def _is_numeric_array(value, n_points):
+    return (isinstance(value, (list, tuple, np.ndarray)) and len(value) == n_points
+            and np.issubdtype(np.asarray(value).dtype, np.number))
@@ -0,0 +1,304 @@
+"""
+This module runs heavy callbacks as background jobs in a process pool, so request threads never block.
+A job is identified by its function, its arguments and the modification times of the files it reads:
+identical requests share one job (also between the workers of a WSGI server) until those files change,
+and its status, progress and result live in a folder on disk that any worker can read. A new request
+of a browser cancels its previous, now superseded, job. background_callback wires a job to Dash: the
+inputs submit it and a dcc.Interval polls its progress until the result arrives.
+"""
+import glob
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import dash_bootstrap_components as dbc
+from dash import dcc, no_update, Input, Output, State
+
+from utils.Shared_Arrays import file_lock
+
+# Jobs whose status has not been updated for this long are considered lost (e.g. their worker died)
+STALE_S = 300
+
+_current_job = None
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by report_progress once the job was cancelled."""
+
+
+def job_store_dir():
+    """Folder of the job store: JOB_STORE_DIR or the temporary folder."""
+    folder = os.environ.get('JOB_STORE_DIR', os.path.join(tempfile.gettempdir(), 'dash_jobs'))
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _source_signature(source_files):
+    """(path, mtime) of the source files (paths or glob patterns), None as the mtime of a missing one."""
+    paths = []
+    for pattern in source_files:
+        paths.extend(sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern])
+    return [(path, os.path.getmtime(path) if os.path.exists(path) else None) for path in paths]
+
+
+def job_id_for(func, args, kwargs, source_files=()):
+    """Same function, arguments and source files (unchanged since), same job id."""
+    spec = [func.__module__, func.__qualname__, args, sorted(kwargs.items()), _source_signature(source_files)]
+    return hashlib.sha1(json.dumps(spec, default=str).encode()).hexdigest()[:16]
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class _JobContext:
+    """Status files of the job running in this (worker) process."""
+
+    def __init__(self, job_dir):
+        self.job_dir = job_dir
+
+    def set_status(self, state, progress=0.0, message=''):
+        _write_json(os.path.join(self.job_dir, 'status.json'),
+                    {'state': state, 'progress': round(float(progress), 4), 'message': message,
+                     'pid': os.getpid(), 'updated': time.time()})
+
+    def cancelled(self):
+        return os.path.exists(os.path.join(self.job_dir, 'cancel'))
+
+
+def report_progress(fraction, message=''):
+    """Progress (0 to 1) of the running job, shown in the UI. Raises JobCancelled if the job was cancelled.
+
+    Does nothing when the function is not running as a job, so job functions can also be called directly.
+    """
+    if _current_job is None:
+        return
+    if _current_job.cancelled():
+        raise JobCancelled
+    _current_job.set_status('running', fraction, message)
+
+
+def _run_job(job_dir, func, args, kwargs):
+    """Runs in a worker process: executes the job and stores its result (pickled) next to its status."""
+    global _current_job
+    _current_job = _JobContext(job_dir)
+    try:
+        if _current_job.cancelled():
+            raise JobCancelled
+        _current_job.set_status('running', 0.0, 'Started')
+        result = func(*args, **kwargs)
+        result_path = os.path.join(job_dir, 'result.pkl')
+        with open(result_path + '.tmp', 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(result_path + '.tmp', result_path)
+        _current_job.set_status('done', 1.0, 'Done')
+    except JobCancelled:
+        _current_job.set_status('cancelled', 0.0, 'Cancelled')
+    except Exception as e:
+        _current_job.set_status('failed', 0.0, f"{type(e).__name__}: {e}")
+    finally:
+        _current_job = None
+
+
+class JobManager:
+    """Process pool plus disk store of background jobs (see the module docstring)."""
+
+    def __init__(self, store_dir=None, max_workers=None, max_jobs=256):
+        self.store_dir = store_dir or job_store_dir()
+        os.makedirs(self.store_dir, exist_ok=True)
+        self.max_workers = max_workers or int(os.environ.get('JOB_WORKERS', min(2, os.cpu_count() or 1)))
+        self.max_jobs = max_jobs
+        self._pool = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        # Created with the first job, so importing an app does not start processes
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.max_workers)
+            return self._pool
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.store_dir, job_id)
+
+    def _client_path(self, client, channel):
+        name = hashlib.sha1(f"{client}|{channel}".encode()).hexdigest()[:16]
+        return os.path.join(self.store_dir, '_latest', name)
+
+    def status(self, job_id):
+        """{'state': queued|running|done|failed|cancelled|unknown, 'progress': 0-1, 'message': str}."""
+        status = _read_json(os.path.join(self._job_dir(job_id), 'status.json'))
+        if status is None:
+            return {'state': 'unknown', 'progress': 0.0, 'message': ''}
+        if status['state'] in ('queued', 'running') and time.time() - status['updated'] > STALE_S:
+            status['state'] = 'failed'
+            status['message'] = 'Lost (no progress for a long time)'
+        return status
+
+    def result(self, job_id):
+        with open(os.path.join(self._job_dir(job_id), 'result.pkl'), 'rb') as f:
+            return pickle.load(f)
+
+    def _in_flight_or_done(self, job_id):
+        state = self.status(job_id)['state']
+        if state == 'done':
+            return os.path.exists(os.path.join(self._job_dir(job_id), 'result.pkl'))
+        return state in ('queued', 'running')
+
+    def submit(self, func, *args, client=None, channel=None, source_files=(), **kwargs):
+        """Starts func(*args, **kwargs) as a job (unless the same job is running or done) and returns its id.
+
+        source_files (paths or glob patterns) are the files func reads: once one of them is modified, a
+        done job is not reused and the same request runs a new job. With client (a browser id) and channel (e.g. the name of the callback), the previous job of that
+        client and channel is cancelled, unless another client is still waiting for it.
+        """
+        job_id = job_id_for(func, args, kwargs, source_files)
+        job_dir = self._job_dir(job_id)
+        os.makedirs(os.path.join(job_dir, 'clients'), exist_ok=True)
+        if client is not None:
+            self._supersede(job_id, client, channel)
+        # The lock makes the check and the submission atomic between the workers of a server
+        with file_lock(job_dir + '.lock'):
+            cancel_path = os.path.join(job_dir, 'cancel')
+            if self._in_flight_or_done(job_id):
+                # Needed again: a superseded job that has not stopped yet keeps running
+                if os.path.exists(cancel_path):
+                    os.remove(cancel_path)
+            else:
+                for path in (cancel_path, os.path.join(job_dir, 'result.pkl')):
+                    if os.path.exists(path):
+                        os.remove(path)
+                _JobContext(job_dir).set_status('queued', 0.0, 'Queued')
+                future = self.pool.submit(_run_job, job_dir, func, args, kwargs)
+                with self._lock:
+                    self._futures[job_id] = future
+                future.add_done_callback(lambda f: self._futures.pop(job_id, None))
+        self.prune()
+        return job_id
+
+    def _supersede(self, job_id, client, channel):
+        """Makes job_id the latest job of this client/channel and cancels the previous one if nobody needs it."""
+        client_name = hashlib.sha1(str(client).encode()).hexdigest()[:16]
+        latest_path = self._client_path(client, channel)
+        os.makedirs(os.path.dirname(latest_path), exist_ok=True)
+        previous = _read_json(latest_path)
+        _write_json(latest_path, job_id)
+        open(os.path.join(self._job_dir(job_id), 'clients', client_name), 'w').close()
+        if previous is None or previous == job_id:
+            return
+        clients_dir = os.path.join(self._job_dir(previous), 'clients')
+        try:
+            os.remove(os.path.join(clients_dir, client_name))
+            waiting = os.listdir(clients_dir)
+        except OSError:
+            waiting = []
+        if not waiting:
+            self.cancel(previous)
+
+    def cancel(self, job_id):
+        """Cancels a queued job, or asks a running one to stop (at its next report_progress)."""
+        job_dir = self._job_dir(job_id)
+        if not os.path.isdir(job_dir) or self.status(job_id)['state'] not in ('queued', 'running'):
+            return
+        open(os.path.join(job_dir, 'cancel'), 'w').close()
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            _JobContext(job_dir).set_status('cancelled', 0.0, 'Cancelled')
+
+    def prune(self):
+        """Removes the oldest finished jobs above max_jobs."""
+        entries = [e for e in os.scandir(self.store_dir) if e.is_dir() and not e.name.startswith('_')]
+        if len(entries) <= self.max_jobs:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_jobs]:
+            if self.status(entry.name)['state'] not in ('queued', 'running'):
+                shutil.rmtree(entry.path, ignore_errors=True)
+                if os.path.exists(entry.path + '.lock'):
+                    os.remove(entry.path + '.lock')
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+
+def job_components(prefix, interval_ms=300):
+    """Components of a background callback: job and browser id stores, polling interval and progress bar."""
+    return [
+        dcc.Store(id=f"{prefix}-job"),
+        dcc.Store(id=f"{prefix}-client", storage_type='session'),
+        dcc.Interval(id=f"{prefix}-poll", interval=interval_ms, disabled=True),
+        dbc.Progress(id=f"{prefix}-progress", value=0, label='', striped=True, animated=True,
+                     style={'height': '18px'}),
+    ]
+
+
+def background_callback(app, manager, prefix, outputs, inputs, states=(), on_result=None, source_files=()):
+    """Decorator running a callback as a job of `manager` (add job_components(prefix) to the layout).
+
+    The values of inputs and states go to the decorated function, which runs in the process pool and
+    can call report_progress. on_result(result) turns its result into the value(s) of outputs (in
+    the server process, e.g. to build a Patch); by default the result is used as is. source_files are the
+    files the function reads (see JobManager.submit), so its results are not reused once they change.
+    """
+    single = isinstance(outputs, Output)
+    outputs = [outputs] if single else list(outputs)
+
+    def decorator(func):
+        @app.callback(
+            Output(f"{prefix}-job", 'data'),
+            Output(f"{prefix}-poll", 'disabled'),
+            Output(f"{prefix}-client", 'data'),
+            list(inputs),
+            list(states) + [State(f"{prefix}-client", 'data')],
+        )
+        def start_job(*values):
+            *values, client = values
+            client = client or uuid.uuid4().hex
+            job_id = manager.submit(func, *values, client=client, channel=prefix, source_files=source_files)
+            return job_id, False, client
+
+        @app.callback(
+            outputs + [Output(f"{prefix}-progress", 'value'),
+                       Output(f"{prefix}-progress", 'label'),
+                       Output(f"{prefix}-poll", 'disabled', allow_duplicate=True)],
+            Input(f"{prefix}-poll", 'n_intervals'),
+            State(f"{prefix}-job", 'data'),
+            prevent_initial_call=True,
+        )
+        def poll_job(n_intervals, job_id):
+            skip = [no_update] * len(outputs)
+            status = manager.status(job_id) if job_id else {'state': 'unknown'}
+            if status['state'] in ('queued', 'running'):
+                progress = 100 * status['progress']
+                return skip + [progress, f"{status['message']} {progress:.0f}%", False]
+            if status['state'] != 'done':
+                return skip + [0, status.get('message') or status['state'], True]
+            result = manager.result(job_id)
+            values = on_result(result) if on_result is not None else result
+            return ([values] if single else list(values)) + [100, '', True]
+
+        return func
+    return decorator
+
@@ -0,0 +1,102 @@
+"""
+This module defers the figures of multi-graph dashboards until they are seen. lazy_graph puts a light
+placeholder in the layout, and a clientside IntersectionObserver fills a dcc.Store when its container
+scrolls into view (or appears, e.g. when its tab is opened). Only then does the server build the figure,
+which is memoized (utils/Caching.py) so later sessions get it without building it again.
+"""
+import json
+
+from dash import dcc, html, Input, Output, State
+from dash.exceptions import PreventUpdate
+
+from utils.Caching import memoize_callback
+
+# Waits for the container (it may be in a tab that is not open yet), then fills the store once it is
+# visible. A container removed before that (tab closed) is looked for again.
+_OBSERVE_JS = """
+function(containerId) {
+    var cfg = %(cfg)s;
+    function visible() {
+        dash_clientside.set_props(cfg.store, {data: Date.now()});
+    }
+    function observe() {
+        var el = document.getElementById(cfg.container);
+        if (!el) {
+            setTimeout(observe, cfg.poll);
+            return;
+        }
+        if (!('IntersectionObserver' in window)) {
+            visible();
+            return;
+        }
+        var done = false;
+        var observer = new IntersectionObserver(function(entries) {
+            if (!done && entries.some(function(e) { return e.isIntersecting; })) {
+                done = true;
+                observer.disconnect();
+                visible();
+            }
+        }, {rootMargin: cfg.margin});
+        observer.observe(el);
+        var check = setInterval(function() {
+            if (done) {
+                clearInterval(check);
+            } else if (!el.isConnected) {
+                clearInterval(check);
+                observer.disconnect();
+                observe();
+            }
+        }, cfg.poll);
+    }
+    observe();
+    return dash_clientside.no_update;
+}
+"""
+
+
+def placeholder_figure(title=None, text='Loading...'):
+    """Empty figure shown until the real one arrives."""
+    layout = {'xaxis': {'visible': False}, 'yaxis': {'visible': False},
+              'annotations': [{'text': text, 'showarrow': False, 'xref': 'paper', 'yref': 'paper',
+                               'x': 0.5, 'y': 0.5, 'font': {'size': 16, 'color': 'gray'}}]}
+    if title:
+        layout['title'] = {'text': title}
+    return {'data': [], 'layout': layout}
+
+
+def loaded(graph_id):
+    """State that is True once the figure of a lazy graph was sent, e.g. so a Patch callback can wait for it."""
+    return State(f"{graph_id}-loaded", 'data')
+
+
+def lazy_graph(app, graph_id, build, states=(), title=None, margin_px=200, cache=True, maxsize=16, **graph_kwargs):
+    """dcc.Graph whose figure is build(*state values), built when the graph is about to be seen.
+
+    margin_px starts loading a bit before the graph enters the viewport. With cache=True the figures
+    are memoized by the values of states (maxsize of them); use cache=False when build has side effects
+    (e.g. set_props) that must run for every session. Returns the component to place in the layout.
+    """
+    container_id = f"{graph_id}-lazy"
+    visible_id = f"{graph_id}-visible"
+    cfg = json.dumps(dict(container=container_id, store=visible_id, margin=f"{int(margin_px)}px", poll=300))
+    app.clientside_callback(_OBSERVE_JS % dict(cfg=cfg), Output(visible_id, 'data'), Input(container_id, 'id'))
+    if cache:
+        build = memoize_callback(name=f"lazy_graph.{graph_id}", maxsize=maxsize)(build)
+
+    # allow_duplicate: the figure can also be updated by the callbacks of the graph (zoom, patches)
+    @app.callback(Output(graph_id, 'figure', allow_duplicate=True),
+                  Output(f"{graph_id}-loaded", 'data'),
+                  Input(visible_id, 'data'),
+                  [State(f"{graph_id}-loaded", 'data')] + list(states),
+                  prevent_initial_call=True)
+    def load_figure(visible, is_loaded, *values):
+        if is_loaded:
+            raise PreventUpdate
+        return build(*values), True
+
+    graph_kwargs.setdefault('figure', placeholder_figure(title))
+    return html.Div([
+        dcc.Graph(id=graph_id, **graph_kwargs),
+        dcc.Store(id=visible_id),
+        dcc.Store(id=f"{graph_id}-loaded", data=False),
+    ], id=container_id)
@@ -0,0 +1,47 @@
+"""
+This module is the slice-first access path for (time, depth, lat, lon) NetCDF variables.
+Files are opened without loading or caching variables, the time/depth level (and optionally a
+lat/lon window) is selected by position, and only then are the values read, so memory
+holds a single 2D slice instead of every level of the variable.
+"""
+import resource
+
+import xarray as xr
+
+import utils.Grid_Accessor  # registers the .grid accessor
+
+
+def open_lazy(file_name, **kwargs):
+    """Opens a NetCDF file lazily. cache=False avoids keeping every slice read in memory."""
+    kwargs.setdefault('cache', False)
+    return xr.open_dataset(file_name, **kwargs)
+
+
+def select_slice(data_array, time=0, depth=0, lat=None, lon=None):
+    """Lazy 2D selection: time/depth by position on the leading dims and an optional lat/lon window."""
+    leading = data_array.dims[:-2]
+    data_slice = data_array.isel(dict(zip(leading, [time, depth])))
+    if lat is not None or lon is not None:
+        data_slice = data_slice.grid.window(lat=lat, lon=lon)
+    return data_slice
+
+
+def read_slice(data_array, time=0, depth=0, lat=None, lon=None):
+    """Same as select_slice but returns the NumPy values, reading only the selected bytes."""
+    return select_slice(data_array, time, depth, lat, lon).values
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB.
+
+    Reads VmHWM from /proc on Linux (ru_maxrss survives exec, so a child would report
+    the peak of its parent) and falls back to getrusage elsewhere.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -0,0 +1,85 @@
+"""
+This module rasterizes frames of a fixed rectilinear grid onto a fixed canvas with a precomputed plan.
+The bin of every source cell (and the nearest cell of every pixel that gets none) is computed once, in
+projected coordinates if needed (e.g. Web Mercator, so the map does not reproject every frame), and each
+frame is then a mean aggregation by np.bincount instead of a new datashader rasterize call.
+"""
+import numpy as np
+
+
+def _padded_range(axis):
+    """Extent of the cells (not just their centers) of a regular axis."""
+    pad = abs(axis[-1] - axis[0]) / (axis.size - 1) / 2 if axis.size > 1 else 0.5
+    return float(np.nanmin(axis) - pad), float(np.nanmax(axis) + pad)
+
+
+def _axis_bins(axis, lo, hi, n):
+    bins = np.floor((axis - lo) / (hi - lo) * n)
+    valid = np.isfinite(bins) & (bins >= 0) & (bins < n)
+    return np.where(valid, bins, 0).astype(np.int64), valid
+
+
+def _nearest(axis, targets):
+    """Index of the axis value closest to each target (the axis can be in any order)."""
+    order = np.argsort(axis)
+    sorted_axis = axis[order]
+    i = np.clip(np.searchsorted(sorted_axis, targets), 1, max(sorted_axis.size - 1, 1))
+    left = np.clip(i - 1, 0, sorted_axis.size - 1)
+    right = np.clip(i, 0, sorted_axis.size - 1)
+    closest = np.where(np.abs(targets - sorted_axis[left]) <= np.abs(sorted_axis[right] - targets), left, right)
+    return order[closest]
+
+
+class RasterPlan:
+    """Mean rasterization of (len(y), len(x)) frames onto a width x height canvas.
+
+    transform(x, y) maps the 1D axes to the canvas coordinates; it must be separable, as Web Mercator
+    (utils.Regridding.lonlat_to_mercator) is. x_range/y_range are in canvas coordinates and default to the
+    extent of the grid. As datashader's rasterize, the canvas is not finer than the grid unless upsample=True;
+    pixels without any cell take the value of the nearest one. A cell counts in the pixel of its center (no
+    fractional overlaps), so downsampled means can differ slightly from datashader's.
+    """
+
+    def __init__(self, x, y, width=400, height=400, x_range=None, y_range=None, transform=None, upsample=False):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if transform is not None:
+            x, y = (np.asarray(a, dtype=np.float64) for a in transform(x, y))
+        if not upsample:
+            width, height = min(width, x.size), min(height, y.size)
+        self.shape = (height, width)
+        self.x_range = x_range or _padded_range(x)
+        self.y_range = y_range or _padded_range(y)
+        # Pixel centers, the coordinates of the output
+        self.xs = self.x_range[0] + (np.arange(width) + 0.5) * (self.x_range[1] - self.x_range[0]) / width
+        self.ys = self.y_range[0] + (np.arange(height) + 0.5) * (self.y_range[1] - self.y_range[0]) / height
+
+        ix, x_valid = _axis_bins(x, *self.x_range, width)
+        iy, y_valid = _axis_bins(y, *self.y_range, height)
+        valid = (y_valid[:, None] & x_valid[None, :]).ravel()
+        bins = (iy[:, None] * width + ix[None, :]).ravel()
+        # Cells outside the canvas are dropped once here (None: every cell is inside)
+        self.cells = None if valid.all() else np.flatnonzero(valid)
+        self.bins = bins if self.cells is None else bins[self.cells]
+        self.size = width * height
+        self.n_cells = x.size * y.size
+
+        # Pixels that no cell falls in (canvas finer than the grid) copy their nearest cell
+        empty = np.bincount(self.bins, minlength=self.size) == 0
+        self.empty = np.flatnonzero(empty)
+        nearest = (_nearest(y, self.ys)[:, None] * x.size + _nearest(x, self.xs)[None, :]).ravel()
+        self.nearest = nearest[self.empty]
+
+    def __call__(self, values):
+        """Mean of the finite cells of each pixel, as a (height, width) array (NaN where there are none)."""
+        flat = np.asarray(values, dtype=np.float64).ravel()
+        if flat.size != self.n_cells:
+            raise ValueError(f"Expected {self.n_cells} values, got {flat.size}")
+        cells = flat if self.cells is None else flat[self.cells]
+        finite = np.isfinite(cells)
+        sums = np.bincount(self.bins, weights=np.where(finite, cells, 0.0), minlength=self.size)
+        counts = np.bincount(self.bins, weights=finite, minlength=self.size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = sums / counts
+        out[self.empty] = flat[self.nearest]
+        return out.reshape(self.shape)
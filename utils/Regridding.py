@@ -0,0 +1,162 @@
+"""
+This module regrids regular lat/lon fields (e.g. GFS) into large Web Mercator images using several cores.
+The interpolation plan (indices and bilinear weights) is computed once per source/target pair and cached,
+and the target grid is split into row tiles that run on a thread pool (NumPy releases the GIL),
+optionally through a Numba kernel or dask.
+"""
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Mapbox Web Mercator bounds
+MERCATOR_MIN = -20037508.34
+MERCATOR_MAX = 20037508.34
+EARTH_RADIUS = 6378137.0
+
+
+@lru_cache(maxsize=16)
+def mercator_axes(n, mercator_min=MERCATOR_MIN, mercator_max=MERCATOR_MAX):
+    """Lon/lat axes of an n x n Web Mercator grid.
+
+    The inverse Mercator transform is separable (lon only depends on x and lat only on y),
+    so the n*n transform of a meshgrid reduces to two 1D transforms that are cached.
+    Returns (x, y, lon, lat), all 1D and read-only.
+    """
+    x = np.linspace(mercator_min, mercator_max, n)
+    y = np.linspace(mercator_min, mercator_max, n)
+    lon, lat = mercator_to_lonlat(x, y)
+    for a in (x, y, lon, lat):
+        a.flags.writeable = False
+    return x, y, lon, lat
+
+
+def mercator_to_lonlat(x, y):
+    """Inverse Web Mercator (EPSG:3857 meters to degrees)."""
+    lon = np.degrees(np.asarray(x) / EARTH_RADIUS)
+    lat = np.degrees(2 * np.arctan(np.exp(np.asarray(y) / EARTH_RADIUS)) - np.pi / 2)
+    return lon, lat
+
+
+def lonlat_to_mercator(lon, lat):
+    """Web Mercator (degrees to EPSG:3857 meters)."""
+    x = EARTH_RADIUS * np.radians(np.asarray(lon))
+    y = EARTH_RADIUS * np.log(np.tan(np.pi / 4 + np.radians(np.asarray(lat)) / 2))
+    return x, y
+
+
+def _axis_weights(src, tgt, periodic=False):
+    """Indices (i0, i1) and weights w so that value = (1 - w) * f[i0] + w * f[i1] along one axis."""
+    src = np.asarray(src, dtype=np.float64)
+    tgt = np.asarray(tgt, dtype=np.float64)
+    n = src.size
+    descending = n > 1 and src[-1] < src[0]
+    if descending:
+        src = src[::-1]
+
+    if periodic:
+        # Wrap the targets into [src[0], src[0] + 360) and close the circle with a ghost column
+        tgt = src[0] + np.mod(tgt - src[0], 360.0)
+        src = np.append(src, src[0] + 360.0)
+
+    i0 = np.clip(np.searchsorted(src, tgt, side='right') - 1, 0, src.size - 2)
+    i1 = i0 + 1
+    w = (tgt - src[i0]) / (src[i1] - src[i0])
+    valid = (w >= 0) & (w <= 1) & np.isfinite(tgt)
+    w = np.where(valid, w, 0.0)
+
+    if periodic:
+        i1 = np.mod(i1, n)
+    if descending:
+        i0, i1 = n - 1 - i0, n - 1 - i1
+    return i0, i1, w, valid
+
+
+if numba is not None:
+    @numba.njit(nogil=True, cache=True)
+    def _bilinear_tile_numba(values, i0, i1, wy, j0, j1, wx, out):
+        for r in range(i0.size):
+            for c in range(j0.size):
+                a = values[i0[r], j0[c]] * (1 - wx[c]) + values[i0[r], j1[c]] * wx[c]
+                b = values[i1[r], j0[c]] * (1 - wx[c]) + values[i1[r], j1[c]] * wx[c]
+                out[r, c] = a * (1 - wy[r]) + b * wy[r]
+
+
+class Regridder:
+    """Bilinear regridding from a rectilinear source grid onto a rectilinear (separable) target grid.
+
+    Matches ``DataArray.interp(method='linear')``: NaNs propagate and targets outside the
+    source grid are NaN, except along a periodic longitude axis where the seam is interpolated.
+    """
+
+    def __init__(self, src_lat, src_lon, tgt_lat, tgt_lon, periodic_lon=None):
+        src_lon = np.asarray(src_lon, dtype=np.float64)
+        if periodic_lon is None:
+            # A global grid: the last column plus one step closes the circle
+            dlon = np.abs(np.diff(src_lon)).mean() if src_lon.size > 1 else 0
+            periodic_lon = np.isclose(np.abs(src_lon[-1] - src_lon[0]) + dlon, 360.0, atol=dlon / 2)
+        self.periodic_lon = bool(periodic_lon)
+        self.shape = (len(tgt_lat), len(tgt_lon))
+        self.i0, self.i1, self.wy, self.valid_y = _axis_weights(src_lat, tgt_lat)
+        self.j0, self.j1, self.wx, self.valid_x = _axis_weights(src_lon, tgt_lon, self.periodic_lon)
+
+    def _tile(self, values, r0, r1, out, use_numba):
+        rows = slice(r0, r1)
+        if use_numba:
+            _bilinear_tile_numba(values, self.i0[rows], self.i1[rows], self.wy[rows],
+                                 self.j0, self.j1, self.wx, out[rows])
+        else:
+            wy = self.wy[rows, None]
+            # Interpolate along the source rows first (cheap), then gather the target columns
+            lines = values[self.i0[rows]] * (1 - wy) + values[self.i1[rows]] * wy
+            out[rows] = lines[:, self.j0] * (1 - self.wx) + lines[:, self.j1] * self.wx
+        out[rows][~self.valid_y[rows]] = np.nan
+
+    def __call__(self, values, workers=None, tile_rows=256, backend='threads'):
+        """Regrids a 2D (lat, lon) array. backend is 'threads', 'numba' or 'dask'."""
+        values = np.ascontiguousarray(values, dtype=np.float32)
+        out = np.empty(self.shape, dtype=np.float32)
+        workers = workers or os.cpu_count()
+        use_numba = backend == 'numba'
+        if use_numba and numba is None:
+            raise ImportError("backend='numba' requires numba to be installed")
+        tiles = [(r0, min(r0 + tile_rows, self.shape[0])) for r0 in range(0, self.shape[0], tile_rows)]
+
+        if backend == 'dask':
+            import dask
+            tasks = [dask.delayed(self._tile)(values, r0, r1, out, False) for r0, r1 in tiles]
+            dask.compute(*tasks, scheduler='threads', num_workers=workers)
+        elif workers == 1:
+            for r0, r1 in tiles:
+                self._tile(values, r0, r1, out, use_numba)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(lambda t: self._tile(values, t[0], t[1], out, use_numba), tiles))
+
+        out[:, ~self.valid_x] = np.nan
+        return out
+
+
+def _array_key(a):
+    a = np.ascontiguousarray(a)
+    return a.shape, hashlib.sha1(a.tobytes()).hexdigest()
+
+
+_regridders = {}
+
+
+def get_regridder(src_lat, src_lon, tgt_lat, tgt_lon, periodic_lon=None, max_cached=8):
+    """Returns a cached Regridder for this source/target pair, building it on first use."""
+    key = (_array_key(src_lat), _array_key(src_lon), _array_key(tgt_lat), _array_key(tgt_lon), periodic_lon)
+    if key not in _regridders:
+        if len(_regridders) >= max_cached:
+            _regridders.pop(next(iter(_regridders)))
+        _regridders[key] = Regridder(src_lat, src_lon, tgt_lat, tgt_lon, periodic_lon)
+    return _regridders[key]
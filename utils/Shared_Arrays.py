@@ -0,0 +1,148 @@
+"""
+This module shares large read-only arrays between the worker processes of a WSGI server (gunicorn -w N).
+The first worker computes an array and writes it once as a .npy file in shared memory (/dev/shm) under a
+file lock, every worker then maps that file read-only (np.load(mmap_mode='r')), so all of them use the
+same physical pages instead of one copy each. rss_report gives the RSS/PSS of every worker.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+from flask import jsonify
+
+try:
+    import fcntl
+except ImportError:  # Windows, no locking (a single process computes anyway)
+    fcntl = None
+
+
+def shared_dir():
+    """Folder of the shared arrays: SHARED_ARRAYS_DIR, /dev/shm (RAM backed) or the temporary folder."""
+    default = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    folder = os.environ.get('SHARED_ARRAYS_DIR', os.path.join(default, 'dash_shared_arrays'))
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def array_key(name, *params):
+    """File-safe key made of a readable name and a hash of the parameters that define the array."""
+    digest = hashlib.sha1(json.dumps(params, default=str).encode()).hexdigest()[:12]
+    return f"{name}_{digest}"
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock on a file, held by one process (and thread) at a time."""
+    with open(path, 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _is_fresh(path, source_files):
+    if not os.path.exists(path):
+        return False
+    mtime = os.path.getmtime(path)
+    return all(os.path.getmtime(f) <= mtime for f in source_files if os.path.exists(f))
+
+
+def shared_array(key, compute, source_files=()):
+    """Read-only memory-mapped array `key`, computed by compute() only if missing or older than source_files.
+
+    The lock makes concurrent workers wait for the first one instead of computing it again, and the
+    file is written under a temporary name and renamed so nobody maps a half written array.
+    """
+    path = os.path.join(shared_dir(), key + '.npy')
+    if not _is_fresh(path, source_files):
+        with file_lock(path + '.lock'):
+            if not _is_fresh(path, source_files):
+                values = np.asarray(compute())
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, values)
+                os.replace(tmp_path, path)
+                del values
+    return np.load(path, mmap_mode='r')
+
+
+def ready_shared_array(key, source_files=()):
+    """The shared array `key` if it was already computed and is not older than source_files, else None.
+
+    For request threads that must not compute it themselves (shared_array would).
+    """
+    path = os.path.join(shared_dir(), key + '.npy')
+    if not _is_fresh(path, source_files):
+        return None
+    return np.load(path, mmap_mode='r')
+
+
+def clear_shared(prefix=''):
+    """Removes the shared arrays whose key starts with prefix."""
+    folder = shared_dir()
+    for name in os.listdir(folder):
+        if name.startswith(prefix) and name.endswith(('.npy', '.lock')):
+            os.remove(os.path.join(folder, name))
+
+
+def _memory_kb(pid):
+    """Rss, Pss, Shared and Private memory (kB) of a process, from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return None
+    return {'rss': fields.get('Rss', 0), 'pss': fields.get('Pss', 0),
+            'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+            'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)}
+
+
+def _worker_pids():
+    """This process and its siblings running the same command (the workers of a gunicorn master)."""
+    me, parent = os.getpid(), os.getppid()
+    try:
+        with open(f'/proc/{me}/cmdline', 'rb') as f:
+            cmdline = f.read()
+    except OSError:
+        return [me]
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            with open(f'/proc/{entry}/cmdline', 'rb') as f:
+                same_command = f.read() == cmdline
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == parent and same_command:
+            pids.append(int(entry))
+    return sorted(pids) or [me]
+
+
+def rss_report():
+    """Memory of every worker in MB. PSS splits the shared pages between the processes that map them."""
+    workers = {}
+    for pid in _worker_pids():
+        memory = _memory_kb(pid)
+        if memory is not None:
+            workers[pid] = {name: round(kb / 1024, 1) for name, kb in memory.items()}
+    return {'served_by': os.getpid(), 'workers': workers,
+            'total_rss_mb': round(sum(w['rss'] for w in workers.values()), 1),
+            'total_pss_mb': round(sum(w['pss'] for w in workers.values()), 1)}
+
+
+def register_rss_route(app, path='/rss'):
+    """Adds a JSON route with the rss_report of the workers."""
+    app.server.add_url_rule(path, 'rss_report', lambda: jsonify(rss_report()))
@@ -0,0 +1,149 @@
+"""
+This module contains a uniform-grid spatial index for large point tables (stations, observations, cities).
+The index is built once (points sorted by grid cell plus cell offsets), after which a viewport query
+only touches the cells it overlaps. At low zoom the points in view are clustered on the server
+(counts and centroids), and above a zoom threshold the individual points are returned.
+"""
+import numpy as np
+
+from utils.Binning import zoom_cell_size
+
+
+def _wrap_lon(lon):
+    return lon if -180 <= lon <= 180 else (lon + 180) % 360 - 180
+
+
+class GridIndex:
+    def __init__(self, lats, lons, cell_deg=0.5):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.lons = np.where((self.lons < -180) | (self.lons > 180), (self.lons + 180) % 360 - 180, self.lons)
+        self.cell_deg = cell_deg
+        self.n_rows = int(np.ceil(180 / cell_deg))
+        self.n_cols = int(np.ceil(360 / cell_deg))
+        rows, cols = self._cell(self.lats, self.lons)
+        cell_id = rows * self.n_cols + cols
+        # Points sorted by cell, offsets[c]:offsets[c+1] are the positions of the points in cell c
+        self.order = np.argsort(cell_id, kind='stable')
+        self.offsets = np.searchsorted(cell_id[self.order], np.arange(self.n_rows * self.n_cols + 1))
+
+    def __len__(self):
+        return self.lats.size
+
+    def _cell(self, lats, lons):
+        rows = np.clip(((np.asarray(lats) + 90) / self.cell_deg).astype(np.int64), 0, self.n_rows - 1)
+        cols = np.clip(((np.asarray(lons) + 180) / self.cell_deg).astype(np.int64), 0, self.n_cols - 1)
+        return rows, cols
+
+    def query(self, lon_min, lon_max, lat_min, lat_max):
+        """Indices of the points inside the box (a box with lon_min > lon_max crosses the antimeridian)."""
+        if lon_max - lon_min >= 360:
+            lon_min, lon_max = -180, 180
+        lon_min, lon_max = _wrap_lon(lon_min), _wrap_lon(lon_max)
+        if lon_min > lon_max:
+            return np.concatenate([self.query(lon_min, 180, lat_min, lat_max),
+                                   self.query(-180, lon_max, lat_min, lat_max)])
+
+        (r0, r1), (c0, c1) = self._cell([lat_min, lat_max], [lon_min, lon_max])
+        # Within a row the cells c0..c1 are contiguous in the sorted order: one slice per row
+        row_ids = np.arange(r0, r1 + 1) * self.n_cols
+        starts = self.offsets[row_ids + c0]
+        ends = self.offsets[row_ids + c1 + 1]
+        lengths = ends - starts
+        if lengths.sum() == 0:
+            return np.empty(0, dtype=np.int64)
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        candidates = self.order[positions]
+        lats, lons = self.lats[candidates], self.lons[candidates]
+        inside = (lats >= lat_min) & (lats <= lat_max) & (lons >= lon_min) & (lons <= lon_max)
+        return candidates[inside]
+
+    def _ring_candidates(self, rows, cols, r):
+        """(query, point) pairs of the cells at ring r (Chebyshev distance r in cells) around each query cell."""
+        if r == 0:
+            d_rows, d_cols = np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+        else:
+            side = np.arange(-r, r + 1)
+            d_rows = np.concatenate([np.full(side.size, -r), np.full(side.size, r), side[1:-1], side[1:-1]])
+            d_cols = np.concatenate([side, side, np.full(side.size - 2, -r), np.full(side.size - 2, r)])
+        # Rows beyond the poles do not exist, columns wrap around the antimeridian
+        ring_rows = rows[:, None] + d_rows
+        valid = (ring_rows >= 0) & (ring_rows < self.n_rows)
+        cells = np.clip(ring_rows, 0, self.n_rows - 1) * self.n_cols + (cols[:, None] + d_cols) % self.n_cols
+        starts = self.offsets[cells].ravel()
+        lengths = np.where(valid, self.offsets[cells + 1] - self.offsets[cells], 0).ravel()
+        query_id = np.repeat(np.arange(cells.size) // cells.shape[1], lengths)
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return query_id, self.order[positions]
+
+    def _distances(self, candidates, lats, lons, cos_lat):
+        d_lon = np.abs(self.lons[candidates] - lons)
+        return np.hypot(self.lats[candidates] - lats, np.minimum(d_lon, 360 - d_lon) * cos_lat)
+
+    def nearest(self, lats, lons, chunk_size=10_000_000):
+        """Nearest point to each (lat, lon).
+
+        The cells around each query are searched in widening rings until the closest candidate is
+        within the radius already searched, so the result is exact. Queries far from every point
+        (more cells to search than there are points) compare all the points instead, chunk_size
+        distances at a time. Returns (idx, dist_deg), idx is -1 only when the index is empty. Distances are in degrees of
+        latitude, with longitudes scaled by cos(lat).
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        lons = np.where((lons < -180) | (lons > 180), (lons + 180) % 360 - 180, lons)
+        rows, cols = self._cell(lats, lons)
+        cos_lat = np.cos(np.radians(lats))
+        idx = np.full(lats.size, -1, dtype=np.int64)
+        dist = np.full(lats.size, np.inf)
+        if len(self) == 0:
+            return idx, dist
+
+        pending = np.arange(lats.size)
+        r = 0
+        while pending.size and (2 * r + 1) ** 2 <= len(self):
+            query_id, candidates = self._ring_candidates(rows[pending], cols[pending], r)
+            if candidates.size:
+                queries = pending[query_id]
+                d = self._distances(candidates, lats[queries], lons[queries], cos_lat[queries])
+                # Closest candidate of every query (the first one on ties), kept if closer than the best so far
+                order = np.lexsort((d, queries))
+                first = order[np.flatnonzero(np.diff(queries[order], prepend=-1))]
+                closer = d[first] < dist[queries[first]]
+                dist[queries[first[closer]]] = d[first[closer]]
+                idx[queries[first[closer]]] = candidates[first[closer]]
+            # A point outside the rings searched is at least r cells away in latitude or in longitude
+            searched = r * self.cell_deg * cos_lat[pending]
+            pending = pending[dist[pending] > searched]
+            r += 1
+
+        everything = np.arange(len(self))
+        step = max(chunk_size // len(self), 1)
+        for start in range(0, pending.size, step):
+            queries = pending[start:start + step, None]
+            d = self._distances(everything, lats[queries], lons[queries], cos_lat[queries])
+            idx[queries[:, 0]] = d.argmin(axis=1)
+            dist[queries[:, 0]] = d.min(axis=1)
+        return idx, dist
+
+    def clusters(self, idx, cell_deg):
+        """Counts and centroids of the points idx, grouped in cells of cell_deg degrees."""
+        lats, lons = self.lats[idx], self.lons[idx]
+        keys = (np.floor((lats + 90) / cell_deg).astype(np.int64) * int(np.ceil(360 / cell_deg))
+                + np.floor((lons + 180) / cell_deg).astype(np.int64))
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        lat_c = np.bincount(inverse, weights=lats) / counts
+        lon_c = np.bincount(inverse, weights=lons) / counts
+        return lat_c, lon_c, counts
+
+    def query_viewport(self, viewport, zoom_threshold=6, cluster_px=40, max_points=5000):
+        """Points or clusters to draw for a (lon_min, lon_max, lat_min, lat_max, zoom) viewport.
+
+        Returns ('points', idx) above the zoom threshold (at most max_points) and
+        ('clusters', (lat, lon, counts)) below it.
+        """
+        lon_min, lon_max, lat_min, lat_max, zoom = viewport
+        idx = self.query(lon_min, lon_max, lat_min, lat_max)
+        if zoom >= zoom_threshold:
+            return 'points', idx[:max_points]
+        return 'clusters', self.clusters(idx, zoom_cell_size(zoom, cluster_px))
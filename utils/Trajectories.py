@@ -0,0 +1,145 @@
+"""
+This module prepares large sets of trajectories (drifters, ship tracks) for line maps.
+Long segments are densified along great circles (vectorized slerp), and every vertex gets a
+Douglas-Peucker importance once: the tolerance at which it would be removed. Serving a zoom level
+is then a threshold filter on that importance instead of a new simplification.
+Trajectories are stored in one lat/lon pair of arrays separated by NaN (as plotly draws them).
+"""
+import math
+
+import numpy as np
+
+from utils.Binning import TILE_SIZE
+from utils.Regridding import EARTH_RADIUS, lonlat_to_mercator
+
+
+def _to_xyz(lats, lons):
+    lat, lon = np.radians(lats), np.radians(lons)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=1)
+
+
+def densify_great_circle(lats, lons, max_step_deg=1.0):
+    """Inserts vertices along the great circle of every segment longer than max_step_deg.
+
+    NaN breaks between trajectories are kept. The original vertices are returned unchanged.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if lats.size < 2:
+        return lats.copy(), lons.copy()
+    xyz = _to_xyz(lats, lons)
+    a, b = xyz[:-1], xyz[1:]
+    omega = np.arccos(np.clip(np.einsum('ij,ij->i', a, b), -1, 1))
+    # Number of sub-segments of each segment (1 for short ones and for NaN breaks)
+    n = np.ceil(np.degrees(omega) / max_step_deg)
+    n = np.where(np.isfinite(n) & (n > 1), n, 1).astype(np.int64)
+
+    seg = np.repeat(np.arange(n.size), n)
+    k = np.arange(seg.size) - np.repeat(np.cumsum(n) - n, n)
+    t = k / n[seg]
+    w = omega[seg]
+    inserted = k > 0
+    s = np.sin(w[inserted])
+    ti, wi = t[inserted], w[inserted]
+    small = s < 1e-12
+    fa = np.where(small, 1 - ti, np.sin((1 - ti) * wi) / np.where(small, 1, s))
+    fb = np.where(small, ti, np.sin(ti * wi) / np.where(small, 1, s))
+    p = fa[:, None] * a[seg[inserted]] + fb[:, None] * b[seg[inserted]]
+
+    out_lat = np.empty(seg.size + 1)
+    out_lon = np.empty(seg.size + 1)
+    # k == 0 are the original vertices, the last vertex closes the path
+    out_lat[:-1][~inserted] = lats[:-1]
+    out_lon[:-1][~inserted] = lons[:-1]
+    out_lat[:-1][inserted] = np.degrees(np.arcsin(np.clip(p[:, 2] / np.linalg.norm(p, axis=1), -1, 1)))
+    new_lon = np.degrees(np.arctan2(p[:, 1], p[:, 0]))
+    # Keep the longitude convention of the segment start (e.g. 0..360)
+    start_lon = lons[seg[inserted]]
+    out_lon[:-1][inserted] = new_lon + 360 * np.round((start_lon - new_lon) / 360)
+    out_lat[-1], out_lon[-1] = lats[-1], lons[-1]
+    return out_lat, out_lon
+
+
+def _runs(finite):
+    """(starts, ends) inclusive indices of the runs of True values."""
+    padded = np.concatenate([[False], finite, [False]])
+    changes = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return changes[::2], changes[1::2] - 1
+
+
+def vertex_importance(x, y):
+    """Douglas-Peucker importance of every vertex of NaN-separated polylines (in the units of x/y).
+
+    Keeping the vertices with importance >= tol gives the Douglas-Peucker simplification with
+    tolerance tol. Endpoints and NaN breaks are inf so they always survive.
+    All the open ranges of a level are split at once, so the loop runs once per recursion level.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    importance = np.zeros(x.size)
+    importance[~finite] = np.inf
+    starts, ends = _runs(finite)
+    importance[starts] = np.inf
+    importance[ends] = np.inf
+    parent = np.full(starts.size, np.inf)
+
+    while True:
+        keep = ends - starts >= 2
+        starts, ends, parent = starts[keep], ends[keep], parent[keep]
+        if starts.size == 0:
+            return importance
+        lengths = ends - starts - 1
+        rid = np.repeat(np.arange(starts.size), lengths)
+        offsets = np.cumsum(lengths) - lengths
+        idx = starts[rid] + 1 + np.arange(rid.size) - offsets[rid]
+
+        # Distance of the interior vertices to the chord of their range
+        x0, y0, x1, y1 = x[starts][rid], y[starts][rid], x[ends][rid], y[ends][rid]
+        dx, dy = x1 - x0, y1 - y0
+        den = dx * dx + dy * dy
+        u = np.clip(((x[idx] - x0) * dx + (y[idx] - y0) * dy) / np.where(den > 0, den, 1), 0, 1)
+        dist = np.hypot(x[idx] - (x0 + u * dx), y[idx] - (y0 + u * dy))
+
+        max_dist = np.maximum.reduceat(dist, offsets)
+        # First vertex of every range reaching the maximum
+        at_max = np.flatnonzero(dist == max_dist[rid])
+        first = at_max[np.unique(rid[at_max], return_index=True)[1]]
+        split = idx[first]
+        # A vertex is never more important than the vertex that created its range
+        level = np.minimum(max_dist, parent)
+        importance[split] = level
+
+        starts, ends = np.concatenate([starts, split]), np.concatenate([split, ends])
+        parent = np.concatenate([level, level])
+
+
+def tolerance_for_zoom(zoom, pixels=1.0):
+    """Web Mercator meters covered by `pixels` at a map zoom level."""
+    return pixels * 2 * math.pi * EARTH_RADIUS / (TILE_SIZE * 2 ** zoom)
+
+
+def zoom_for_geo_scale(scale, lon_span=360.0, width_px=1000):
+    """Equivalent Mapbox zoom of a Geo map showing lon_span degrees in width_px at geo.projection.scale."""
+    return math.log2(width_px * 360.0 / (TILE_SIZE * lon_span) * max(scale, 1e-6))
+
+
+class SimplifiedTracks:
+    """Densified trajectories with precomputed vertex importance."""
+
+    def __init__(self, lats, lons, max_step_deg=1.0):
+        self.lats, self.lons = densify_great_circle(lats, lons, max_step_deg)
+        # Unwrap the longitudes so a track crossing the antimeridian is continuous in Mercator
+        step = np.diff(self.lons)
+        jumps = -360 * np.round(np.where(np.isfinite(step), step, 0) / 360)
+        unwrapped = self.lons + np.concatenate([[0], np.cumsum(jumps)])
+        x, y = lonlat_to_mercator(unwrapped, np.clip(self.lats, -85, 85))
+        self.importance = vertex_importance(x, y)
+
+    def __len__(self):
+        return self.lats.size
+
+    def at_zoom(self, zoom, pixels=1.0):
+        """(lats, lons) of the vertices visible at this zoom (error below `pixels`)."""
+        keep = self.importance >= tolerance_for_zoom(zoom, pixels)
+        return self.lats[keep], self.lons[keep]
@@ -0,0 +1,67 @@
+"""
+This module holds the state of the hierarchical button examples as counts instead of components.
+Every level only stores how many buttons it has, whether it is expanded and which page is shown,
+so the apps materialize the buttons of the visible page of the expanded levels and nothing else.
+Memory does not grow with the number of generated buttons.
+"""
+import threading
+
+
+class LevelTree:
+    """Levels of generated buttons (1-based levels and indices) with collapsed state and paging."""
+
+    def __init__(self, page_size=24, expanded_levels=(1,)):
+        self.page_size = page_size
+        self.counts = {}
+        self.expanded = {level: True for level in expanded_levels}
+        self.pages = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    @property
+    def levels(self):
+        return sorted(self.counts)
+
+    def count(self, level):
+        return self.counts.get(level, 0)
+
+    def add(self, level):
+        """Adds a button to a level and returns its index."""
+        with self._lock:
+            self.counts[level] = self.counts.get(level, 0) + 1
+            return self.counts[level]
+
+    def is_expanded(self, level):
+        return self.expanded.get(level, False)
+
+    def set_expanded(self, level, expanded):
+        self.expanded[level] = bool(expanded)
+
+    def toggle(self, level):
+        self.set_expanded(level, not self.is_expanded(level))
+        return self.expanded[level]
+
+    def n_pages(self, level):
+        return max(1, -(-self.count(level) // self.page_size))
+
+    def page(self, level):
+        return min(self.pages.get(level, 0), self.n_pages(level) - 1)
+
+    def move_page(self, level, step):
+        self.pages[level] = max(0, min(self.page(level) + step, self.n_pages(level) - 1))
+        return self.pages[level]
+
+    def visible(self, level):
+        """Indices of the buttons to render for a level (none when it is collapsed)."""
+        if not self.is_expanded(level):
+            return range(0)
+        start = self.page(level) * self.page_size + 1
+        return range(start, min(start + self.page_size, self.count(level) + 1))
+
+    def is_visible(self, level, index):
+        return index in self.visible(level)
+
+    def n_visible(self):
+        return sum(len(self.visible(level)) for level in self.counts)
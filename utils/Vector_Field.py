@@ -0,0 +1,126 @@
+"""
+This module builds vector-field (arrow) layers from separate U and V NetCDF files.
+The U/V pair is opened lazily and only the (time, depth) slice and window of the viewport are read.
+Arrows are decimated on the server so that their spacing is constant in pixels at any zoom,
+and the line geometry is cached per (time, depth, viewport bucket).
+"""
+import asyncio
+import math
+import os
+
+import numpy as np
+
+from utils.Async_Serving import read_values
+from utils.Binning import zoom_cell_size
+from utils.Caching import LRUCache
+from utils.Lazy_NetCDF import open_lazy, select_slice
+
+
+def pair_uv_files(u_file):
+    """The V file that goes with a '..._u.nc' file."""
+    if not u_file.endswith('_u.nc'):
+        raise ValueError(f"Expected a '_u.nc' file, got {u_file}")
+    v_file = u_file[:-len('_u.nc')] + '_v.nc'
+    if not os.path.exists(v_file):
+        raise FileNotFoundError(f"V file not found for {u_file}: {v_file}")
+    return v_file
+
+
+def viewport_bucket(viewport):
+    """Snaps a (lon_min, lon_max, lat_min, lat_max, zoom) viewport to the map tiles of its integer zoom."""
+    lon_min, lon_max, lat_min, lat_max, zoom = viewport
+    zoom = int(math.floor(zoom))
+    tile_deg = 360.0 / 2 ** zoom
+    return (math.floor(lon_min / tile_deg) * tile_deg, math.ceil(lon_max / tile_deg) * tile_deg,
+            math.floor(lat_min / tile_deg) * tile_deg, math.ceil(lat_max / tile_deg) * tile_deg, zoom)
+
+
+def arrow_segments(lats, lons, u, v, stride, length_deg, head=0.3, head_angle=25):
+    """Line geometry of arrows every `stride` cells, as lat/lon arrays with NaN breaks.
+
+    The longest arrow is length_deg long. Each arrow is a shaft and two barbs (7 vertices).
+    Returns (lat, lon, number_of_arrows).
+    """
+    LON, LAT = np.meshgrid(lons[::stride], lats[::stride])
+    u, v = u[::stride, ::stride], v[::stride, ::stride]
+    keep = np.isfinite(u) & np.isfinite(v)
+    LON, LAT, u, v = LON[keep], LAT[keep], u[keep], v[keep]
+    if u.size == 0:
+        return np.empty(0), np.empty(0), 0
+
+    speed = np.hypot(u, v)
+    scale = length_deg / max(speed.max(), 1e-12)
+    # Degrees of longitude shrink with latitude, stretch dx so arrows keep their direction
+    coslat = np.cos(np.radians(LAT))
+    end_lon = LON + u * scale / coslat
+    end_lat = LAT + v * scale
+
+    angle = np.arctan2(v, u)
+    barb_len = speed * scale * head
+    barbs = []
+    for sign in (1, -1):
+        a = angle + np.pi - sign * np.radians(head_angle)
+        barbs.append((end_lon + barb_len * np.cos(a) / coslat, end_lat + barb_len * np.sin(a)))
+
+    nan = np.full(u.size, np.nan)
+    # start, end, break, barb1, end, barb2, break
+    out_lon = np.stack([LON, end_lon, nan, barbs[0][0], end_lon, barbs[1][0], nan], axis=1).ravel()
+    out_lat = np.stack([LAT, end_lat, nan, barbs[0][1], end_lat, barbs[1][1], nan], axis=1).ravel()
+    return out_lat, out_lon, u.size
+
+
+class UVField:
+    """Lazily paired U and V files with cached, zoom-decimated arrow geometry."""
+
+    def __init__(self, u_file, v_file=None, u_var='u', v_var='v', cache_size=64):
+        self.u = open_lazy(u_file)[u_var]
+        self.v = open_lazy(v_file or pair_uv_files(u_file))[v_var]
+        self.cache = LRUCache(cache_size)
+
+    def arrows(self, viewport, time=0, depth=0, spacing_px=30, max_arrows=1500):
+        """Arrow geometry for a viewport, computed once per (time, depth, viewport bucket)."""
+        bucket = viewport_bucket(viewport)
+        return self.cache.get_or_compute((time, depth, bucket),
+                                         lambda: self._compute(bucket, time, depth, spacing_px, max_arrows))
+
+    async def arrows_async(self, viewport, time=0, depth=0, spacing_px=30, max_arrows=1500):
+        """Same as arrows for async callbacks: the U and V slices are read off the event loop."""
+        bucket = viewport_bucket(viewport)
+        key = (time, depth, bucket)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        selection = self._select(bucket, time, depth, spacing_px, max_arrows)
+        if selection is None:
+            result = np.empty(0), np.empty(0), 0
+        else:
+            lats, lons, u_slice, v_slice, length_deg = selection
+            u, v = await asyncio.gather(read_values(u_slice), read_values(v_slice))
+            result = arrow_segments(lats, lons, u, v, 1, length_deg)
+        self.cache.put(key, result)
+        return result
+
+    def _select(self, bucket, time, depth, spacing_px, max_arrows):
+        """Lazy, decimated U and V selections of a viewport bucket and the arrow length (None below 2x2 cells)."""
+        lon_min, lon_max, lat_min, lat_max, zoom = bucket
+        window = dict(time=time, depth=depth, lat=(lat_min, lat_max), lon=(lon_min, lon_max))
+        u_slice = select_slice(self.u, **window)
+        v_slice = select_slice(self.v, **window)
+        lats, lons = u_slice.grid.lats, u_slice.grid.lons
+        if lats.size < 2 or lons.size < 2:
+            return None
+
+        spacing_deg = zoom_cell_size(zoom, spacing_px)
+        stride = max(1, int(round(spacing_deg / abs(lons[1] - lons[0]))))
+        # Never more than max_arrows, whatever the resolution of the field
+        stride = max(stride, int(math.ceil(math.sqrt(lats.size * lons.size / max_arrows))))
+        # Decimate before reading, so only the cells that become arrows are loaded
+        return (lats[::stride], lons[::stride], u_slice[::stride, ::stride], v_slice[::stride, ::stride],
+                0.8 * stride * abs(lons[1] - lons[0]))
+
+    def _compute(self, bucket, time, depth, spacing_px, max_arrows):
+        selection = self._select(bucket, time, depth, spacing_px, max_arrows)
+        if selection is None:
+            return np.empty(0), np.empty(0), 0
+        lats, lons, u_slice, v_slice, length_deg = selection
+        return arrow_segments(lats, lons, u_slice.values, v_slice.values, 1, length_deg)